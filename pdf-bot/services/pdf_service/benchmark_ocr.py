@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark the OCR engines on the pages of a PDF
+
+Renders the pages once (OCR_DPI grayscale, as OcrService does) and OCRs
+them with every available engine, one page at a time, reporting the
+latency of the first page (includes loading the traineddata) and of the
+following pages.
+
+Usage:
+    python benchmark_ocr.py document.pdf [--pages 10] [--language eng]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import statistics
+import tempfile
+
+from config import settings
+from utils.ocr_engines import get_ocr_engine
+from utils.render_utils import render_pages
+
+ENGINES = ["pytesseract", "tesserocr"]
+
+def render_to_files(pdf_path: str, pages: int, directory: str) -> list:
+    """Render the first `pages` pages into `directory` and return their paths"""
+    paths = []
+    for page in render_pages(pdf_path, dpi=settings.ocr_dpi, last_page=pages, grayscale=True):
+        path = os.path.join(directory, f"page-{page.number}{os.path.splitext(page.path)[1]}")
+        shutil.copyfile(page.path, path)
+        paths.append(path)
+    return paths
+
+def benchmark(engine, paths: list, language: str) -> dict:
+    latencies = []
+    chars = 0
+    for path in paths:
+        start = time.perf_counter()
+        chars += len(engine.recognize(path, language))
+        latencies.append(time.perf_counter() - start)
+
+    warm = latencies[1:] or latencies
+    return {
+        "first": latencies[0],
+        "mean": statistics.mean(warm),
+        "median": statistics.median(warm),
+        "max": max(warm),
+        "chars": chars
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-page OCR latency of each engine")
+    parser.add_argument("pdf", help="PDF to OCR")
+    parser.add_argument("--pages", type=int, default=10, help="Number of pages (from the start)")
+    parser.add_argument("--language", default="eng", help="Tesseract language")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ocr_benchmark_")
+    try:
+        print(f"Rendering {args.pages} pages of {args.pdf}...")
+        paths = render_to_files(args.pdf, args.pages, directory)
+
+        print(f"\n{'engine':<12} {'first page':>11} {'mean':>9} {'median':>9} {'max':>9} {'chars':>8}")
+        results = {}
+        for name in ENGINES:
+            engine = get_ocr_engine(name)
+            if engine.name != name:
+                print(f"{name:<12} not available")
+                continue
+            result = results[name] = benchmark(engine, paths, args.language)
+            print(f"{name:<12} {result['first'] * 1000:>9.0f}ms {result['mean'] * 1000:>7.0f}ms "
+                  f"{result['median'] * 1000:>7.0f}ms {result['max'] * 1000:>7.0f}ms {result['chars']:>8}")
+
+        if len(results) == len(ENGINES):
+            speedup = results["pytesseract"]["mean"] / results["tesserocr"]["mean"]
+            print(f"\ntesserocr is {speedup:.2f}x faster per page after the first")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+from pydantic import model_validator
+from pydantic_settings import BaseSettings
+from typing import Optional
+import os
+
+class Settings(BaseSettings):
+    """
+    Service configuration, read from environment variables
+    """
+
+    # Maximum accepted PDF upload (WhatsApp's document limit)
+    max_upload_bytes: int = 16 * 1024 * 1024
+
+    # Number of worker processes running PDF operations (0 = run in a thread, for development)
+    pdf_workers: int = os.cpu_count() or 1
+
+    # multiprocessing start method for the worker pool (spawn/forkserver/fork)
+    pdf_worker_start_method: str = "spawn"
+
+    # Seconds a finished /jobs result is kept before eviction
+    job_ttl_seconds: int = 1800
+
+    # Threads per worker for image re-encoding during compression
+    image_workers: int = min(4, os.cpu_count() or 1)
+
+    # Per-request workspaces and service outputs (point at a tmpfs to keep them in memory)
+    workspace_root: str = "/tmp/pdf_processing/work"
+
+    # Janitor: orphans older than this are removed, and the root is kept under the quota
+    workspace_max_age_seconds: int = 3600
+    workspace_max_bytes: int = 2 * 1024 * 1024 * 1024
+    janitor_interval_seconds: int = 300
+
+    # Content-addressed result cache
+    result_cache_enabled: bool = True
+    result_cache_dir: str = "/tmp/pdf_processing/cache/results"
+    result_cache_max_bytes: int = 512 * 1024 * 1024
+
+    # Extracted text shared by summarize/translate (memory tier per worker + disk tier)
+    text_cache_dir: str = "/tmp/pdf_processing/cache/text"
+    text_cache_memory_chars: int = 20_000_000
+    text_cache_max_bytes: int = 256 * 1024 * 1024
+
+    # CPUs shared by the poppler/tesseract processes of all pool workers (default: all CPUs).
+    # Each request borrows the free ones (see utils/cpu_budget.py)
+    cpu_budget: Optional[int] = None
+
+    # Page rendering: byte budget for rendered pages held at once, poppler output format
+    # and most poppler processes rendering page-range shards in parallel per request
+    # (default CPU_BUDGET; fewer while other requests hold CPUs)
+    render_memory_bytes: int = 256 * 1024 * 1024
+    render_format: str = "ppm"
+    render_workers: Optional[int] = None
+
+    # Most tesseract processes per OCR request (each limited to one thread; default as above)
+    ocr_workers: Optional[int] = None
+
+    # OCR backend: auto (tesserocr if installed, else pytesseract), tesserocr or pytesseract
+    ocr_engine: str = "auto"
+
+    # OCR render resolution. Adaptive mode renders each page at OCR_PROBE_DPI first, estimates
+    # the text x-height and renders at the DPI giving OCR_TARGET_X_HEIGHT pixels (OCR_MIN_DPI..OCR_MAX_DPI)
+    ocr_dpi: int = 300
+    ocr_adaptive_dpi: bool = False
+    ocr_probe_dpi: int = 100
+    ocr_target_x_height: int = 20
+    ocr_min_dpi: int = 150
+    ocr_max_dpi: int = 600
+
+    # OCR preprocessing steps (comma-separated subset of crop,binarize,despeckle,deskew, run in that order; empty disables),
+    # Sauvola window (pixels at 300 DPI) and k, largest skew searched (degrees), despeckle neighbour count
+    ocr_preprocess: str = "crop,binarize,despeckle,deskew"
+    ocr_binarize_window: int = 41
+    ocr_binarize_k: float = 0.2
+    ocr_deskew_max_angle: float = 5.0
+    ocr_despeckle_min_neighbors: int = 2
+
+    # Rendered pages shared by OCR/convert/preview, keyed by content hash, page, DPI and colour mode
+    page_cache_enabled: bool = True
+    page_cache_dir: str = "/tmp/pdf_processing/cache/pages"
+    page_cache_max_bytes: int = 1024 * 1024 * 1024
+
+    # Largest image combine_pages may produce (pixels); bigger requests are refused
+    stitch_max_pixels: int = 250_000_000
+
+    # /preview: default and maximum longest side (pixels), encoder quality, in-memory cache size
+    preview_size: int = 512
+    preview_max_size: int = 1600
+    preview_quality: int = 75
+    preview_cache_bytes: int = 64 * 1024 * 1024
+
+    @model_validator(mode="after")
+    def _default_cpus(self) -> "Settings":
+        """
+        Default the CPU budget to all CPUs and let a single request use all
+        of it; the budget, not a fixed split, keeps busy workers together
+        from oversubscribing the machine
+        """
+        if self.cpu_budget is None:
+            self.cpu_budget = os.cpu_count() or 1
+        if self.render_workers is None:
+            self.render_workers = self.cpu_budget
+        if self.ocr_workers is None:
+            self.ocr_workers = self.cpu_budget
+        return self
+
+settings = Settings()
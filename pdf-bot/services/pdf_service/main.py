@@ -1,41 +1,129 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+import asyncio
+import json
 import tempfile
 import os
 import shutil
 import logging
 from pathlib import Path
+from contextlib import asynccontextmanager
 
 # Import our processing modules
-from services.compress_service import CompressService
-from services.convert_service import ConvertService
-from services.ocr_service import OcrService
-from services.summarize_service import SummarizeService
-from services.translate_service import TranslateService
-from services.secure_service import SecureService
-from utils.file_utils import validate_pdf, create_temp_file
-from utils.response_utils import create_file_response
+from config import settings
+from utils.file_utils import file_sha256
+from utils.job_store import JobStore
+from utils.preview_cache import PreviewCache
+from utils.process_pool import ProcessPool
+from utils.result_cache import FallbackResult, ResultCache
+from utils.upload_utils import IngestedUpload, pdf_upload
+from utils.workspace import Janitor, get_workspace_root
+from utils.stitch_utils import ImageTooLargeError
+from services.preview_service import PREVIEW_FORMATS, PreviewPageError
+from utils.response_utils import create_file_response, create_streaming_file_response, wait_for_output
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Services run in worker processes so CPU-bound work never blocks the event loop
+process_pool = ProcessPool(settings.pdf_workers, settings.pdf_worker_start_method)
+
+# Asynchronous jobs submitted through /jobs
+job_store = JobStore(ttl=settings.job_ttl_seconds)
+
+# Results of previous operations, keyed by input hash + parameters
+result_cache = ResultCache(settings.result_cache_dir, settings.result_cache_max_bytes) if settings.result_cache_enabled else None
+
+# Encoded /preview images, keyed by input hash + page/size/format
+preview_cache = PreviewCache(settings.preview_cache_bytes)
+
+# Removes orphaned workspaces and enforces the workspace disk quota
+janitor = Janitor(get_workspace_root(), settings.workspace_max_age_seconds, settings.workspace_max_bytes)
+
+# Output media types for /convert
+CONVERT_MEDIA_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
+    "img": "image/png",
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg"
+}
+
+# Operations whose service methods accept the upload's content_hash (text store / page cache key)
+HASHED_OPERATIONS = {"convert", "ocr", "summarize", "translate"}
+
+async def run_operation(operation: str, method: str, input_path: str,
+                        content_hash: Optional[str] = None, **kwargs) -> Tuple[str, Dict[str, str]]:
+    """
+    Run a service operation, serving it from the result cache when possible
+
+    Service methods return either a result path or (result path, report
+    headers); the headers are cached along with the result. Fallback
+    results (placeholders after a failure) are passed through uncached.
+
+    Args:
+        content_hash: SHA-256 of the input, if already computed during upload
+
+    Returns:
+        (path to the result file (owned by the caller), report headers)
+    """
+    if result_cache is not None:
+        content_hash = content_hash or await asyncio.to_thread(file_sha256, input_path)
+    # The worker reuses the hash instead of reading the whole file again
+    worker_kwargs = dict(kwargs, content_hash=content_hash) if operation in HASHED_OPERATIONS else kwargs
+
+    if result_cache is None:
+        return _split_result(await process_pool.run(operation, method, input_path, **worker_kwargs))
+
+    cache_key = result_cache.make_key(content_hash, operation, kwargs)
+
+    cached = await asyncio.to_thread(result_cache.get, cache_key)
+    if cached is not None:
+        logger.info(f"Result cache hit: {operation} ({content_hash[:12]})")
+        return cached
+
+    result_path, headers = _split_result(await process_pool.run(operation, method, input_path, **worker_kwargs))
+    if isinstance(result_path, FallbackResult):
+        logger.info(f"Not caching fallback result: {operation} ({content_hash[:12]})")
+    else:
+        await asyncio.to_thread(result_cache.put, cache_key, result_path, headers)
+
+    return result_path, headers
+
+def _split_result(result) -> Tuple[str, Dict[str, str]]:
+    """Normalize a service result to (path, headers)"""
+    if isinstance(result, tuple):
+        return result
+    return result, {}
+
+async def _evict_jobs_periodically():
+    """Drop expired jobs even when no new requests come in"""
+    while True:
+        await asyncio.sleep(60)
+        job_store.evict_expired()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the worker pool with the app and stop it on shutdown"""
+    process_pool.start()
+    eviction_task = asyncio.create_task(_evict_jobs_periodically())
+    janitor_task = asyncio.create_task(janitor.run_forever(settings.janitor_interval_seconds))
+    yield
+    janitor_task.cancel()
+    eviction_task.cancel()
+    process_pool.shutdown()
+
 app = FastAPI(
     title="PDF Processing Microservice",
     description="FastAPI microservice for PDF processing operations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Initialize services
-compress_service = CompressService()
-convert_service = ConvertService()
-ocr_service = OcrService()
-summarize_service = SummarizeService()
-translate_service = TranslateService()
-secure_service = SecureService()
-
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -46,10 +134,14 @@ async def root():
         "endpoints": [
             "/compress",
             "/convert", 
+            "/preview",
             "/ocr",
             "/summarize",
             "/translate",
-            "/secure"
+            "/secure",
+            "/jobs/{operation}",
+            "/jobs/{job_id}",
+            "/jobs/{job_id}/result"
         ]
     }
 
@@ -61,244 +153,374 @@ async def health_check():
         "services": {
             "compress": "available",
             "convert": "available",
+            "preview": "available",
             "ocr": "available", 
             "summarize": "available",
             "translate": "available",
             "secure": "available"
-        }
+        },
+        "workers": process_pool.stats(),
+        "jobs": job_store.stats(),
+        "cache": result_cache.stats() if result_cache else None,
+        "preview_cache": preview_cache.stats(),
+        "janitor": janitor.stats()
     }
 
+def _parse_target_bytes(value: Optional[str]) -> Optional[int]:
+    """Validate the optional target_bytes form field"""
+    if value is None or not value.strip():
+        return None
+    try:
+        target_bytes = int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="target_bytes must be an integer")
+    if target_bytes <= 0:
+        raise HTTPException(status_code=400, detail="target_bytes must be positive")
+    return target_bytes
+
 @app.post("/compress")
-async def compress_pdf(
-    file: UploadFile = File(...),
-    mode: str = Form(default="whatsapp"),  # whatsapp/print/balanced
-    quality: str = Form(default="medium")   # low/medium/high
-):
+async def compress_pdf(upload: IngestedUpload = Depends(pdf_upload)):
     """
     Compress PDF file
     
-    Parameters:
+    Parameters (multipart form):
     - file: PDF file to compress
     - mode: Compression mode (whatsapp/print/balanced)
     - quality: Quality level (low/medium/high)
+    - target_bytes: Optional output size budget in bytes (overrides quality)
+    
+    The chosen settings are reported in X-Compression-* response headers.
     """
     try:
-        logger.info(f"Compressing PDF: mode={mode}, quality={quality}")
-        
-        # Validate input
-        if not validate_pdf(file):
-            raise HTTPException(status_code=400, detail="Invalid PDF file")
+        mode = upload.form("mode", "whatsapp")
+        quality = upload.form("quality", "medium")
+        target_bytes = _parse_target_bytes(upload.form("target_bytes"))
+        logger.info(f"Compressing PDF: mode={mode}, quality={quality}, target_bytes={target_bytes}")
         
         # Process file
-        with create_temp_file(file) as temp_input:
-            result_path = await compress_service.compress(
-                temp_input, 
-                mode=mode, 
-                quality=quality
-            )
-            
-            return create_file_response(
-                result_path,
-                filename=f"compressed_{file.filename}",
-                media_type="application/pdf"
-            )
+        result_path, headers = await run_operation(
+            "compress",
+            "compress_with_report",
+            upload.path,
+            content_hash=upload.sha256,
+            mode=mode, 
+            quality=quality,
+            target_bytes=target_bytes
+        )
+        
+        return create_file_response(
+            result_path,
+            filename=f"compressed_{upload.filename}",
+            media_type="application/pdf",
+            workspace=upload.workspace,
+            headers=headers
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Compression error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Compression failed: {str(e)}")
 
 @app.post("/convert")
-async def convert_pdf(
-    file: UploadFile = File(...),
-    format: str = Form(...),  # docx/xlsx/img
-    options: Optional[str] = Form(default=None)  # JSON string with additional options
-):
+async def convert_pdf(upload: IngestedUpload = Depends(pdf_upload)):
     """
     Convert PDF to other formats
     
-    Parameters:
+    Parameters (multipart form):
     - file: PDF file to convert
     - format: Target format (docx/xlsx/img)
     - options: Additional conversion options (JSON string)
+    
+    Image formats with options {"output": "zip"} stream a ZIP of all pages,
+    sent while the pages are still being rendered.
     """
     try:
+        format = upload.form("format")
+        options = upload.form("options")
         logger.info(f"Converting PDF to {format}")
-        
-        if not validate_pdf(file):
-            raise HTTPException(status_code=400, detail="Invalid PDF file")
             
         if format not in ["docx", "xlsx", "img", "png", "jpg", "jpeg"]:
             raise HTTPException(status_code=400, detail="Unsupported format")
         
-        with create_temp_file(file) as temp_input:
-            result_path = await convert_service.convert(
-                temp_input,
-                target_format=format,
-                options=options
-            )
-            
-            # Determine media type based on format
-            media_types = {
-                "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
-                "img": "image/png",
-                "png": "image/png",
-                "jpg": "image/jpeg",
-                "jpeg": "image/jpeg"
-            }
-            
-            return create_file_response(
-                result_path,
-                filename=f"converted_{Path(file.filename).stem}.{format}",
-                media_type=media_types.get(format, "application/octet-stream")
-            )
+        if _is_zip_export(format, options):
+            return await _stream_zip_export(upload, format, options)
+        
+        result_path, headers = await run_operation(
+            "convert",
+            "convert",
+            upload.path,
+            content_hash=upload.sha256,
+            target_format=format,
+            options=options
+        )
+        
+        return create_file_response(
+            result_path,
+            filename=f"converted_{Path(upload.filename).stem}.{format}",
+            media_type=CONVERT_MEDIA_TYPES.get(format, "application/octet-stream"),
+            workspace=upload.workspace,
+            headers=headers
+        )
             
+    except HTTPException:
+        raise
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Conversion error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Conversion failed: {str(e)}")
 
+def _is_zip_export(format: str, options: Optional[str]) -> bool:
+    """Whether a conversion asks for all pages as a ZIP of images"""
+    if format not in ["img", "png", "jpg", "jpeg"] or not options:
+        return False
+    try:
+        return json.loads(options).get("output") == "zip"
+    except (ValueError, AttributeError):
+        return False
+
+async def _stream_zip_export(upload: IngestedUpload, format: str, options: str):
+    """
+    Stream a per-page image ZIP while the worker is still writing it
+
+    Cached archives are served directly; otherwise the finished archive is
+    added to the cache once it has been sent. The response starts once the
+    first page is written: a failure before that is an error status, a
+    failure after it aborts the transfer.
+    """
+    filename = f"converted_{Path(upload.filename).stem}.zip"
+    cache_key = result_cache.make_key(upload.sha256, "convert", {"target_format": format, "options": options}) if result_cache else None
+
+    if cache_key:
+        cached = await asyncio.to_thread(result_cache.get, cache_key)
+        if cached is not None:
+            logger.info(f"Result cache hit: convert zip ({upload.sha256[:12]})")
+            return create_file_response(cached[0], filename, "application/zip", workspace=upload.workspace)
+
+    zip_path = os.path.join(upload.workspace.path, "pages.zip")
+    open(zip_path, 'wb').close()
+
+    task = asyncio.ensure_future(
+        process_pool.run("convert", "convert_to_zip", upload.path, zip_path, format, options, content_hash=upload.sha256)
+    )
+    # Nothing is committed until the first page is in the archive, so early failures get a 4xx/5xx
+    await wait_for_output(zip_path, task)
+
+    return create_streaming_file_response(
+        zip_path,
+        task,
+        filename=filename,
+        media_type="application/zip",
+        workspace=upload.detach(),
+        on_complete=(lambda path: result_cache.put(cache_key, path)) if cache_key else None
+    )
+
+def _parse_bool(value: Optional[str]) -> bool:
+    """Boolean form field ("true"/"1"/"yes"), False when missing"""
+    return (value or "").strip().lower() in ("true", "1", "yes")
+
+def _parse_positive_int(name: str, value: Optional[str], default: Optional[int]) -> Optional[int]:
+    """Optional positive integer form field (400 if invalid)"""
+    if value is None or value == "":
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an integer")
+    if number <= 0:
+        raise HTTPException(status_code=400, detail=f"{name} must be positive")
+    return number
+
+@app.post("/preview")
+async def preview_pdf(upload: IngestedUpload = Depends(pdf_upload)):
+    """
+    Small image of one page, for a quick visual confirmation
+    
+    Parameters (multipart form):
+    - file: PDF file
+    - page: 1-based page number (default 1)
+    - size: Longest side in pixels (default PREVIEW_SIZE, capped at PREVIEW_MAX_SIZE)
+    - format: Image format (webp/jpeg, default webp)
+    
+    Previews are encoded in memory and cached by content hash.
+    """
+    try:
+        page = _parse_positive_int("page", upload.form("page"), 1)
+        size = min(_parse_positive_int("size", upload.form("size"), settings.preview_size), settings.preview_max_size)
+        format = upload.form("format", "webp").lower()
+        if format == "jpg":
+            format = "jpeg"
+        if format not in PREVIEW_FORMATS:
+            raise HTTPException(status_code=400, detail="Unsupported preview format")
+        
+        cache_key = preview_cache.make_key(upload.sha256, page, size, format)
+        data = preview_cache.get(cache_key)
+        if data is None:
+            data = await process_pool.run(
+                "preview", "preview", upload.path, page=page, size=size, format=format, content_hash=upload.sha256
+            )
+            preview_cache.put(cache_key, data)
+        
+        return Response(content=data, media_type=f"image/{format}")
+            
+    except HTTPException:
+        raise
+    except PreviewPageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Preview error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Preview failed: {str(e)}")
+
 @app.post("/ocr")
-async def extract_text_ocr(
-    file: UploadFile = File(...),
-    language: str = Form(default="eng"),  # OCR language
-    output_format: str = Form(default="txt")  # txt/docx
-):
+async def extract_text_ocr(upload: IngestedUpload = Depends(pdf_upload)):
     """
     Extract text from PDF using OCR
     
-    Parameters:
+    Parameters (multipart form):
     - file: PDF file for OCR
     - language: OCR language (eng/fra/etc.)
     - output_format: Output format (txt/docx)
+    - force_ocr: "true" to OCR pages that already have a usable text layer
+    
+    Page counts per path are reported in X-OCR-Text-Layer-Pages and
+    X-OCR-Tesseract-Pages response headers.
     """
     try:
-        logger.info(f"OCR processing: language={language}, format={output_format}")
-        
-        if not validate_pdf(file):
-            raise HTTPException(status_code=400, detail="Invalid PDF file")
+        language = upload.form("language", "eng")
+        output_format = upload.form("output_format", "txt")
+        force_ocr = _parse_bool(upload.form("force_ocr"))
+        logger.info(f"OCR processing: language={language}, format={output_format}, force_ocr={force_ocr}")
             
-        with create_temp_file(file) as temp_input:
-            result_path = await ocr_service.extract_text(
-                temp_input,
-                language=language,
-                output_format=output_format
-            )
-            
-            media_type = "text/plain" if output_format == "txt" else "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            
-            return create_file_response(
-                result_path,
-                filename=f"ocr_{Path(file.filename).stem}.{output_format}",
-                media_type=media_type
-            )
+        result_path, headers = await run_operation(
+            "ocr",
+            "extract_text_with_report",
+            upload.path,
+            content_hash=upload.sha256,
+            language=language,
+            output_format=output_format,
+            force_ocr=force_ocr
+        )
+        
+        media_type = "text/plain" if output_format == "txt" else "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        
+        return create_file_response(
+            result_path,
+            filename=f"ocr_{Path(upload.filename).stem}.{output_format}",
+            media_type=media_type,
+            workspace=upload.workspace,
+            headers=headers
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"OCR error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"OCR failed: {str(e)}")
 
 @app.post("/summarize")
-async def summarize_pdf(
-    file: UploadFile = File(...),
-    length: str = Form(default="medium"),  # short/medium/long
-    language: str = Form(default="en")     # output language
-):
+async def summarize_pdf(upload: IngestedUpload = Depends(pdf_upload)):
     """
     Summarize PDF content
     
-    Parameters:
+    Parameters (multipart form):
     - file: PDF file to summarize
     - length: Summary length (short/medium/long)
     - language: Output language (en/fr/etc.)
     """
     try:
+        length = upload.form("length", "medium")
+        language = upload.form("language", "en")
         logger.info(f"Summarizing PDF: length={length}, language={language}")
-        
-        if not validate_pdf(file):
-            raise HTTPException(status_code=400, detail="Invalid PDF file")
             
-        with create_temp_file(file) as temp_input:
-            result_path = await summarize_service.summarize(
-                temp_input,
-                length=length,
-                language=language
-            )
-            
-            return create_file_response(
-                result_path,
-                filename=f"summary_{Path(file.filename).stem}.txt",
-                media_type="text/plain"
-            )
+        result_path, headers = await run_operation(
+            "summarize",
+            "summarize",
+            upload.path,
+            content_hash=upload.sha256,
+            length=length,
+            language=language
+        )
+        
+        return create_file_response(
+            result_path,
+            filename=f"summary_{Path(upload.filename).stem}.txt",
+            media_type="text/plain",
+            workspace=upload.workspace,
+            headers=headers
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Summarization error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
 
 @app.post("/translate")
-async def translate_pdf(
-    file: UploadFile = File(...),
-    target_language: str = Form(...),      # Target language code (fr/en/es/etc.)
-    source_language: str = Form(default="auto"),  # Source language (auto-detect)
-    output_format: str = Form(default="txt")      # txt/pdf
-):
+async def translate_pdf(upload: IngestedUpload = Depends(pdf_upload)):
     """
     Translate PDF content
     
-    Parameters:
+    Parameters (multipart form):
     - file: PDF file to translate
-    - target_language: Target language code
+    - target_language: Target language code (fr/en/es/etc.)
     - source_language: Source language (auto for auto-detect)
     - output_format: Output format (txt/pdf)
     """
     try:
+        target_language = upload.form("target_language")
+        source_language = upload.form("source_language", "auto")
+        output_format = upload.form("output_format", "txt")
         logger.info(f"Translating PDF: {source_language} -> {target_language}, format={output_format}")
-        
-        if not validate_pdf(file):
-            raise HTTPException(status_code=400, detail="Invalid PDF file")
-            
-        with create_temp_file(file) as temp_input:
-            result_path = await translate_service.translate(
-                temp_input,
-                target_language=target_language,
-                source_language=source_language,
-                output_format=output_format
-            )
-            
-            media_type = "text/plain" if output_format == "txt" else "application/pdf"
-            extension = output_format if output_format in ["txt", "pdf"] else "txt"
+
+        if not target_language:
+            raise HTTPException(status_code=400, detail="target_language is required")
             
-            return create_file_response(
-                result_path,
-                filename=f"translated_{Path(file.filename).stem}.{extension}",
-                media_type=media_type
-            )
+        result_path, headers = await run_operation(
+            "translate",
+            "translate",
+            upload.path,
+            content_hash=upload.sha256,
+            target_language=target_language,
+            source_language=source_language,
+            output_format=output_format
+        )
+        
+        media_type = "text/plain" if output_format == "txt" else "application/pdf"
+        extension = output_format if output_format in ["txt", "pdf"] else "txt"
+        
+        return create_file_response(
+            result_path,
+            filename=f"translated_{Path(upload.filename).stem}.{extension}",
+            media_type=media_type,
+            workspace=upload.workspace,
+            headers=headers
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Translation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
 @app.post("/secure")
-async def secure_pdf(
-    file: UploadFile = File(...),
-    action: str = Form(...),  # password/watermark/both
-    password: Optional[str] = Form(default=None),
-    watermark_text: Optional[str] = Form(default=None),
-    watermark_position: str = Form(default="center")  # center/corner/diagonal
-):
+async def secure_pdf(upload: IngestedUpload = Depends(pdf_upload)):
     """
     Secure PDF with password and/or watermark
     
-    Parameters:
+    Parameters (multipart form):
     - file: PDF file to secure
     - action: Security action (password/watermark/both)
     - password: Password for encryption
     - watermark_text: Text for watermark
-    - watermark_position: Watermark position
+    - watermark_position: Watermark position (center/corner/diagonal)
     """
     try:
+        action = upload.form("action")
+        password = upload.form("password")
+        watermark_text = upload.form("watermark_text")
+        watermark_position = upload.form("watermark_position", "center")
         logger.info(f"Securing PDF: action={action}")
-        
-        if not validate_pdf(file):
-            raise HTTPException(status_code=400, detail="Invalid PDF file")
             
         if action in ["password", "both"] and not password:
             raise HTTPException(status_code=400, detail="Password required for password protection")
@@ -306,25 +528,176 @@ async def secure_pdf(
         if action in ["watermark", "both"] and not watermark_text:
             raise HTTPException(status_code=400, detail="Watermark text required for watermark")
             
-        with create_temp_file(file) as temp_input:
-            result_path = await secure_service.secure(
-                temp_input,
-                action=action,
-                password=password,
-                watermark_text=watermark_text,
-                watermark_position=watermark_position
-            )
-            
-            return create_file_response(
-                result_path,
-                filename=f"secured_{file.filename}",
-                media_type="application/pdf"
-            )
+        result_path, headers = await run_operation(
+            "secure",
+            "secure",
+            upload.path,
+            content_hash=upload.sha256,
+            action=action,
+            password=password,
+            watermark_text=watermark_text,
+            watermark_position=watermark_position
+        )
+        
+        return create_file_response(
+            result_path,
+            filename=f"secured_{upload.filename}",
+            media_type="application/pdf",
+            workspace=upload.workspace,
+            headers=headers
+        )
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Security error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Security operation failed: {str(e)}")
 
+def _prepare_job(operation: str, form, filename: str) -> Tuple[str, Dict[str, Any], str, str]:
+    """
+    Validate the form fields of a job submission
+
+    Returns:
+        (service method, service kwargs, output filename, media type)
+    """
+    stem = Path(filename).stem
+
+    if operation == "compress":
+        kwargs = {
+            "mode": form.get("mode", "whatsapp"),
+            "quality": form.get("quality", "medium"),
+            "target_bytes": _parse_target_bytes(form.get("target_bytes"))
+        }
+        return "compress_with_report", kwargs, f"compressed_{filename}", "application/pdf"
+
+    if operation == "convert":
+        target_format = form.get("format")
+        if target_format not in CONVERT_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail="Unsupported format")
+        kwargs = {"target_format": target_format, "options": form.get("options")}
+        if _is_zip_export(target_format, form.get("options")):
+            return "convert", kwargs, f"converted_{stem}.zip", "application/zip"
+        return "convert", kwargs, f"converted_{stem}.{target_format}", CONVERT_MEDIA_TYPES[target_format]
+
+    if operation == "ocr":
+        output_format = form.get("output_format", "txt")
+        kwargs = {
+            "language": form.get("language", "eng"),
+            "output_format": output_format,
+            "force_ocr": _parse_bool(form.get("force_ocr"))
+        }
+        media_type = "text/plain" if output_format == "txt" else "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        return "extract_text_with_report", kwargs, f"ocr_{stem}.{output_format}", media_type
+
+    if operation == "summarize":
+        kwargs = {"length": form.get("length", "medium"), "language": form.get("language", "en")}
+        return "summarize", kwargs, f"summary_{stem}.txt", "text/plain"
+
+    if operation == "translate":
+        if not form.get("target_language"):
+            raise HTTPException(status_code=400, detail="target_language is required")
+        output_format = form.get("output_format", "txt")
+        kwargs = {
+            "target_language": form.get("target_language"),
+            "source_language": form.get("source_language", "auto"),
+            "output_format": output_format
+        }
+        media_type = "text/plain" if output_format == "txt" else "application/pdf"
+        extension = output_format if output_format in ["txt", "pdf"] else "txt"
+        return "translate", kwargs, f"translated_{stem}.{extension}", media_type
+
+    if operation == "secure":
+        action = form.get("action")
+        if action not in ["password", "watermark", "both"]:
+            raise HTTPException(status_code=400, detail="Invalid security action")
+        if action in ["password", "both"] and not form.get("password"):
+            raise HTTPException(status_code=400, detail="Password required for password protection")
+        if action in ["watermark", "both"] and not form.get("watermark_text"):
+            raise HTTPException(status_code=400, detail="Watermark text required for watermark")
+        kwargs = {
+            "action": action,
+            "password": form.get("password"),
+            "watermark_text": form.get("watermark_text"),
+            "watermark_position": form.get("watermark_position", "center")
+        }
+        return "secure", kwargs, f"secured_{filename}", "application/pdf"
+
+    raise HTTPException(status_code=404, detail=f"Unknown operation: {operation}")
+
+async def _run_job(job, input_path: str, content_hash: str, method: str, kwargs: Dict[str, Any]):
+    """Run a submitted job in the worker pool and record its outcome"""
+    try:
+        job.update(status="running")
+        result_path, headers = await run_operation(job.operation, method, input_path, content_hash=content_hash, **kwargs)
+        job.update(status="completed", result_path=job.workspace.adopt(result_path), headers=headers)
+        logger.info(f"Job {job.id} completed: {job.operation}")
+
+    except Exception as e:
+        logger.error(f"Job {job.id} failed: {str(e)}")
+        job.update(status="failed", error=str(e))
+
+    finally:
+        try:
+            os.unlink(input_path)
+        except OSError as e:
+            logger.warning(f"Failed to delete job input {input_path}: {e}")
+
+@app.post("/jobs/{operation}", status_code=202)
+async def submit_job(operation: str, upload: IngestedUpload = Depends(pdf_upload)):
+    """
+    Submit a PDF operation to run in the background
+    
+    Parameters:
+    - operation: compress/convert/ocr/summarize/translate/secure
+    - file: PDF file to process
+    - other form fields: same as the synchronous endpoint
+    
+    Returns the job id immediately; poll GET /jobs/{job_id} for status.
+    """
+    method, kwargs, filename, media_type = _prepare_job(operation, upload.fields, upload.filename)
+
+    # The job owns the upload workspace from here on; it is deleted on eviction
+    job = job_store.create(operation)
+    job.update(filename=filename, media_type=media_type, workspace=upload.detach())
+    job.task = asyncio.create_task(_run_job(job, upload.path, upload.sha256, method, kwargs))
+
+    logger.info(f"Job {job.id} queued: {operation}")
+
+    return {
+        **job.to_dict(),
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get job status"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Download the output of a completed job"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Job failed: {job.error}")
+
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Job not finished (status: {job.status})")
+
+    return create_file_response(
+        job.result_path,
+        filename=job.filename,
+        media_type=job.media_type,
+        headers=job.headers
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -2,11 +2,32 @@ import pikepdf
 import tempfile
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, List, Tuple
+from config import settings as app_settings
+from utils.image_utils import (
+    image_placements, effective_dpi, is_jpeg_candidate,
+    decode_image, encode_image, replace_encoded, jpeg_bytes_per_pixel
+)
+from utils.dedup_utils import deduplicate_objects
 from utils.response_utils import create_temp_binary_file
+from utils.result_cache import FallbackResult
 
 logger = logging.getLogger(__name__)
 
+# (target DPI, JPEG quality) levels tried for target-size compression, best first
+TARGET_LADDER = [
+    (300, 85), (200, 80), (200, 70), (150, 65), (150, 55),
+    (120, 50), (100, 45), (100, 35), (72, 30), (72, 20)
+]
+
+# Aim slightly under the budget since estimates are approximate
+TARGET_SAFETY_MARGIN = 0.95
+
+# Full saves tried before settling for the best effort
+MAX_TARGET_ATTEMPTS = 3
+
 class CompressService:
     """
     Service for PDF compression using pikepdf
@@ -16,84 +37,250 @@ class CompressService:
         self.compression_settings = {
             "whatsapp": {
                 "jpeg_quality": 60,
+                "target_dpi": 150,
                 "image_compression": True,
                 "remove_metadata": True,
                 "optimize_images": True
             },
             "print": {
                 "jpeg_quality": 85,
+                "target_dpi": None,
                 "image_compression": False,
                 "remove_metadata": False,
                 "optimize_images": False
             },
             "balanced": {
                 "jpeg_quality": 75,
+                "target_dpi": 200,
+                "image_compression": True,
+                "remove_metadata": True,
+                "optimize_images": True
+            },
+            "scan": {
+                "jpeg_quality": 60,
+                "target_dpi": 150,
+                "bilevel_dpi": 300,  # 1-bit pages keep more resolution for legible text
+                "scan_images": True,
                 "image_compression": True,
                 "remove_metadata": True,
                 "optimize_images": True
             }
         }
     
-    async def compress(self, input_path: str, mode: str = "whatsapp", quality: str = "medium") -> str:
+    async def compress(self, input_path: str, mode: str = "whatsapp", quality: str = "medium",
+                       target_bytes: int = None) -> str:
         """
         Compress PDF file
         
         Args:
             input_path: Path to input PDF
-            mode: Compression mode (whatsapp/print/balanced)
+            mode: Compression mode (whatsapp/print/balanced/scan)
             quality: Quality level (low/medium/high)
+            target_bytes: Optional size budget; overrides quality when set
             
         Returns:
             Path to compressed PDF
         """
+        output_path, _ = await self.compress_with_report(input_path, mode, quality, target_bytes)
+        return output_path
+    
+    async def compress_with_report(self, input_path: str, mode: str = "whatsapp", quality: str = "medium",
+                                   target_bytes: int = None) -> Tuple[str, Dict[str, str]]:
+        """
+        Compress PDF file and report the settings that were used
+        
+        Args:
+            input_path: Path to input PDF
+            mode: Compression mode (whatsapp/print/balanced/scan)
+            quality: Quality level (low/medium/high)
+            target_bytes: Optional size budget; overrides quality when set
+            
+        Returns:
+            (path to compressed PDF, report as response headers)
+        """
         try:
-            logger.info(f"Compressing PDF: {input_path}, mode={mode}, quality={quality}")
+            logger.info(f"Compressing PDF: {input_path}, mode={mode}, quality={quality}, target_bytes={target_bytes}")
             
             # Get compression settings
             settings = self.compression_settings.get(mode, self.compression_settings["balanced"])
             
+            if target_bytes:
+                return self._compress_to_target(input_path, settings, target_bytes)
+            
             # Adjust quality based on quality parameter
             quality_multiplier = {"low": 0.7, "medium": 1.0, "high": 1.3}
             jpeg_quality = int(settings["jpeg_quality"] * quality_multiplier.get(quality, 1.0))
             jpeg_quality = max(10, min(100, jpeg_quality))  # Clamp between 10-100
             
-            # Open PDF
-            with pikepdf.open(input_path) as pdf:
-                
-                # Remove metadata if specified
-                if settings["remove_metadata"]:
-                    self._remove_metadata(pdf)
-                
-                # Optimize images if specified
-                if settings["optimize_images"]:
-                    self._optimize_images(pdf, jpeg_quality)
-                
-                # Create output file
-                output_path = create_temp_binary_file(b"", "pdf")
+            output_path, dedup = self._compress_to_file(input_path, settings, jpeg_quality, settings["target_dpi"])
+            
+            report = {
+                "X-Compression-Quality": str(jpeg_quality),
+                "X-Compression-DPI": str(settings["target_dpi"] or "original"),
+                **self._dedup_headers(dedup)
+            }
+            return output_path, report
                 
-                # Save with compression
+        except Exception as e:
+            logger.error(f"Compression failed: {e}")
+            # Create a placeholder result for testing
+            return self._create_placeholder_result(input_path, mode, quality), {}
+    
+    def _compress_to_file(self, input_path: str, settings: dict, jpeg_quality: int, target_dpi: int,
+                          optimize_images: bool = None) -> Tuple[str, Dict[str, int]]:
+        """
+        Apply one set of compression settings and save the result
+        
+        Returns:
+            (path to compressed PDF, deduplication report)
+        """
+        if optimize_images is None:
+            optimize_images = settings["optimize_images"]
+        
+        # Open PDF
+        with pikepdf.open(input_path) as pdf:
+            
+            # Remove metadata if specified
+            if settings["remove_metadata"]:
+                self._remove_metadata(pdf)
+            
+            # Share identical images/fonts/forms (before images are re-encoded once each)
+            dedup = deduplicate_objects(pdf)
+            
+            # Optimize images if specified
+            if optimize_images:
+                self._optimize_images(pdf, jpeg_quality, target_dpi,
+                                      scan=settings.get("scan_images", False),
+                                      bilevel_dpi=settings.get("bilevel_dpi"))
+            
+            # Create output file
+            output_path = create_temp_binary_file(b"", "pdf")
+            
+            # Save with compression
+            try:
                 pdf.save(
                     output_path,
                     compress_streams=True,
                     stream_decode_level=pikepdf.StreamDecodeLevel.generalized if settings["image_compression"] else pikepdf.StreamDecodeLevel.none,
                     object_stream_mode=pikepdf.ObjectStreamMode.generate,
-                    normalize_content=True,
                     linearize=True
                 )
-                
-                # Log compression results
-                original_size = os.path.getsize(input_path)
-                compressed_size = os.path.getsize(output_path)
-                compression_ratio = (1 - compressed_size / original_size) * 100
-                
-                logger.info(f"Compression completed: {original_size} -> {compressed_size} bytes ({compression_ratio:.1f}% reduction)")
-                
-                return output_path
-                
-        except Exception as e:
-            logger.error(f"Compression failed: {e}")
-            # Create a placeholder result for testing
-            return self._create_placeholder_result(input_path, mode, quality)
+            except Exception:
+                # Don't leave the empty output behind when falling back
+                os.unlink(output_path)
+                raise
+            
+            # Log compression results
+            original_size = os.path.getsize(input_path)
+            compressed_size = os.path.getsize(output_path)
+            compression_ratio = (1 - compressed_size / original_size) * 100
+            
+            logger.info(f"Compression completed: {original_size} -> {compressed_size} bytes ({compression_ratio:.1f}% reduction)")
+            
+            return output_path, dedup
+    
+    def _dedup_headers(self, dedup: Dict[str, int]) -> Dict[str, str]:
+        """Deduplication report as response headers"""
+        return {
+            "X-Dedup-Merged-Objects": str(dedup["merged_objects"]),
+            "X-Dedup-Removed-Objects": str(dedup["removed_objects"]),
+            "X-Dedup-Reclaimed-Bytes": str(dedup["reclaimed_bytes"])
+        }
+    
+    def _compress_to_target(self, input_path: str, settings: dict, target_bytes: int) -> Tuple[str, Dict[str, str]]:
+        """
+        Compress with the best quality/downsampling level that fits `target_bytes`
+        
+        The level is picked from size estimates (see _estimate_ladder_sizes),
+        so normally a single save is needed; if the real output is still too
+        big, the next levels down are tried.
+        
+        Returns:
+            (path to compressed PDF, report as response headers)
+        """
+        estimates = self._estimate_ladder_sizes(input_path)
+        
+        # Highest-quality level whose estimate fits with a safety margin (else the smallest)
+        start = next(
+            (i for i, (_, _, estimate) in enumerate(estimates) if estimate <= target_bytes * TARGET_SAFETY_MARGIN),
+            len(estimates) - 1
+        )
+        attempts = list(range(start, min(start + MAX_TARGET_ATTEMPTS, len(estimates))))
+        
+        for index in attempts:
+            target_dpi, jpeg_quality, estimate = estimates[index]
+            output_path, dedup = self._compress_to_file(input_path, settings, jpeg_quality, target_dpi, optimize_images=True)
+            output_size = os.path.getsize(output_path)
+            logger.info(f"Target compression: dpi={target_dpi}, quality={jpeg_quality}, estimated={estimate}, actual={output_size}")
+            
+            if output_size <= target_bytes or index == attempts[-1]:
+                break
+            os.unlink(output_path)
+        
+        report = {
+            "X-Compression-Target-Bytes": str(target_bytes),
+            "X-Compression-Target-Met": "true" if output_size <= target_bytes else "false",
+            "X-Compression-Quality": str(jpeg_quality),
+            "X-Compression-DPI": str(target_dpi),
+            "X-Compression-Estimated-Bytes": str(estimate),
+            "X-Compression-Output-Bytes": str(output_size),
+            "X-Compression-Attempts": str(attempts.index(index) + 1),
+            **self._dedup_headers(dedup)
+        }
+        return output_path, report
+    
+    def _estimate_ladder_sizes(self, input_path: str) -> List[Tuple[int, int, int]]:
+        """
+        Estimate the output size at every level of TARGET_LADDER
+        
+        Each recompressible image is trial-encoded once per JPEG quality at a
+        reduced resolution; the bytes-per-pixel figures are then scaled to
+        each level's pixel count. Everything else is assumed to keep its size.
+        
+        Returns:
+            [(target_dpi, jpeg_quality, estimated bytes)] in ladder order
+        """
+        original_size = os.path.getsize(input_path)
+        qualities = sorted({quality for _, quality in TARGET_LADDER})
+        images = []  # (raw size, pixel count, effective dpi, future of {quality: bytes per pixel})
+        
+        with pikepdf.open(input_path) as pdf:
+            # Duplicates will not be written, so leave them out of the estimate
+            reclaimed = deduplicate_objects(pdf)["reclaimed_bytes"]
+            
+            candidates = []
+            for objgen, placement in image_placements(pdf).items():
+                image = pdf.get_object(objgen)
+                if is_jpeg_candidate(image):
+                    candidates.append((image, placement))
+            
+            workers = app_settings.image_workers
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for start in range(0, len(candidates), workers * 2):
+                    batch = []
+                    for image, placement in candidates[start:start + workers * 2]:
+                        pil = decode_image(image)
+                        if pil is None:
+                            continue
+                        dpi = effective_dpi(pil.width, pil.height, placement)
+                        future = executor.submit(jpeg_bytes_per_pixel, pil, qualities)
+                        batch.append((len(image.read_raw_bytes()), pil.width * pil.height, dpi, future))
+                    
+                    for raw_size, pixels, dpi, future in batch:
+                        images.append((raw_size, pixels, dpi, future.result()))
+        
+        fixed_size = original_size - reclaimed - sum(raw_size for raw_size, _, _, _ in images)
+        
+        estimates = []
+        for target_dpi, jpeg_quality in TARGET_LADDER:
+            total = fixed_size
+            for raw_size, pixels, dpi, bytes_per_pixel in images:
+                scale = min(1.0, target_dpi / dpi) if dpi else 1.0
+                # Images are only replaced when the re-encode is smaller
+                total += min(raw_size, int(bytes_per_pixel[jpeg_quality] * pixels * scale * scale))
+            estimates.append((target_dpi, jpeg_quality, max(0, total)))
+        
+        return estimates
     
     def _remove_metadata(self, pdf: pikepdf.Pdf):
         """Remove metadata from PDF"""
@@ -103,18 +290,56 @@ class CompressService:
         except Exception as e:
             logger.warning(f"Could not remove metadata: {e}")
     
-    def _optimize_images(self, pdf: pikepdf.Pdf, jpeg_quality: int):
-        """Optimize images in PDF"""
+    def _optimize_images(self, pdf: pikepdf.Pdf, jpeg_quality: int, target_dpi: int = None,
+                         scan: bool = False, bilevel_dpi: int = None):
+        """
+        Recompress images in PDF
+        
+        Each image is decoded, downsampled to `target_dpi` at its placement size,
+        re-encoded as JPEG and swapped in only if the result is smaller.
+        With `scan`, bilevel images are stored as 1-bit (CCITT G4/Flate at
+        `bilevel_dpi`) and grayscale ones as gray JPEG.
+        Encoding runs on a thread pool; pikepdf access stays on this thread.
+        """
         try:
-            for page in pdf.pages:
-                if '/Resources' in page and '/XObject' in page['/Resources']:
-                    xobjects = page['/Resources']['/XObject']
-                    for name in xobjects:
-                        obj = xobjects[name]
-                        if '/Subtype' in obj and obj['/Subtype'] == '/Image':
-                            # This is a simplified optimization
-                            # In a full implementation, you would decode, resize, and re-encode images
-                            pass
+            placements = image_placements(pdf)
+            candidates = []
+            for objgen, placement in placements.items():
+                image = pdf.get_object(objgen)
+                if is_jpeg_candidate(image):
+                    candidates.append((image, placement))
+            
+            if not candidates:
+                return
+            
+            workers = app_settings.image_workers
+            saved_bytes = 0
+            replaced = 0
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # Work in batches so only a few decoded images are in memory at once
+                for start in range(0, len(candidates), workers * 2):
+                    batch = []
+                    for image, placement in candidates[start:start + workers * 2]:
+                        pil = decode_image(image)
+                        if pil is None:
+                            continue
+                        
+                        dpi = effective_dpi(pil.width, pil.height, placement)
+                        scale = target_dpi / dpi if target_dpi and dpi > target_dpi else 1.0
+                        bilevel_scale = bilevel_dpi / dpi if bilevel_dpi and dpi > bilevel_dpi else 1.0
+                        batch.append((image, executor.submit(encode_image, pil, scale, jpeg_quality, scan, bilevel_scale)))
+                    
+                    for image, future in batch:
+                        data, width, height, kind = future.result()
+                        original_size = len(image.read_raw_bytes())
+                        if len(data) < original_size:
+                            replace_encoded(image, data, width, height, kind)
+                            saved_bytes += original_size - len(data)
+                            replaced += 1
+            
+            logger.info(f"Images optimized: {replaced}/{len(candidates)} replaced, {saved_bytes} bytes saved")
+            
         except Exception as e:
             logger.warning(f"Could not optimize images: {e}")
     
@@ -130,7 +355,7 @@ class CompressService:
             output_path = create_temp_binary_file(content, "pdf")
             
             logger.info(f"Created placeholder compressed PDF: {output_path}")
-            return output_path
+            return FallbackResult(output_path)
             
         except Exception as e:
             logger.error(f"Failed to create placeholder result: {e}")
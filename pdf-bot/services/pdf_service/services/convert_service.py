@@ -1,16 +1,47 @@
-import pdf2image
-import tempfile
-import os
 import json
+import io
+import zipfile
 import logging
 from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+import pikepdf
 from PIL import Image
 from docx import Document
+from docx.shared import Pt
 import openpyxl
+from config import settings
+from pdfminer.high_level import extract_pages
+from utils.image_utils import encode_page, full_page_image, page_image_bytes
+from utils.layout_utils import TextBlock, page_blocks, page_figures
+from utils.table_utils import extract_table_rows
+from utils.render_utils import render_pages, page_pixel_sizes
+from utils.stitch_utils import ImageTooLargeError, stitch_vertical
 from utils.response_utils import create_temp_binary_file, create_temp_response_file
+from utils.result_cache import FallbackResult
+from utils.file_utils import file_sha256
+from utils.page_cache import page_cache
 
 logger = logging.getLogger(__name__)
 
+# DOCX page images: "image_codec" option -> encode_page format, and default JPEG quality
+DOCX_IMAGE_CODECS = {"auto": "auto", "jpeg": "JPEG", "png": "PNG"}
+DOCX_JPEG_QUALITY = 85
+
+class _UnseekableWriter:
+    """
+    Write-only file wrapper without tell/seek, so zipfile streams entries
+    (data descriptors) instead of patching headers that were already read
+    """
+    
+    def __init__(self, f):
+        self.f = f
+    
+    def write(self, data: bytes) -> int:
+        return self.f.write(data)
+    
+    def flush(self):
+        self.f.flush()
+
 class ConvertService:
     """
     Service for PDF conversion to various formats
@@ -19,7 +50,8 @@ class ConvertService:
     def __init__(self):
         self.supported_formats = ["docx", "xlsx", "img", "png", "jpg", "jpeg"]
     
-    async def convert(self, input_path: str, target_format: str, options: str = None) -> str:
+    async def convert(self, input_path: str, target_format: str, options: str = None,
+                      content_hash: Optional[str] = None) -> str:
         """
         Convert PDF to target format
         
@@ -27,6 +59,7 @@ class ConvertService:
             input_path: Path to input PDF
             target_format: Target format (docx/xlsx/img/png/jpg/jpeg)
             options: Additional options as JSON string
+            content_hash: SHA-256 of the input, if already computed during upload
             
         Returns:
             Path to converted file
@@ -44,130 +77,331 @@ class ConvertService:
             
             # Convert based on target format
             if target_format == "docx":
-                return await self._convert_to_docx(input_path, opts)
+                return await self._convert_to_docx(input_path, opts, content_hash)
             elif target_format == "xlsx":
                 return await self._convert_to_xlsx(input_path, opts)
+            elif target_format in ["img", "png", "jpg", "jpeg"] and opts.get('output') == "zip":
+                return await self.convert_to_zip(input_path, create_temp_binary_file(b"", "zip"), target_format, options, content_hash)
             elif target_format in ["img", "png", "jpg", "jpeg"]:
-                return await self._convert_to_image(input_path, target_format, opts)
+                return await self._convert_to_image(input_path, target_format, opts, content_hash)
             else:
                 raise ValueError(f"Unsupported format: {target_format}")
                 
+        except ImageTooLargeError:
+            raise
         except Exception as e:
             logger.error(f"Conversion failed: {e}")
             # Create placeholder result for testing
             return self._create_placeholder_result(input_path, target_format)
     
-    async def _convert_to_docx(self, input_path: str, options: dict) -> str:
-        """Convert PDF to DOCX"""
+    async def _convert_to_docx(self, input_path: str, options: dict, content_hash: Optional[str] = None) -> str:
+        """
+        Convert PDF to DOCX
+        
+        Pages with a text layer are rebuilt as editable paragraphs and
+        headings, with their photos and figures cropped from a render of
+        the page and placed between the paragraphs; only image-only pages
+        (scans) are embedded as whole images. Option "text_layer": false
+        embeds every page as an image.
+        
+        Page images are encoded in memory, as JPEG for photos and PNG for
+        line art unless option "image_codec" (jpeg/png) forces one.
+        """
         try:
-            # Convert PDF pages to images
-            images = pdf2image.convert_from_path(
-                input_path,
-                dpi=options.get('dpi', 200),
-                first_page=options.get('first_page'),
-                last_page=options.get('last_page')
-            )
+            codec = DOCX_IMAGE_CODECS.get(options.get('image_codec', 'auto'), 'auto')
+            image_options = dict(options, quality=options.get('quality', DOCX_JPEG_QUALITY))
+            
+            with pikepdf.open(input_path) as pdf:
+                page_count = len(pdf.pages)
+            first = max(1, options.get('first_page') or 1)
+            last = min(page_count, options.get('last_page') or page_count)
             
             # Create DOCX document
             doc = Document()
             doc.add_heading('Converted from PDF', 0)
             
-            # Add each page as an image
-            for i, image in enumerate(images):
-                # Save image to temporary file
-                temp_img = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-                image.save(temp_img.name, 'PNG')
-                
-                # Add to document
-                doc.add_paragraph(f'Page {i + 1}:')
-                doc.add_picture(temp_img.name, width=doc.sections[0].page_width - doc.sections[0].left_margin - doc.sections[0].right_margin)
-                doc.add_page_break()
-                
-                # Clean up temp image
-                os.unlink(temp_img.name)
+            text_pages = 0
+            image_pages = []  # Run of consecutive image-only pages, rendered together
+            
+            # Page cache key, hashed once rather than by every page render
+            if content_hash is None and page_cache is not None:
+                content_hash = file_sha256(input_path)
+            
+            if options.get('text_layer', True):
+                layouts = extract_pages(input_path, page_numbers=range(first - 1, last))
+                for number, layout in zip(range(first, last + 1), layouts):
+                    blocks = page_blocks(layout)
+                    if not blocks:
+                        image_pages.append(number)
+                        continue
+                    
+                    self._add_image_pages(doc, input_path, image_pages, codec, image_options, content_hash)
+                    image_pages = []
+                    figures = self._page_figures(input_path, number, layout, codec, image_options, content_hash)
+                    self._add_text_page(doc, blocks, figures)
+                    text_pages += 1
+            else:
+                image_pages = list(range(first, last + 1))
+            
+            self._add_image_pages(doc, input_path, image_pages, codec, image_options, content_hash)
             
             # Save DOCX
             output_path = create_temp_binary_file(b"", "docx")
             doc.save(output_path)
             
-            logger.info(f"DOCX conversion completed: {output_path}")
+            logger.info(f"DOCX conversion completed: {output_path} ({text_pages}/{last - first + 1} pages as text)")
             return output_path
             
         except Exception as e:
             logger.error(f"DOCX conversion failed: {e}")
             raise
     
+    def _page_figures(self, input_path: str, number: int, layout, codec: str, options: dict,
+                      content_hash: Optional[str] = None) -> List[Tuple[float, float, bytes]]:
+        """
+        Images/figures of a text page, cropped from one render of the page
+
+        Returns:
+            (top in PDF points, width as a fraction of the page, encoded image) per figure
+        """
+        boxes = page_figures(layout)
+        if not boxes:
+            return []
+        
+        figures = []
+        for page in render_pages(input_path, dpi=options.get('dpi', 200), first_page=number, last_page=number,
+                                 content_hash=content_hash):
+            image = page.load()
+            scale_x = image.width / layout.width
+            scale_y = image.height / layout.height
+            for x0, y0, x1, y1 in boxes:
+                crop = image.crop((
+                    round((x0 - layout.x0) * scale_x), round((layout.y1 - y1) * scale_y),
+                    round((x1 - layout.x0) * scale_x), round((layout.y1 - y0) * scale_y)
+                ))
+                if crop.width and crop.height:
+                    data = encode_page(crop, codec, options.get('quality', 95))
+                    figures.append((y1, (x1 - x0) / layout.width, data))
+        
+        logger.debug(f"Page {number}: {len(figures)} figures kept with the text")
+        return figures
+    
+    def _add_text_page(self, doc: Document, blocks: List[TextBlock], figures: List[Tuple[float, float, bytes]] = None):
+        """
+        Add a page's paragraphs and headings, keeping bold/italic/size per
+        run; each figure goes before the first block that starts below it
+        """
+        width = doc.sections[0].page_width - doc.sections[0].left_margin - doc.sections[0].right_margin
+        figures = list(figures or [])
+        
+        def add_figures(above: float):
+            while figures and figures[0][0] >= above:
+                _, fraction, data = figures.pop(0)
+                doc.add_picture(io.BytesIO(data), width=int(width * min(1.0, fraction)))
+        
+        for block in blocks:
+            add_figures(block.bbox[3])
+            if block.heading_level:
+                doc.add_heading(block.text, level=block.heading_level)
+                continue
+            
+            paragraph = doc.add_paragraph()
+            for run in block.runs:
+                docx_run = paragraph.add_run(run.text)
+                docx_run.bold = run.bold or None
+                docx_run.italic = run.italic or None
+                if run.size:
+                    docx_run.font.size = Pt(run.size)
+        
+        add_figures(float("-inf"))
+        doc.add_page_break()
+    
+    def _add_image_pages(self, doc: Document, input_path: str, page_numbers: List[int], codec: str, options: dict,
+                         content_hash: Optional[str] = None):
+        """Add a run of consecutive pages as images, encoded in memory"""
+        if not page_numbers:
+            return
+        
+        width = doc.sections[0].page_width - doc.sections[0].left_margin - doc.sections[0].right_margin
+        for number, data in self._page_images(input_path, page_numbers[0], page_numbers[-1], codec, options, content_hash):
+            doc.add_paragraph(f'Page {number}:')
+            doc.add_picture(io.BytesIO(data), width=width)
+            doc.add_page_break()
+    
     async def _convert_to_xlsx(self, input_path: str, options: dict) -> str:
-        """Convert PDF to XLSX (placeholder implementation)"""
+        """
+        Convert PDF tables to XLSX
+        
+        Each page's grid is rebuilt from its character positions (see
+        extract_table_rows) and streamed into a write-only workbook, one page
+        at a time. Pages go one after another on a single sheet, separated by
+        an empty row, or on their own sheets with option "sheet_per_page".
+        """
         try:
-            # Create Excel workbook
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "PDF Content"
+            with pikepdf.open(input_path) as pdf:
+                page_count = len(pdf.pages)
+            first = max(1, options.get('first_page') or 1)
+            last = min(page_count, options.get('last_page') or page_count)
+            sheet_per_page = options.get('sheet_per_page', False)
             
-            # Add header
-            ws['A1'] = "PDF Conversion"
-            ws['A2'] = f"Source: {Path(input_path).name}"
-            ws['A3'] = "Note: This is a placeholder implementation"
-            ws['A4'] = "Full implementation would extract tables and data"
+            # Write-only workbook: rows are flushed to disk as they are appended
+            wb = openpyxl.Workbook(write_only=True)
+            ws = None if sheet_per_page else wb.create_sheet("PDF Content")
+            written_rows = 0
+            
+            layouts = extract_pages(input_path, page_numbers=range(first - 1, last))
+            for number, layout in zip(range(first, last + 1), layouts):
+                rows = extract_table_rows(layout)
+                
+                if sheet_per_page:
+                    ws = wb.create_sheet(f"Page {number}")
+                elif written_rows and rows:
+                    ws.append([])
+                
+                for row in rows:
+                    ws.append(row)
+                written_rows += len(rows)
+            
+            if not written_rows:
+                ws = ws or wb.create_sheet("PDF Content")
+                ws.append(["No text layer found in this PDF (scanned pages need OCR first)"])
             
             # Save Excel file
             output_path = create_temp_binary_file(b"", "xlsx")
             wb.save(output_path)
             
-            logger.info(f"XLSX conversion completed: {output_path}")
+            logger.info(f"XLSX conversion completed: {output_path} ({written_rows} rows)")
             return output_path
             
         except Exception as e:
             logger.error(f"XLSX conversion failed: {e}")
             raise
     
-    async def _convert_to_image(self, input_path: str, format: str, options: dict) -> str:
+    def _page_images(self, input_path: str, first_page: Optional[int], last_page: Optional[int],
+                     image_format: str, options: dict, content_hash: Optional[str] = None) -> Iterator[Tuple[int, bytes]]:
+        """
+        Encoded image of each page (PNG/JPEG/auto, see encode_page), in page order
+        
+        Pages that are a single full-page image (scans) are extracted from
+        the PDF at their native resolution, passing JPEG data through where
+        possible; runs of other pages are rendered at the requested DPI.
+        Option "extract_images": false renders every page.
+        """
+        dpi = options.get('dpi', 200)
+        quality = options.get('quality', 95)
+        extract = options.get('extract_images', True)
+        
+        def rendered(numbers: List[int]) -> Iterator[Tuple[int, bytes]]:
+            nonlocal content_hash
+            if not numbers:
+                return
+            if content_hash is None and page_cache is not None:
+                content_hash = file_sha256(input_path)  # Once for all runs, not by each render_pages
+            for page in render_pages(input_path, dpi=dpi, first_page=numbers[0], last_page=numbers[-1],
+                                     content_hash=content_hash):
+                yield page.number, encode_page(page.load(), image_format, quality)
+        
+        with pikepdf.open(input_path) as pdf:
+            first = max(1, first_page or 1)
+            last = min(len(pdf.pages), last_page or len(pdf.pages))
+            pending = []  # Run of consecutive pages to render together
+            extracted = 0
+            
+            for number in range(first, last + 1):
+                image = full_page_image(pdf.pages[number - 1]) if extract else None
+                data = page_image_bytes(image, image_format, quality) if image is not None else None
+                if data is None:
+                    pending.append(number)
+                    continue
+                
+                yield from rendered(pending)
+                pending = []
+                extracted += 1
+                yield number, data
+            
+            yield from rendered(pending)
+        
+        logger.info(f"Page images: {extracted} of {last - first + 1} pages extracted without rendering")
+    
+    async def convert_to_zip(self, input_path: str, output_path: str, target_format: str, options: str = None,
+                             content_hash: Optional[str] = None) -> str:
+        """
+        Export every page as an image inside a ZIP archive
+        
+        Each page is encoded and appended to the archive as soon as it is
+        ready (scanned pages are extracted rather than rendered, see
+        _page_images), and the archive is written without seeking back (sizes go
+        in data descriptors), so readers can stream `output_path` while it
+        grows. Memory use is one page regardless of the page count.
+        
+        Args:
+            input_path: Path to input PDF
+            output_path: Archive to write (created or truncated)
+            target_format: Page image format (img/png/jpg/jpeg)
+            options: Additional options as JSON string (dpi, first_page, last_page, quality, extract_images)
+            content_hash: SHA-256 of the input, if already computed during upload
+            
+        Returns:
+            Path to the ZIP archive
+        """
+        opts = json.loads(options) if options else {}
+        extension = "jpg" if target_format in ["jpg", "jpeg"] else "png"
+        image_format = "JPEG" if extension == "jpg" else "PNG"
+        
+        pages = self._page_images(input_path, opts.get('first_page'), opts.get('last_page'), image_format, opts, content_hash)
+        with open(output_path, 'wb') as f:
+            stream = _UnseekableWriter(f)
+            archive = zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED)
+            count = 0
+            try:
+                for number, data in pages:
+                    archive.writestr(f"page_{number:04d}.{extension}", data)
+                    f.flush()
+                    count += 1
+            except BaseException:
+                # Abandon the archive: without its central directory a failed export never reads
+                # as complete (ZipFile would otherwise write one when garbage-collected)
+                archive.fp = None
+                raise
+            archive.close()
+        
+        logger.info(f"ZIP export completed: {output_path} ({count} pages)")
+        return output_path
+    
+    async def _convert_to_image(self, input_path: str, format: str, options: dict, content_hash: Optional[str] = None) -> str:
         """Convert PDF to image format"""
         try:
-            # Convert PDF to images
-            images = pdf2image.convert_from_path(
-                input_path,
-                dpi=options.get('dpi', 200),
-                first_page=options.get('first_page'),
-                last_page=options.get('last_page')
-            )
-            
-            if not images:
-                raise ValueError("No images generated from PDF")
+            dpi = options.get('dpi', 200)
+            first_page = options.get('first_page')
+            last_page = options.get('last_page')
             
             # Determine output format
             output_format = format.upper() if format in ["jpg", "jpeg"] else "PNG"
             if format in ["jpg", "jpeg"]:
                 output_format = "JPEG"
             
-            # If single page, return single image
-            if len(images) == 1:
-                output_path = create_temp_binary_file(b"", format)
-                images[0].save(output_path, output_format, quality=options.get('quality', 95))
-                return output_path
-            
             # Multiple pages - create a combined image or return first page
             if options.get('combine_pages', False):
-                # Combine all pages vertically
-                total_width = max(img.width for img in images)
-                total_height = sum(img.height for img in images)
+                # Combine all pages vertically, written page by page (the cap is checked before rendering)
+                sizes = page_pixel_sizes(input_path, dpi, first_page, last_page)
+                if not sizes:
+                    raise ValueError("No images generated from PDF")
                 
-                combined = Image.new('RGB', (total_width, total_height), 'white')
-                y_offset = 0
-                
-                for img in images:
-                    combined.paste(img, (0, y_offset))
-                    y_offset += img.height
+                pages = (page.load() for page in render_pages(input_path, dpi, first_page, last_page, content_hash=content_hash))
                 
                 output_path = create_temp_binary_file(b"", format)
-                combined.save(output_path, output_format, quality=options.get('quality', 95))
-                return output_path
+                return stitch_vertical(
+                    pages, sizes, output_path, output_format,
+                    max_pixels=settings.stitch_max_pixels,
+                    quality=options.get('quality', 95)
+                )
             else:
-                # Return first page only
-                output_path = create_temp_binary_file(b"", format)
-                images[0].save(output_path, output_format, quality=options.get('quality', 95))
-                return output_path
+                # Return first page only, so only that page is rendered (or extracted)
+                first = first_page or 1
+                for _, data in self._page_images(input_path, first, first, output_format, options, content_hash):
+                    return create_temp_binary_file(data, format)
+                
+                raise ValueError("No images generated from PDF")
                 
         except Exception as e:
             logger.error(f"Image conversion failed: {e}")
@@ -184,7 +418,7 @@ class ConvertService:
                 
                 output_path = create_temp_binary_file(b"", "docx")
                 doc.save(output_path)
-                return output_path
+                return FallbackResult(output_path)
                 
             elif target_format == "xlsx":
                 wb = openpyxl.Workbook()
@@ -194,19 +428,19 @@ class ConvertService:
                 
                 output_path = create_temp_binary_file(b"", "xlsx")
                 wb.save(output_path)
-                return output_path
+                return FallbackResult(output_path)
                 
             elif target_format in ["img", "png", "jpg", "jpeg"]:
                 # Create a simple placeholder image
                 img = Image.new('RGB', (800, 600), 'white')
                 output_path = create_temp_binary_file(b"", target_format)
                 img.save(output_path, 'PNG' if target_format in ["img", "png"] else 'JPEG')
-                return output_path
+                return FallbackResult(output_path)
                 
             else:
                 # Text placeholder
                 content = f"Conversion placeholder for format: {target_format}\nSource: {Path(input_path).name}"
-                return create_temp_response_file(content, "txt")
+                return FallbackResult(create_temp_response_file(content, "txt"))
                 
         except Exception as e:
             logger.error(f"Failed to create placeholder result: {e}")
@@ -1,14 +1,35 @@
-import pytesseract
-import pdf2image
 import tempfile
 import os
+import shutil
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import pikepdf
+from PIL import Image
 from docx import Document
+from config import settings
+from utils.cpu_budget import cpu_slots
+from utils.file_utils import file_sha256
+from utils.ocr_dpi import ocr_dpi_for
+from utils.ocr_engines import OcrEngine, get_ocr_engine
+from utils.ocr_preprocess import parse_steps, preprocess_page
+from utils.render_utils import render_runs
+from utils.text_layer_utils import text_layer_quality
+from utils.text_store import text_store
 from utils.response_utils import create_temp_response_file, create_temp_binary_file
+from utils.workspace import get_workspace_root
+from utils.result_cache import FallbackResult
 
 logger = logging.getLogger(__name__)
 
+# Section text of a page tesseract failed on
+OCR_FAILED = "[OCR processing failed]"
+
+# Longest run of pages handed to the renderer while adaptive DPI estimates are still coming in
+ADAPTIVE_RUN_PAGES = 16
+
 class OcrService:
     """
     Service for OCR text extraction from PDFs
@@ -41,6 +62,28 @@ class OcrService:
         Returns:
             Path to output file with extracted text
         """
+        result_path, _ = await self.extract_text_with_report(input_path, language, output_format)
+        return result_path
+    
+    async def extract_text_with_report(self, input_path: str, language: str = "eng", output_format: str = "txt",
+                                       force_ocr: bool = False, content_hash: Optional[str] = None) -> Tuple[str, Dict[str, str]]:
+        """
+        Extract text from PDF, using OCR only where the text layer is not usable
+        
+        Each page's embedded text is judged first (character count, glyph
+        coverage, garbage ratio); only image-only or low-quality pages are
+        rendered and sent to tesseract.
+        
+        Args:
+            input_path: Path to input PDF
+            language: OCR language code
+            output_format: Output format (txt/docx)
+            force_ocr: OCR every page, ignoring the text layer
+            content_hash: SHA-256 of the input, if already computed during upload
+            
+        Returns:
+            (path to output file, X-OCR-* headers with the page count of each path)
+        """
         try:
             logger.info(f"OCR processing: {input_path}, language={language}, format={output_format}")
             
@@ -49,60 +92,268 @@ class OcrService:
                 logger.warning(f"Unsupported language: {language}, using English")
                 language = "eng"
             
-            # Convert PDF to images
+            # Text store and page cache key, hashed once for the whole request
+            content_hash = content_hash or file_sha256(input_path)
+            sections, ocr_numbers = self._text_layer_pages(input_path, force_ocr, content_hash)
+            
+            # Extract text from each remaining page as it is rendered, several pages at a time
             try:
-                images = pdf2image.convert_from_path(
-                    input_path,
-                    dpi=300,  # Higher DPI for better OCR accuracy
-                    grayscale=True  # Grayscale often improves OCR
-                )
+                sections.update(self._ocr_pages(input_path, ocr_numbers, language, content_hash))
             except Exception as e:
                 logger.error(f"PDF to image conversion failed: {e}")
-                return self._create_placeholder_result(input_path, output_format)
-            
-            # Extract text from each page
-            extracted_text = []
+                return self._create_placeholder_result(input_path, output_format), {}
             
-            for i, image in enumerate(images):
-                try:
-                    # Configure OCR
-                    custom_config = r'--oem 3 --psm 6'
-                    
-                    # Extract text
-                    page_text = pytesseract.image_to_string(
-                        image, 
-                        lang=language,
-                        config=custom_config
-                    )
-                    
-                    if page_text.strip():
-                        extracted_text.append(f"=== Page {i + 1} ===\n{page_text.strip()}")
-                    else:
-                        extracted_text.append(f"=== Page {i + 1} ===\n[No text detected]")
-                        
-                except Exception as e:
-                    logger.warning(f"OCR failed for page {i + 1}: {e}")
-                    extracted_text.append(f"=== Page {i + 1} ===\n[OCR processing failed]")
+            headers = {
+                "X-OCR-Text-Layer-Pages": str(len(sections) - len(ocr_numbers)),
+                "X-OCR-Tesseract-Pages": str(len(ocr_numbers))
+            }
+            logger.info(f"OCR pages: {headers['X-OCR-Text-Layer-Pages']} from text layer, {len(ocr_numbers)} by tesseract")
             
             # Combine all text
-            full_text = "\n\n".join(extracted_text)
+            full_text = "\n\n".join(sections[number] for number in sorted(sections))
             
             # Create output based on format
+            method = self._extraction_method(len(sections) - len(ocr_numbers), len(ocr_numbers))
             if output_format == "docx":
-                return self._create_docx_output(full_text, input_path)
+                output_path = self._create_docx_output(full_text, input_path, method)
             else:
-                return self._create_text_output(full_text, input_path)
+                output_path = self._create_text_output(full_text, input_path, method)
+            
+            # Pages that failed (e.g. tesseract missing) may succeed next time
+            failed = sum(1 for number in ocr_numbers if sections[number].endswith(OCR_FAILED))
+            if failed:
+                logger.warning(f"OCR failed on {failed} of {len(ocr_numbers)} pages")
+                output_path = FallbackResult(output_path)
+            return output_path, headers
                 
         except Exception as e:
             logger.error(f"OCR processing failed: {e}")
-            return self._create_placeholder_result(input_path, output_format)
+            return self._create_placeholder_result(input_path, output_format), {}
+    
+    def _text_layer_pages(self, input_path: str, force_ocr: bool,
+                          content_hash: Optional[str] = None) -> Tuple[Dict[int, str], List[int]]:
+        """
+        Route pages between the text layer and OCR
+        
+        Returns:
+            ({page number: section} for pages with a usable text layer, page numbers needing OCR)
+        """
+        texts = []
+        if not force_ocr:
+            try:
+                texts = text_store.get_pages(input_path, content_hash)
+            except Exception as e:
+                logger.warning(f"Text layer extraction failed, using OCR for all pages: {e}")
+        
+        if not texts:
+            with pikepdf.open(input_path) as pdf:
+                return {}, list(range(1, len(pdf.pages) + 1))
+        
+        sections = {}
+        ocr_numbers = []
+        for number, text in enumerate(texts, start=1):
+            if text_layer_quality(text).sufficient:
+                sections[number] = f"=== Page {number} ===\n{text.strip()}"
+            else:
+                ocr_numbers.append(number)
+        return sections, ocr_numbers
+    
+    def _ocr_pages(self, input_path: str, page_numbers: List[int], language: str,
+                   content_hash: Optional[str] = None) -> Dict[int, str]:
+        """
+        OCR the given pages, running one tesseract process per OCR worker
+        
+        The request borrows the CPUs free in the shared CPU budget (up to
+        OCR_WORKERS, at least one) and runs that many tesseracts, with the
+        same number of poppler processes rendering ahead of them. Rendered
+        pages are hard-linked into a private directory so they outlive the
+        renderer's cleanup while queued, and at most twice as many pages as
+        workers are waiting at once. Each tesseract is limited to one thread
+        (OMP_THREAD_LIMIT, see get_ocr_engine) so the pool does not
+        oversubscribe the CPU. Pages are rendered at OCR_DPI or,
+        in adaptive mode, at a DPI chosen per page (see _ocr_runs), and
+        preprocessed (OCR_PREPROCESS) in the same workers. Results keep page
+        order; a failing page only gets a marker.
+        
+        Returns:
+            {page number: "=== Page N ===" section}
+        """
+        if not page_numbers:
+            return {}
+        
+        engine = get_ocr_engine()
+        steps = parse_steps(settings.ocr_preprocess)
+        
+        queue_dir = tempfile.mkdtemp(prefix="ocr_", dir=get_workspace_root())
+        sections = {}
+        dpis = {}
+        pending = deque()
+        
+        try:
+            with cpu_slots(settings.ocr_workers) as workers, ThreadPoolExecutor(max_workers=workers) as executor:
+                # All runs share one render pipeline, whatever their DPI
+                pages = render_runs(
+                    input_path,
+                    self._ocr_runs(input_path, page_numbers, dpis, workers, content_hash),
+                    grayscale=True,  # Grayscale often improves OCR
+                    workers=workers,
+                    content_hash=content_hash
+                )
+                
+                for page in pages:
+                    path = os.path.join(queue_dir, f"page-{page.number}{Path(page.path).suffix}")
+                    try:
+                        os.link(page.path, path)
+                    except OSError:
+                        shutil.copyfile(page.path, path)
+                    dpi = dpis[page.number]
+                    pending.append((page.number, executor.submit(self._ocr_page, engine, page.number, path, language, dpi, steps)))
+                    
+                    while len(pending) > 2 * workers:
+                        number, future = pending.popleft()
+                        sections[number] = future.result()
+                
+                for number, future in pending:
+                    sections[number] = future.result()
+        finally:
+            shutil.rmtree(queue_dir, ignore_errors=True)
+        
+        if settings.ocr_adaptive_dpi:
+            logger.info(f"Adaptive OCR DPI: {', '.join(f'{number}: {dpi}' for number, dpi in dpis.items())}")
+        return sections
+    
+    def _page_runs(self, page_numbers: List[int], dpis: Dict[int, int]) -> List[List[int]]:
+        """[first, last, dpi] of each run of consecutive pages rendered at the same DPI"""
+        runs = []
+        for number in page_numbers:
+            if runs and number == runs[-1][1] + 1 and dpis[number] == runs[-1][2]:
+                runs[-1][1] = number
+            else:
+                runs.append([number, number, dpis[number]])
+        return runs
+    
+    def _ocr_runs(self, input_path: str, page_numbers: List[int], dpis: Dict[int, int], workers: int,
+                  content_hash: Optional[str] = None) -> Iterator[Tuple[int, int, int]]:
+        """
+        (first, last, dpi) of each run of pages to render for OCR, filling `dpis`
+        
+        OCR_DPI for every page, unless OCR_ADAPTIVE_DPI is set: then the
+        pages are rendered at OCR_PROBE_DPI first and each gets the DPI that
+        brings its text x-height to OCR_TARGET_X_HEIGHT pixels (estimated
+        from connected components, in their own threads so they never wait
+        behind queued OCR). Pages without detectable text keep OCR_DPI.
+        
+        Runs are yielded as soon as their DPIs are known (and after at most
+        ADAPTIVE_RUN_PAGES pages), so rendering at the chosen DPI overlaps
+        with probing the rest of the document.
+        """
+        if not settings.ocr_adaptive_dpi:
+            dpis.update(dict.fromkeys(page_numbers, settings.ocr_dpi))
+            for run in self._page_runs(page_numbers, dpis):
+                yield tuple(run)
+            return
+        
+        probe_runs = [(first, last, settings.ocr_probe_dpi) for first, last, _ in
+                      self._page_runs(page_numbers, dict.fromkeys(page_numbers, settings.ocr_probe_dpi))]
+        run = None
+        
+        def estimated(number: int, future) -> Optional[Tuple[int, int, int]]:
+            """Record a page's DPI; returns the run it closes, if any"""
+            nonlocal run
+            try:
+                dpis[number] = future.result() or settings.ocr_dpi
+            except Exception as e:
+                logger.warning(f"Text size estimation failed for page {number}, using {settings.ocr_dpi} DPI: {e}")
+                dpis[number] = settings.ocr_dpi
+            
+            closed = None
+            if run and number == run[1] + 1 and dpis[number] == run[2] and run[1] - run[0] + 1 < ADAPTIVE_RUN_PAGES:
+                run[1] = number
+            else:
+                closed = tuple(run) if run else None
+                run = [number, number, dpis[number]]
+            return closed
+        
+        with ThreadPoolExecutor(max_workers=workers) as estimator:
+            estimates = deque()
+            for page in render_runs(input_path, probe_runs, grayscale=True, workers=workers, content_hash=content_hash):
+                # Probe renders are small; keep them in memory, the renderer deletes the file
+                with Image.open(page.path) as image:
+                    probe = image.copy()
+                estimates.append((page.number, estimator.submit(ocr_dpi_for, probe, settings.ocr_probe_dpi)))
+                
+                # Hand over runs as soon as the estimates in page order are in
+                while estimates and (estimates[0][1].done() or len(estimates) > workers):
+                    closed = estimated(*estimates.popleft())
+                    if closed:
+                        yield closed
+            
+            while estimates:
+                closed = estimated(*estimates.popleft())
+                if closed:
+                    yield closed
+        
+        if run:
+            yield tuple(run)
+    
+    def _ocr_page(self, engine: OcrEngine, number: int, image_path: str, language: str,
+                  dpi: int, steps: Sequence[str] = ()) -> str:
+        """OCR one rendered page file (deleted afterwards) into its page section"""
+        paths = [image_path]
+        try:
+            if steps:
+                clean_path = self._preprocess_page(number, image_path, dpi, steps)
+                if clean_path:
+                    paths.append(clean_path)
+            page_text = engine.recognize(paths[-1], language)
+            
+            if page_text.strip():
+                return f"=== Page {number} ===\n{page_text.strip()}"
+            return f"=== Page {number} ===\n[No text detected]"
+            
+        except Exception as e:
+            logger.warning(f"OCR failed for page {number}: {e}")
+            return f"=== Page {number} ===\n{OCR_FAILED}"
+        
+        finally:
+            for path in paths:
+                os.unlink(path)
+    
+    def _preprocess_page(self, number: int, image_path: str, dpi: int, steps: Sequence[str]) -> Optional[str]:
+        """
+        Write the preprocessed page next to the rendered one
+        
+        A new file is written: the rendered file may be hard-linked to the
+        page cache. Binarized pages are saved as PBM, others as PGM.
+        
+        Returns:
+            Path of the preprocessed page, None to OCR the page as rendered
+        """
+        try:
+            with Image.open(image_path) as image:
+                clean = preprocess_page(image, dpi=dpi, steps=steps)
+            clean_path = f"{os.path.splitext(image_path)[0]}-clean.{'pbm' if clean.mode == '1' else 'pgm'}"
+            clean.save(clean_path, "PPM")
+            return clean_path
+        except Exception as e:
+            logger.warning(f"OCR preprocessing failed for page {number}, using the rendered page: {e}")
+            return None
+    
+    def _extraction_method(self, text_layer_pages: int, tesseract_pages: int) -> str:
+        """How the pages were extracted, e.g. "Embedded text layer (3 pages), Tesseract OCR (1 page)" """
+        parts = []
+        for label, count in (("Embedded text layer", text_layer_pages), ("Tesseract OCR", tesseract_pages)):
+            if count:
+                parts.append(f"{label} ({count} page{'s' if count != 1 else ''})")
+        return ", ".join(parts) or "None (no pages)"
     
-    def _create_text_output(self, text: str, input_path: str) -> str:
+    def _create_text_output(self, text: str, input_path: str, method: str) -> str:
         """Create text file output"""
         try:
             # Add header information
             header = f"OCR Text Extraction\n"
             header += f"Source: {Path(input_path).name}\n"
+            header += f"Extraction method: {method}\n"
             header += f"Extraction Date: {os.path.getctime(input_path)}\n"
             header += "=" * 50 + "\n\n"
             
@@ -114,7 +365,7 @@ class OcrService:
             logger.error(f"Failed to create text output: {e}")
             raise
     
-    def _create_docx_output(self, text: str, input_path: str) -> str:
+    def _create_docx_output(self, text: str, input_path: str, method: str) -> str:
         """Create DOCX file output"""
         try:
             # Create document
@@ -125,7 +376,7 @@ class OcrService:
             
             # Add metadata
             doc.add_paragraph(f'Source: {Path(input_path).name}')
-            doc.add_paragraph(f'Extraction method: Tesseract OCR')
+            doc.add_paragraph(f'Extraction method: {method}')
             doc.add_paragraph('')  # Empty line
             
             # Add extracted text
@@ -191,9 +442,9 @@ installed and configured on the system.
                 
                 output_path = create_temp_binary_file(b"", "docx")
                 doc.save(output_path)
-                return output_path
+                return FallbackResult(output_path)
             else:
-                return create_temp_response_file(placeholder_text, "txt")
+                return FallbackResult(create_temp_response_file(placeholder_text, "txt"))
                 
         except Exception as e:
             logger.error(f"Failed to create placeholder result: {e}")
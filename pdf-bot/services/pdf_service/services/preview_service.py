@@ -0,0 +1,93 @@
+import io
+import logging
+from typing import Optional
+import pdf2image
+import pikepdf
+from PIL import Image
+from config import settings
+from utils.file_utils import file_sha256
+from utils.page_cache import page_cache
+
+logger = logging.getLogger(__name__)
+
+# Preview format -> (PIL format, save options); both are fast in-memory encoders
+PREVIEW_FORMATS = {
+    "webp": ("WEBP", {"method": 2}),
+    "jpeg": ("JPEG", {"optimize": False}),
+}
+
+class PreviewPageError(ValueError):
+    """The requested preview page does not exist"""
+
+class PreviewService:
+    """
+    Service for small page previews (thumbnails)
+    """
+
+    async def preview(self, input_path: str, page: int = 1, size: int = None, format: str = "webp",
+                      content_hash: Optional[str] = None) -> bytes:
+        """
+        Render one page scaled to fit a size x size box and encode it in memory
+
+        A colour render of the page already in the page cache is scaled down
+        if it is large enough; otherwise only the requested page is
+        rasterized, with poppler rendering it directly at the preview size.
+
+        Args:
+            input_path: Path to input PDF
+            page: 1-based page number
+            size: Longest side in pixels (default PREVIEW_SIZE, capped at PREVIEW_MAX_SIZE)
+            format: Image format (webp/jpeg)
+            content_hash: SHA-256 of the PDF, if already known (for the page cache)
+
+        Returns:
+            Encoded image bytes
+        """
+        size = min(size or settings.preview_size, settings.preview_max_size)
+        pil_format, save_options = PREVIEW_FORMATS[format]
+
+        image = self._from_page_cache(input_path, page, size, content_hash)
+        images = [image] if image is not None else pdf2image.convert_from_path(
+            input_path,
+            first_page=page,
+            last_page=page,
+            size=size,
+            single_file=True
+        )
+
+        if not images:
+            # poppler renders nothing for pages past the end
+            with pikepdf.open(input_path) as pdf:
+                page_count = len(pdf.pages)
+            raise PreviewPageError(f"Page {page} out of range (document has {page_count} pages)")
+
+        image = images[0]
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, quality=settings.preview_quality, **save_options)
+
+        logger.info(f"Preview rendered: page {page}, {image.width}x{image.height} {format}, {buffer.tell()} bytes")
+        return buffer.getvalue()
+
+    def _from_page_cache(self, input_path: str, page: int, size: int,
+                         content_hash: Optional[str] = None) -> Optional[Image.Image]:
+        """The smallest cached colour render of the page that covers `size`, scaled to fit"""
+        if page_cache is None:
+            return None
+
+        candidates = page_cache.renders(content_hash or file_sha256(input_path)).get(page, [])
+        for _, grayscale, path in sorted(candidates):
+            if grayscale:
+                continue
+            try:
+                with Image.open(path) as image:
+                    if max(image.size) < size:
+                        continue
+                    page_cache.touch(path)
+                    image.thumbnail((size, size), Image.LANCZOS)
+                    return image.copy()
+            except FileNotFoundError:
+                continue  # Evicted meanwhile
+        return None
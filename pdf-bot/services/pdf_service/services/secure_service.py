@@ -8,6 +8,7 @@ from reportlab.lib.pagesizes import letter
 from reportlab.lib.colors import Color, red, blue, gray
 from reportlab.lib.units import inch
 from utils.response_utils import create_temp_binary_file
+from utils.result_cache import FallbackResult
 
 logger = logging.getLogger(__name__)
 
@@ -129,6 +130,7 @@ class SecureService:
         
         This would be used in a full implementation to create proper watermarks
         """
+        watermark_path = None
         try:
             # Create temporary file for watermark
             watermark_path = create_temp_binary_file(b"", "pdf")
@@ -163,14 +165,16 @@ class SecureService:
             with open(watermark_path, 'rb') as f:
                 watermark_content = f.read()
             
-            # Clean up
-            os.unlink(watermark_path)
-            
             return watermark_content
             
         except Exception as e:
             logger.error(f"Watermark overlay creation failed: {e}")
             return b""
+            
+        finally:
+            # Clean up, also on error paths
+            if watermark_path and os.path.exists(watermark_path):
+                os.unlink(watermark_path)
     
     def _create_placeholder_result(self, input_path: str, action: str, password: str = None, watermark_text: str = None) -> str:
         """Create placeholder secured PDF for testing"""
@@ -190,7 +194,7 @@ class SecureService:
             
             logger.info(f"Created placeholder secured PDF with: {', '.join(security_info)}")
             
-            return output_path
+            return FallbackResult(output_path)
             
         except Exception as e:
             logger.error(f"Failed to create placeholder result: {e}")
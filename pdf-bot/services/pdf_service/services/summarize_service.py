@@ -1,9 +1,11 @@
-import pdfminer.high_level
 import tempfile
 import os
 import logging
 from pathlib import Path
+from typing import Optional
+from utils.text_store import text_store
 from utils.response_utils import create_temp_response_file
+from utils.result_cache import FallbackResult
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +21,8 @@ class SummarizeService:
             "long": {"sentences": 10, "max_words": 600}
         }
     
-    async def summarize(self, input_path: str, length: str = "medium", language: str = "en") -> str:
+    async def summarize(self, input_path: str, length: str = "medium", language: str = "en",
+                        content_hash: Optional[str] = None) -> str:
         """
         Summarize PDF content
         
@@ -27,6 +30,7 @@ class SummarizeService:
             input_path: Path to input PDF
             length: Summary length (short/medium/long)
             language: Output language
+            content_hash: SHA-256 of the input, if already computed during upload
             
         Returns:
             Path to summary text file
@@ -36,7 +40,7 @@ class SummarizeService:
             
             # Extract text from PDF
             try:
-                text = pdfminer.high_level.extract_text(input_path)
+                text = text_store.get_text(input_path, content_hash)
                 if not text.strip():
                     raise ValueError("No text could be extracted from PDF")
             except Exception as e:
@@ -178,7 +182,7 @@ Note: To enable full summarization functionality, integrate with:
 - Or similar NLP services
 """
             
-            return create_temp_response_file(placeholder_summary, "txt")
+            return FallbackResult(create_temp_response_file(placeholder_summary, "txt"))
             
         except Exception as e:
             logger.error(f"Failed to create placeholder result: {e}")
@@ -1,13 +1,15 @@
-import pdfminer.high_level
 import tempfile
 import os
 import logging
 from pathlib import Path
+from typing import Optional
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from utils.text_store import text_store
 from utils.response_utils import create_temp_response_file, create_temp_binary_file
+from utils.result_cache import FallbackResult
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +34,8 @@ class TranslateService:
             'hi': 'Hindi'
         }
     
-    async def translate(self, input_path: str, target_language: str, source_language: str = "auto", output_format: str = "txt") -> str:
+    async def translate(self, input_path: str, target_language: str, source_language: str = "auto", output_format: str = "txt",
+                        content_hash: Optional[str] = None) -> str:
         """
         Translate PDF content
         
@@ -41,6 +44,7 @@ class TranslateService:
             target_language: Target language code
             source_language: Source language code (auto for auto-detect)
             output_format: Output format (txt/pdf)
+            content_hash: SHA-256 of the input, if already computed during upload
             
         Returns:
             Path to translated file
@@ -54,7 +58,7 @@ class TranslateService:
             
             # Extract text from PDF
             try:
-                text = pdfminer.high_level.extract_text(input_path)
+                text = text_store.get_text(input_path, content_hash)
                 if not text.strip():
                     raise ValueError("No text could be extracted from PDF")
             except Exception as e:
@@ -294,9 +298,9 @@ translation APIs and configure proper authentication credentials.
                 story.extend([title, Spacer(1, 20), content])
                 doc.build(story)
                 
-                return output_path
+                return FallbackResult(output_path)
             else:
-                return create_temp_response_file(placeholder_translation, "txt")
+                return FallbackResult(create_temp_response_file(placeholder_translation, "txt"))
                 
         except Exception as e:
             logger.error(f"Failed to create placeholder result: {e}")
@@ -0,0 +1,37 @@
+"""
+Tests for the CPU budget shared by pool workers (utils/cpu_budget.py)
+
+Run with: python -m pytest test_cpu_budget.py
+"""
+
+import multiprocessing
+
+import pytest
+
+from utils import cpu_budget
+from utils.cpu_budget import cpu_slots
+
+@pytest.fixture
+def budget(monkeypatch):
+    """A pool-style budget of 6 CPUs installed in this process"""
+    shared = cpu_budget.create_cpu_budget(multiprocessing.get_context("spawn"), 6)
+    monkeypatch.setattr(cpu_budget, "_budget", shared)
+    return shared
+
+def test_single_request_gets_every_free_cpu(budget):
+    with cpu_slots(16) as workers:
+        assert workers == 6
+
+def test_concurrent_requests_split_the_budget(budget):
+    with cpu_slots(4) as first:
+        with cpu_slots(4) as second:
+            with cpu_slots(4) as third:
+                assert (first, second, third) == (4, 2, 1)  # The last runs on its own core only
+
+def test_slots_are_returned(budget):
+    with pytest.raises(RuntimeError):
+        with cpu_slots(6):
+            raise RuntimeError("render failed")
+
+    with cpu_slots(6) as workers:
+        assert workers == 6
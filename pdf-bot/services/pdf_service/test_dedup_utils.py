@@ -0,0 +1,133 @@
+"""
+Tests for object deduplication (utils/dedup_utils.py)
+
+The sample document is several reportlab PDFs concatenated with pikepdf,
+so every page carries its own copy of the same font dictionary and image
+stream, as in merged or mail-merged documents.
+
+Run with: python -m pytest test_dedup_utils.py
+"""
+
+import asyncio
+import io
+import os
+
+import pikepdf
+import pytest
+from PIL import Image
+from pdfminer.high_level import extract_text
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from config import settings
+from services.compress_service import CompressService
+from utils.dedup_utils import deduplicate_objects
+
+TEXTS = ["Quarterly report page one", "Quarterly report page two", "Quarterly report page three"]
+
+UNUSED_IMAGE_BYTES = 5000
+
+def _logo(shade: int) -> Image.Image:
+    image = Image.new("RGB", (64, 64), (shade, 40, 200 - shade))
+    for x in range(64):
+        image.putpixel((x, x), (255, 255, 255))
+    return image
+
+def _single_page_pdf(text: str, logo: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer, pageCompression=1)
+    page.setFont("Helvetica", 14)
+    page.drawString(72, 720, text)
+    page.drawImage(ImageReader(logo), 72, 600, width=64, height=64)
+    page.save()
+    return buffer.getvalue()
+
+def _object_count(path) -> int:
+    with pikepdf.open(path) as pdf:
+        return len(pdf.objects)
+
+def _xobjects(page):
+    return {name: xobject.objgen for name, xobject in page.Resources.XObject.items()}
+
+@pytest.fixture
+def duplicated_pdf(tmp_path):
+    """Three pages, each with its own identical Helvetica dictionary and logo image"""
+    pdf = pikepdf.new()
+    sources = [pikepdf.open(io.BytesIO(_single_page_pdf(text, _logo(100)))) for text in TEXTS]
+    for source in sources:
+        pdf.pages.extend(source.pages)
+
+    # A resource no content stream uses (random data, so it stays large when saved compressed)
+    unused = pdf.make_stream(
+        os.urandom(UNUSED_IMAGE_BYTES),
+        Type=pikepdf.Name.XObject, Subtype=pikepdf.Name.Image,
+        Width=50, Height=100, ColorSpace=pikepdf.Name.DeviceGray, BitsPerComponent=8
+    )
+    pdf.pages[0].Resources.XObject[pikepdf.Name("/Unused")] = unused
+
+    path = tmp_path / "duplicated.pdf"
+    pdf.save(path)
+    return path
+
+def test_merges_duplicate_fonts_and_images(duplicated_pdf, tmp_path):
+    with pikepdf.open(duplicated_pdf) as pdf:
+        fonts = {page.Resources.Font.F1.objgen for page in pdf.pages}
+        assert len(fonts) == len(TEXTS)
+
+        report = deduplicate_objects(pdf)
+
+        fonts = {page.Resources.Font.F1.objgen for page in pdf.pages}
+        images = {objgen for page in pdf.pages for objgen in _xobjects(page).values()}
+        assert len(fonts) == 1
+        assert len(images) == 1
+
+        output = tmp_path / "deduplicated.pdf"
+        pdf.save(output)
+
+    # Two extra copies of the font dictionary and of the image stream
+    assert report["merged_objects"] >= 4
+    assert _object_count(output) < _object_count(duplicated_pdf)
+
+def test_removes_unreferenced_resources(duplicated_pdf, tmp_path):
+    with pikepdf.open(duplicated_pdf) as pdf:
+        report = deduplicate_objects(pdf)
+        assert "/Unused" not in pdf.pages[0].Resources.XObject
+
+    assert report["removed_objects"] >= 1
+    assert report["reclaimed_bytes"] >= UNUSED_IMAGE_BYTES
+
+def test_output_opens_with_the_same_text(duplicated_pdf, tmp_path):
+    with pikepdf.open(duplicated_pdf) as pdf:
+        deduplicate_objects(pdf)
+        output = tmp_path / "deduplicated.pdf"
+        pdf.save(output)
+
+    with pikepdf.open(output) as pdf:
+        assert len(pdf.pages) == len(TEXTS)
+        pdf.check()
+
+    assert extract_text(str(output)) == extract_text(str(duplicated_pdf))
+    for text in TEXTS:
+        assert text in extract_text(str(output))
+
+def test_distinct_images_stay_separate(tmp_path):
+    pdf = pikepdf.new()
+    for shade, text in zip((50, 150), TEXTS):
+        pdf.pages.extend(pikepdf.open(io.BytesIO(_single_page_pdf(text, _logo(shade)))).pages)
+
+    deduplicate_objects(pdf)
+
+    images = {objgen for page in pdf.pages for objgen in _xobjects(page).values()}
+    fonts = {page.Resources.Font.F1.objgen for page in pdf.pages}
+    assert len(images) == 2
+    assert len(fonts) == 1
+
+@pytest.mark.parametrize("mode", ["print", "balanced"])
+def test_compress_keeps_text(duplicated_pdf, tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(settings, "workspace_root", str(tmp_path / "work"))
+
+    output, report = asyncio.run(CompressService().compress_with_report(str(duplicated_pdf), mode=mode))
+
+    assert int(report["X-Dedup-Merged-Objects"]) >= 4
+    assert extract_text(output) == extract_text(str(duplicated_pdf))
+    assert _object_count(output) < _object_count(duplicated_pdf)
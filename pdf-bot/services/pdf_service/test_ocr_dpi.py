@@ -0,0 +1,94 @@
+"""
+Tests for text-size based OCR resolution (utils/ocr_dpi.py) on synthetic
+probe renders
+
+Run with: python -m pytest test_ocr_dpi.py
+"""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from config import settings
+from utils.ocr_dpi import DPI_STEP, estimate_x_height, label_components, ocr_dpi_for
+
+PROBE_DPI = 100
+
+TEXT = "the quick brown fox jumps over a lazy dog and runs across the open field"
+
+def _probe_page(points: float, dpi: int = PROBE_DPI, lines: int = 20) -> Image.Image:
+    """A letter-size page of `points` text rendered at `dpi`"""
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    size = round(points / 72 * dpi)
+    page = Image.new("L", (width, height), 250)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=size)
+    for line in range(lines):
+        y = dpi // 2 + int(line * size * 1.5)
+        if y + size >= height:
+            break
+        draw.text((dpi // 2, y), TEXT, font=font, fill=20)
+    return page
+
+def _x_height(points: float, dpi: int = PROBE_DPI) -> int:
+    font = ImageFont.load_default(size=round(points / 72 * dpi))
+    _, top, _, bottom = font.getbbox("x")
+    return bottom - top
+
+@pytest.fixture(autouse=True)
+def dpi_settings(monkeypatch):
+    monkeypatch.setattr(settings, "ocr_target_x_height", 20)
+    monkeypatch.setattr(settings, "ocr_min_dpi", 150)
+    monkeypatch.setattr(settings, "ocr_max_dpi", 600)
+
+def test_label_components_8_connected():
+    ink = np.zeros((5, 7), dtype=bool)
+    ink[1, 1:3] = True
+    ink[2, 3] = True   # Diagonal neighbour: same component
+    ink[4, 5:] = True
+
+    labels = label_components(ink)
+
+    assert (labels[~ink] == -1).all()
+    assert len(np.unique(labels[ink])) == 2
+    assert labels[1, 1] == labels[1, 2] == labels[2, 3]
+    assert labels[4, 5] == labels[4, 6] != labels[1, 1]
+
+@pytest.mark.parametrize("points", [8, 10, 14, 24])
+def test_x_height_matches_font(points):
+    page = _probe_page(points)
+
+    estimate = estimate_x_height(np.asarray(page), PROBE_DPI)
+
+    assert estimate == pytest.approx(_x_height(points), abs=1.0)
+
+def test_10pt_text_at_probe_dpi():
+    # 10pt text at 100 DPI: x-height of about 7-8 pixels, so ~20 pixels needs ~2.6x the DPI
+    x_height = _x_height(10)
+    expected = round(PROBE_DPI * 20 / x_height / DPI_STEP) * DPI_STEP
+
+    assert 225 <= expected <= 300
+    assert ocr_dpi_for(_probe_page(10), PROBE_DPI) == expected
+
+def test_smaller_text_gets_higher_dpi():
+    dpis = [ocr_dpi_for(_probe_page(points), PROBE_DPI) for points in (7, 10, 14)]
+
+    assert dpis[0] > dpis[1] > dpis[2]
+    assert all(dpi % DPI_STEP == 0 for dpi in dpis)
+
+def test_dpi_is_clamped(monkeypatch):
+    assert ocr_dpi_for(_probe_page(40, lines=8), PROBE_DPI) == 150
+
+    monkeypatch.setattr(settings, "ocr_max_dpi", 250)
+    assert ocr_dpi_for(_probe_page(7), PROBE_DPI) == 250
+
+def test_pages_without_text():
+    blank = Image.new("L", (850, 1100), 250)
+    assert ocr_dpi_for(blank, PROBE_DPI) is None
+
+    # A photo-like page: large shapes, no glyph-sized components
+    photo = Image.new("L", (850, 1100), 250)
+    draw = ImageDraw.Draw(photo)
+    draw.ellipse((100, 100, 700, 700), fill=60)
+    draw.rectangle((150, 800, 650, 1000), fill=120)
+    assert ocr_dpi_for(photo, PROBE_DPI) is None
@@ -0,0 +1,105 @@
+"""
+Tests for OCR page preprocessing (utils/ocr_preprocess.py) on synthetic pages
+
+Pages are lines of text drawn with Pillow's built-in font, then degraded
+in a known way (uneven lighting, rotation, dark background, speckles).
+
+Run with: python -m pytest test_ocr_preprocess.py
+"""
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.image_utils import otsu_threshold
+from utils.ocr_preprocess import PREPROCESS_STEPS, binarize, crop_borders, despeckle, estimate_skew, preprocess_page
+
+LINE = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod"
+
+def _text_page(width: int = 1000, height: int = 700, size: int = 20, paper: int = 255) -> Image.Image:
+    page = Image.new("L", (width, height), paper)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=size)
+    for y in range(40, height - 40 - size, int(size * 1.6)):
+        draw.text((40, y), LINE, font=font, fill=0)
+    return page
+
+def _ink(image) -> np.ndarray:
+    return np.asarray(image.convert("L")) < 128
+
+def test_binarize_handles_uneven_lighting():
+    clean = np.asarray(_text_page()).astype(np.float64)
+    # Light falls off from 100% on the right to 35% on the left, paper gets gray too
+    lighting = np.linspace(0.35, 1.0, clean.shape[1])[None, :]
+    lit = (40 + clean * 0.8) * lighting
+    gray = lit.astype(np.uint8)
+
+    ink = binarize(gray, window=41, k=0.2) == 0
+    truth = clean < 128
+
+    assert (ink == truth).mean() > 0.98
+    # A global threshold turns the dark side of the page black
+    global_ink = gray < otsu_threshold(Image.fromarray(gray))
+    assert (global_ink == truth).mean() < 0.9
+
+@pytest.mark.parametrize("angle", [-3.0, 1.5, 4.0])
+def test_deskew_recovers_known_skew(angle):
+    page = _text_page()
+    # PIL rotates counter-clockwise; positive skew means lines slope down to the right
+    skewed = page.rotate(-angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+
+    assert estimate_skew(_ink(skewed), max_angle=5.0) == pytest.approx(angle, abs=0.1)
+
+    straightened = preprocess_page(skewed, steps=("deskew",))
+    assert estimate_skew(_ink(straightened), max_angle=5.0) == pytest.approx(0.0, abs=0.1)
+
+def test_straight_page_is_not_rotated():
+    page = _text_page()
+    result = preprocess_page(page, steps=("deskew",))
+
+    assert result.size == page.size
+
+def test_crop_removes_dark_background():
+    # A photographed page: light paper on a dark table, slightly rotated
+    paper = _text_page(800, 600, paper=235)
+    photo = Image.new("L", (1100, 900), 35)
+    photo.paste(paper.rotate(2, expand=True, fillcolor=35), (120, 110))
+    gray = np.asarray(photo)
+    margin = 20
+
+    cropped = crop_borders(gray, gray < otsu_threshold(photo), margin)
+
+    assert cropped.shape[0] < paper.height and cropped.shape[1] < paper.width
+    # The margin is paper: no background and no text strokes smeared into it
+    frame = np.ones(cropped.shape, dtype=bool)
+    frame[margin:-margin, margin:-margin] = False
+    assert cropped[frame].min() > 200
+    # All the text survives the crop
+    assert (cropped < 128).sum() >= 0.95 * (np.asarray(paper) < 128).sum()
+
+def test_despeckle_removes_isolated_dots_only():
+    page = np.asarray(_text_page()).copy()
+    text = page < 128
+    rng = np.random.default_rng(7)
+    paper_y, paper_x = np.nonzero(~text)
+    # Dots away from the text, each with no ink neighbours
+    picks = rng.choice(len(paper_y), 3000, replace=False)
+    dots = np.zeros_like(text)
+    dots[paper_y[picks], paper_x[picks]] = True
+    padded = np.pad(text | dots, 1)
+    isolated = dots & (sum(
+        np.roll(np.roll(padded, dy, 0), dx, 1) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx
+    )[1:-1, 1:-1] == 0)
+    speckled = np.where(isolated, 0, page).astype(np.uint8)
+
+    cleaned = despeckle(speckled, speckled < 128, min_neighbors=2)
+
+    assert not (cleaned < 128)[isolated].any()
+    assert (cleaned < 128)[text].mean() > 0.97
+
+def test_pipeline_output_modes():
+    page = _text_page()
+
+    assert preprocess_page(page, steps=PREPROCESS_STEPS).mode == "1"
+    assert preprocess_page(page, steps=("crop", "deskew")).mode == "L"
+    assert preprocess_page(page, steps=()).tobytes() == page.tobytes()
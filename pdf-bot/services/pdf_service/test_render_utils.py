@@ -0,0 +1,224 @@
+"""
+Tests for sharded page rendering (utils/render_utils.py)
+
+poppler is replaced by a fake convert_from_path that writes one small file
+per page and finishes later shards first, so ordering is really exercised.
+
+Run with: python -m pytest test_render_utils.py
+"""
+
+import os
+import time
+import threading
+
+import pikepdf
+import pytest
+from PIL import Image
+
+from config import settings
+from utils import render_utils
+from utils.page_cache import PageCache
+from utils.render_utils import plan_shards, render_pages
+
+PAGE_COUNT = 23
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    pdf = pikepdf.new()
+    for _ in range(PAGE_COUNT):
+        pdf.add_blank_page(page_size=(612, 792))
+    path = tmp_path / "sample.pdf"
+    pdf.save(path)
+    return str(path)
+
+@pytest.fixture
+def fake_poppler(tmp_path, monkeypatch):
+    """Fake pdf2image.convert_from_path; records the shards it was asked for"""
+    monkeypatch.setattr(settings, "workspace_root", str(tmp_path / "work"))
+    monkeypatch.setattr(render_utils, "page_cache", None)
+    calls = []
+    lock = threading.Lock()
+
+    def convert_from_path(input_path, dpi, first_page, last_page, grayscale, fmt, output_folder, paths_only):
+        with lock:
+            calls.append((first_page, last_page))
+        # Later shards finish first
+        time.sleep(0.02 * max(0, PAGE_COUNT - first_page) / PAGE_COUNT)
+        paths = []
+        for number in range(first_page, last_page + 1):
+            # Unpadded names: lexical order would put page 10 before page 9
+            path = os.path.join(output_folder, f"page-{number}.{fmt}")
+            with open(path, "w") as f:
+                f.write(str(number))
+            paths.append(path)
+        return list(reversed(paths))
+
+    monkeypatch.setattr(render_utils.pdf2image, "convert_from_path", convert_from_path)
+    return calls
+
+def _page_content(page):
+    with open(page.path) as f:
+        return int(f.read())
+
+@pytest.mark.parametrize("workers", [1, 2, 4, 8])
+def test_pages_are_yielded_in_order(sample_pdf, fake_poppler, workers):
+    pages = list((page.number, _page_content(page)) for page in render_pages(sample_pdf, dpi=50, workers=workers))
+
+    assert pages == [(number, number) for number in range(1, PAGE_COUNT + 1)]
+    assert len(fake_poppler) > 1 or workers == 1
+
+def test_page_range_is_respected_in_order(sample_pdf, fake_poppler):
+    pages = [page.number for page in render_pages(sample_pdf, dpi=50, first_page=5, last_page=17, workers=3)]
+
+    assert pages == list(range(5, 18))
+    assert min(first for first, _ in fake_poppler) == 5
+    assert max(last for _, last in fake_poppler) == 17
+
+def test_small_memory_limit_gives_one_page_shards(sample_pdf, fake_poppler):
+    pages = [page.number for page in render_pages(sample_pdf, dpi=50, memory_limit=1, workers=4)]
+
+    assert pages == list(range(1, PAGE_COUNT + 1))
+    assert all(first == last for first, last in fake_poppler)
+
+def test_files_are_removed_as_pages_are_consumed(sample_pdf, fake_poppler):
+    previous = None
+    for page in render_pages(sample_pdf, dpi=50, workers=4):
+        assert os.path.exists(page.path)
+        if previous is not None:
+            assert not os.path.exists(previous)
+        previous = page.path
+
+    assert os.listdir(settings.workspace_root) == []
+
+def test_abandoned_iteration_cleans_up(sample_pdf, fake_poppler):
+    pages = render_pages(sample_pdf, dpi=50, workers=4)
+    assert next(pages).number == 1
+    pages.close()
+
+    assert os.listdir(settings.workspace_root) == []
+
+@pytest.mark.parametrize("first, last, workers", [(1, 1, 4), (1, 23, 4), (3, 100, 7), (10, 12, 16)])
+def test_plan_shards_covers_range_contiguously(first, last, workers):
+    shards = plan_shards(first, last, page_bytes=1000, memory_limit=50_000, workers=workers)
+
+    covered = [page for start, end in shards for page in range(start, end + 1)]
+    assert covered == list(range(first, last + 1))
+    assert len(shards) >= min(workers, last - first + 1)
+    assert all(end - start + 1 <= max(1, 50_000 // (1000 * (workers + 1))) for start, end in shards)
+
+@pytest.fixture
+def image_poppler(tmp_path, monkeypatch):
+    """Fake poppler writing real images (page number in the first pixel), with a page cache"""
+    monkeypatch.setattr(settings, "workspace_root", str(tmp_path / "work"))
+    cache = PageCache(str(tmp_path / "pages"), max_bytes=10**9)
+    monkeypatch.setattr(render_utils, "page_cache", cache)
+    rendered = []
+
+    def convert_from_path(input_path, dpi, first_page, last_page, grayscale, fmt, output_folder, paths_only):
+        paths = []
+        for number in range(first_page, last_page + 1):
+            rendered.append((number, dpi, grayscale))
+            path = os.path.join(output_folder, f"page-{number}.{fmt}")
+            Image.new("L" if grayscale else "RGB", (dpi, dpi * 2), (number,) * (1 if grayscale else 3)).save(path, "PPM")
+            paths.append(path)
+        return paths
+
+    monkeypatch.setattr(render_utils.pdf2image, "convert_from_path", convert_from_path)
+    return cache, rendered
+
+def _first_pixel(page):
+    image = page.load()
+    value = image.getpixel((0, 0))
+    return image.mode, image.size, value if image.mode == "L" else value[0]
+
+def test_cached_pages_are_not_rendered_again(sample_pdf, image_poppler):
+    cache, rendered = image_poppler
+    first = [_first_pixel(page) for page in render_pages(sample_pdf, dpi=40, first_page=1, last_page=6, workers=2)]
+    rendered.clear()
+
+    # Pages 1-6 come from the cache, 7-9 are rendered; order is kept
+    second = [(page.number, _first_pixel(page)) for page in render_pages(sample_pdf, dpi=40, first_page=1, last_page=9, workers=2)]
+
+    assert sorted(number for number, _, _ in rendered) == [7, 8, 9]
+    assert [number for number, _ in second] == list(range(1, 10))
+    assert [pixel for _, pixel in second[:6]] == first
+    assert [pixel[2] for _, pixel in second] == list(range(1, 10))
+    assert os.listdir(settings.workspace_root) == []
+
+def test_lower_dpi_and_grayscale_are_derived_from_cache(sample_pdf, image_poppler):
+    cache, rendered = image_poppler
+    list(render_pages(sample_pdf, dpi=60, first_page=3, last_page=4))
+    rendered.clear()
+
+    pages = [_first_pixel(page) for page in render_pages(sample_pdf, dpi=30, first_page=3, last_page=4, grayscale=True)]
+
+    assert rendered == []
+    assert pages == [("L", (30, 60), 3), ("L", (30, 60), 4)]
+
+def test_higher_dpi_is_rendered(sample_pdf, image_poppler):
+    cache, rendered = image_poppler
+    list(render_pages(sample_pdf, dpi=30, first_page=1, last_page=1, grayscale=True))
+    rendered.clear()
+
+    list(render_pages(sample_pdf, dpi=60, first_page=1, last_page=1))
+
+    assert rendered == [(1, 60, False)]
+
+def test_evicted_entry_falls_back_to_rendering(sample_pdf, image_poppler, monkeypatch):
+    cache, rendered = image_poppler
+    list(render_pages(sample_pdf, dpi=40, first_page=1, last_page=2))
+    rendered.clear()
+
+    # Entries vanish between lookup and use (another worker evicted them)
+    monkeypatch.setattr(cache, "touch", lambda path: False)
+    pages = [_first_pixel(page)[2] for page in render_pages(sample_pdf, dpi=40, first_page=1, last_page=2)]
+
+    assert pages == [1, 2]
+    assert sorted(number for number, _, _ in rendered) == [1, 2]
+
+def _rendered_file(tmp_path, number: int) -> str:
+    path = tmp_path / f"page-{number}.ppm"
+    Image.new("RGB", (50, 50), (number, 0, 0)).save(path, "PPM")
+    return str(path)
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = PageCache(str(tmp_path / "pages"), max_bytes=10**9)
+    for number in range(1, 4):
+        cache.put("abc", number, 100, False, _rendered_file(tmp_path, number))
+        os.utime(cache.renders("abc")[number][0][2], (number, number))
+    cache.touch(cache.renders("abc")[1][0][2])
+
+    cache.max_bytes = 2 * os.path.getsize(cache.renders("abc")[1][0][2])
+    cache.evict()
+
+    assert sorted(cache.renders("abc")) == [1, 3]
+
+def test_cache_links_poppler_output(tmp_path):
+    cache = PageCache(str(tmp_path / "pages"), max_bytes=10**9)
+    source = _rendered_file(tmp_path, 7)
+    cache.put("abc", 7, 100, False, source)
+
+    (dpi, grayscale, path), = cache.renders("abc")[7]
+    assert (dpi, grayscale, path.suffix) == (100, False, ".ppm")
+    assert os.path.samefile(path, source)
+
+    # The caller deleting its file leaves the cached page intact
+    os.unlink(source)
+    assert Image.open(path).getpixel((0, 0)) == (7, 0, 0)
+
+def test_cache_scans_only_when_over_budget(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path / "pages"), max_bytes=10**9)
+    scans = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, "_evict", lambda: scans.append(1) or evict())
+
+    for number in range(1, 6):
+        cache.put("abc", number, 100, False, _rendered_file(tmp_path, number))
+    assert len(scans) == 1  # The first put learns the cache size
+
+    cache.max_bytes = 3 * os.path.getsize(cache.renders("abc")[1][0][2])
+    cache.put("abc", 6, 100, False, _rendered_file(tmp_path, 6))
+
+    assert len(scans) == 2
+    assert len(cache.renders("abc")) == 3
+    assert cache.total_bytes <= cache.max_bytes
@@ -0,0 +1,87 @@
+"""
+Tests for combine_pages image stitching (utils/stitch_utils.py)
+
+The strip-encoded JPEG must decode to the same pixels as the whole canvas
+encoded at once, for canvases that do and do not end on a strip boundary.
+
+Run with: python -m pytest test_stitch_utils.py
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils import stitch_utils
+from utils.stitch_utils import ImageTooLargeError, stitch_vertical
+
+def _pages(sizes):
+    rng = np.random.default_rng(7)
+    pages = []
+    for width, height in sizes:
+        pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        pixels[::9] = 255  # Some flat rows, like text lines on paper
+        pages.append(Image.fromarray(pixels))
+    return pages
+
+def _canvas(pages):
+    """The combined image built in memory: pages stacked on white, left-aligned"""
+    canvas = Image.new("RGB", (max(page.width for page in pages), sum(page.height for page in pages)), (255, 255, 255))
+    top = 0
+    for page in pages:
+        canvas.paste(page, (0, top))
+        top += page.height
+    return canvas
+
+def _pixels(image):
+    return np.asarray(image).astype(int)
+
+@pytest.mark.parametrize("sizes", [
+    [(300, 410), (280, 97), (300, 533)],  # Strips span page boundaries; last strip partial
+    [(200, 256), (200, 256)],  # Ends exactly on a strip boundary
+    [(17, 15)],  # Smaller than one strip
+])
+def test_jpeg_matches_whole_canvas_encode(tmp_path, sizes):
+    pages = _pages(sizes)
+    output = tmp_path / "combined.jpg"
+
+    stitch_vertical(iter(pages), sizes, str(output), "JPEG", max_pixels=10**8, quality=90)
+
+    reference = io.BytesIO()
+    _canvas(pages).save(reference, "JPEG", quality=90, subsampling="4:2:0")
+    with Image.open(output) as combined, Image.open(reference) as expected:
+        assert combined.size == expected.size
+        assert np.array_equal(_pixels(combined), _pixels(expected))
+
+def test_jpeg_strips_narrow_on_wide_images(tmp_path, monkeypatch):
+    # One MCU row per strip, i.e. a restart marker after every row of blocks
+    monkeypatch.setattr(stitch_utils, "JPEG_MAX_RESTART_INTERVAL", 20)
+    sizes = [(300, 100), (300, 70)]
+    pages = _pages(sizes)
+    output = tmp_path / "combined.jpg"
+
+    stitch_vertical(iter(pages), sizes, str(output), "JPEG", max_pixels=10**8, quality=90)
+
+    reference = io.BytesIO()
+    _canvas(pages).save(reference, "JPEG", quality=90, subsampling="4:2:0")
+    with Image.open(output) as combined, Image.open(reference) as expected:
+        assert np.array_equal(_pixels(combined), _pixels(expected))
+
+def test_png_is_lossless(tmp_path):
+    sizes = [(120, 50), (100, 30)]
+    pages = _pages(sizes)
+    output = tmp_path / "combined.png"
+
+    stitch_vertical(iter(pages), sizes, str(output), "PNG", max_pixels=10**8)
+
+    with Image.open(output) as combined:
+        assert np.array_equal(_pixels(combined.convert("RGB")), _pixels(_canvas(pages)))
+
+def test_refuses_over_the_pixel_cap(tmp_path):
+    def untouched():
+        raise AssertionError("pages must not be consumed")
+        yield
+
+    with pytest.raises(ImageTooLargeError):
+        stitch_vertical(untouched(), [(1000, 1000)] * 3, str(tmp_path / "combined.png"), "PNG", max_pixels=2_000_000)
@@ -0,0 +1,96 @@
+"""
+Tests for table grid extraction (utils/table_utils.py)
+
+Sample pages are drawn with reportlab and laid out by pdfminer, the same
+path the XLSX conversion takes.
+
+Run with: python -m pytest test_table_utils.py
+"""
+
+import io
+
+from pdfminer.high_level import extract_pages
+from reportlab.pdfgen import canvas
+
+from utils.table_utils import extract_table_rows
+
+ROW_HEIGHT = 20
+
+def _layout(draw):
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer)
+    page.setFont("Helvetica", 10)
+    draw(page)
+    page.save()
+    buffer.seek(0)
+    return next(extract_pages(buffer))
+
+def _draw_rows(page, rows, columns, top):
+    for index, row in enumerate(rows):
+        for x, text in zip(columns, row):
+            if text:
+                page.drawString(x, top - index * ROW_HEIGHT, text)
+
+def test_whitespace_table():
+    rows = [
+        ["Date", "Description", "Amount"],
+        ["2024-01-02", "Coffee beans", "12.50"],
+        ["2024-01-05", "Rent", "1,200"],
+        ["2024-01-09", "Book refund", "-30.25"],
+    ]
+
+    def draw(page):
+        page.drawString(72, 760, "Account statement January")
+        _draw_rows(page, rows, (72, 200, 400), 720)
+
+    assert extract_table_rows(_layout(draw)) == [
+        ["Account statement January", None, None],
+        ["Date", "Description", "Amount"],
+        ["2024-01-02", "Coffee beans", 12.5],
+        ["2024-01-05", "Rent", 1200],
+        ["2024-01-09", "Book refund", -30.25],
+    ]
+
+def test_ruled_table():
+    rows = [
+        ["Item", "Qty", "Note"],
+        ["Widget", "3", "red and blue"],
+        ["Gadget", "10", ""],
+        ["Gizmo", "", "back order"],
+    ]
+    rulings = (60, 180, 260, 420)
+    top = 700
+
+    def draw(page):
+        _draw_rows(page, rows, (64, 184, 264), top)
+        bottom = top - len(rows) * ROW_HEIGHT + 10
+        for x in rulings:
+            page.line(x, top + 15, x, bottom)
+        for index in range(len(rows) + 1):
+            y = top + 15 - index * ROW_HEIGHT
+            page.line(rulings[0], y, rulings[-1], y)
+
+    assert extract_table_rows(_layout(draw)) == [
+        ["Item", "Qty", "Note"],
+        ["Widget", 3, "red and blue"],
+        ["Gadget", 10, None],
+        ["Gizmo", None, "back order"],
+    ]
+
+def test_ruled_columns_split_adjacent_text():
+    # Cells too close for a whitespace gap are still split at the ruling
+    def draw(page):
+        page.drawString(64, 700, "Alpha")
+        page.drawString(104, 700, "Beta")
+        page.drawString(64, 680, "Gamma")
+        page.drawString(104, 680, "Delta")
+        for x in (60, 100, 160):
+            page.line(x, 715, x, 670)
+
+    assert extract_table_rows(_layout(draw)) == [
+        ["Alpha", "Beta"],
+        ["Gamma", "Delta"],
+    ]
+
+def test_empty_page():
+    assert extract_table_rows(_layout(lambda page: None)) == []
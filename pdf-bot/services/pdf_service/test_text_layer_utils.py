@@ -0,0 +1,88 @@
+"""
+Tests for the text-layer quality check that decides which pages skip OCR
+(utils/text_layer_utils.py), and for the extraction method OCR output reports
+
+Run with: python -m pytest test_text_layer_utils.py
+"""
+
+import asyncio
+
+from docx import Document
+from reportlab.pdfgen import canvas
+
+from config import settings
+from services.ocr_service import OcrService
+from utils.text_layer_utils import MAX_GARBAGE_RATIO, MIN_GLYPH_COVERAGE, MIN_TEXT_CHARS, text_layer_quality
+
+CLEAN_TEXT = (
+    "The quarterly report shows revenue of €1,234.56 (up 12% year-on-year).\n"
+    "Operating costs fell; see section 3.2 for details — “adjusted” figures.\n"
+)
+
+def test_clean_text_is_sufficient():
+    quality = text_layer_quality(CLEAN_TEXT)
+
+    assert quality.chars == len("".join(CLEAN_TEXT.split()))
+    assert quality.glyph_coverage == 1.0
+    assert quality.garbage_ratio == 0.0
+    assert quality.sufficient
+
+def test_short_text_is_not_sufficient():
+    quality = text_layer_quality("Page 3\n\n  Scanned copy  ")
+
+    assert quality.chars < MIN_TEXT_CHARS
+    assert quality.glyph_coverage == 1.0
+    assert not quality.sufficient
+
+def test_unmapped_glyphs_are_not_sufficient():
+    # Subset fonts without ToUnicode: pdfminer writes (cid:N) per glyph
+    text = "Invoice " + "".join(f"(cid:{n})" for n in range(3, 80)) + " total"
+    quality = text_layer_quality(text)
+
+    assert quality.chars == len("Invoicetotal") + 77
+    assert quality.glyph_coverage < MIN_GLYPH_COVERAGE
+    assert quality.garbage_ratio == 0.0
+    assert not quality.sufficient
+
+def test_garbage_text_is_not_sufficient():
+    # Broken font encodings map glyphs to symbols and private-use characters
+    text = "Total  ■□▲△◆◇○● �� amount due ▓▒░ \x07\x08 paid" * 3
+    quality = text_layer_quality(text)
+
+    assert quality.chars >= MIN_TEXT_CHARS
+    assert quality.glyph_coverage == 1.0
+    assert quality.garbage_ratio > MAX_GARBAGE_RATIO
+    assert not quality.sufficient
+
+def test_empty_text():
+    quality = text_layer_quality("  \n\n ")
+
+    assert quality.chars == 0
+    assert quality.garbage_ratio == 1.0
+    assert not quality.sufficient
+
+def _text_pdf(path, pages: int):
+    page = canvas.Canvas(str(path))
+    for number in range(1, pages + 1):
+        page.setFont("Helvetica", 11)
+        for index, line in enumerate(CLEAN_TEXT.splitlines()):
+            page.drawString(72, 720 - 16 * index, f"{line} Page {number}.")
+        page.showPage()
+    page.save()
+
+def test_output_reports_text_layer_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "workspace_root", str(tmp_path / "work"))
+    monkeypatch.setattr(settings, "text_cache_dir", str(tmp_path / "text"))
+    path = tmp_path / "text.pdf"
+    _text_pdf(path, pages=2)
+
+    service = OcrService()
+    txt_path, headers = asyncio.run(service.extract_text_with_report(str(path), output_format="txt"))
+    docx_path, _ = asyncio.run(service.extract_text_with_report(str(path), output_format="docx"))
+
+    assert headers == {"X-OCR-Text-Layer-Pages": "2", "X-OCR-Tesseract-Pages": "0"}
+    with open(txt_path, encoding="utf-8") as f:
+        assert "Extraction method: Embedded text layer (2 pages)\n" in f.read()
+    paragraphs = [paragraph.text for paragraph in Document(docx_path).paragraphs]
+    assert "Extraction method: Embedded text layer (2 pages)" in paragraphs
+    assert not any("Tesseract" in text for text in paragraphs)
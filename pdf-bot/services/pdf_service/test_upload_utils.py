@@ -0,0 +1,119 @@
+"""
+Tests for single-pass upload ingestion (utils/upload_utils.py)
+
+A minimal app exposes the pdf_upload dependency; uploads are sent through
+FastAPI's TestClient, with and without a Content-Length header.
+
+Run with: python -m pytest test_upload_utils.py
+"""
+
+import os
+import hashlib
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from config import settings
+from utils.upload_utils import MAX_FIELD_SIZE, MULTIPART_OVERHEAD, WRITE_BUFFER_SIZE, IngestedUpload, pdf_upload
+
+BOUNDARY = "test-boundary"
+
+MAX_BYTES = 64 * 1024
+
+app = FastAPI()
+
+@app.post("/upload")
+async def upload_endpoint(upload: IngestedUpload = Depends(pdf_upload)):
+    with open(upload.path, "rb") as f:
+        stored = hashlib.sha256(f.read()).hexdigest()
+    return {"sha256": upload.sha256, "stored_sha256": stored, "size": upload.size, "fields": upload.fields}
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "workspace_root", str(tmp_path / "work"))
+    monkeypatch.setattr(settings, "max_upload_bytes", MAX_BYTES)
+    return TestClient(app)
+
+def _workspace_files(tmp_path):
+    return [os.path.join(root, name) for root, _, names in os.walk(tmp_path / "work") for name in names]
+
+def _pdf(size: int) -> bytes:
+    """PDF-looking bytes of about `size` bytes"""
+    body = b"%PDF-1.4\n" + b"0" * max(0, size - 16)
+    return body + b"\n%%EOF\n"
+
+def _multipart(data: bytes, fields: dict = None, filename: str = "doc.pdf") -> bytes:
+    parts = []
+    for name, value in (fields or {}).items():
+        parts.append(
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n".encode() + value.encode() + b"\r\n"
+        )
+    parts.append(
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n".encode() + data + b"\r\n"
+    )
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+def _post(client, body: bytes, chunked: bool = False):
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    if chunked:
+        # A generator body is sent without Content-Length
+        chunks = (body[i:i + 4096] for i in range(0, len(body), 4096))
+        return client.post("/upload", content=chunks, headers=headers)
+    return client.post("/upload", content=body, headers=headers)
+
+def test_hash_size_and_fields(client):
+    data = _pdf(40_000)
+    response = _post(client, _multipart(data, {"mode": "print", "quality": "high"}))
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+    assert result["stored_sha256"] == result["sha256"]
+    assert result["size"] == len(data)
+    assert result["fields"] == {"mode": "print", "quality": "high"}
+
+def test_hash_across_buffered_writes(client, monkeypatch):
+    monkeypatch.setattr(settings, "max_upload_bytes", 4 * WRITE_BUFFER_SIZE)
+    data = _pdf(2 * WRITE_BUFFER_SIZE + 12345)
+    response = _post(client, _multipart(data), chunked=True)
+
+    assert response.status_code == 200
+    assert response.json()["stored_sha256"] == hashlib.sha256(data).hexdigest()
+
+def test_too_large_from_content_length(client, tmp_path):
+    response = _post(client, _multipart(_pdf(MAX_BYTES + MULTIPART_OVERHEAD + 1)))
+
+    assert response.status_code == 413
+    assert _workspace_files(tmp_path) == []
+
+def test_too_large_mid_stream(client, tmp_path):
+    response = _post(client, _multipart(_pdf(MAX_BYTES + 1)), chunked=True)
+
+    assert response.status_code == 413
+    assert _workspace_files(tmp_path) == []
+
+def test_bad_header(client, tmp_path):
+    response = _post(client, _multipart(b"GIF89a" + b"0" * 100 + b"%%EOF"))
+
+    assert response.status_code == 400
+    assert _workspace_files(tmp_path) == []
+
+def test_missing_eof(client, tmp_path):
+    response = _post(client, _multipart(_pdf(20_000)[:-7]))
+
+    assert response.status_code == 400
+    assert "EOF" in response.json()["detail"]
+    assert _workspace_files(tmp_path) == []
+
+def test_not_a_pdf_filename(client):
+    response = _post(client, _multipart(_pdf(1000), filename="doc.txt"))
+
+    assert response.status_code == 400
+
+def test_field_too_large(client):
+    response = _post(client, _multipart(_pdf(1000), {"options": "x" * (MAX_FIELD_SIZE + 1)}))
+
+    assert response.status_code == 400
+    assert "options" in response.json()["detail"]
@@ -0,0 +1,61 @@
+"""
+Tests for the workspace janitor (utils/workspace.py)
+
+Run with: python -m pytest test_workspace.py
+"""
+
+import os
+import time
+
+import pytest
+
+from config import settings
+from utils.workspace import Janitor, Workspace
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    root = tmp_path / "work"
+    monkeypatch.setattr(settings, "workspace_root", str(root))
+    return root
+
+def _age(path, seconds: float):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+def _fill(workspace: Workspace, size: int):
+    with open(os.path.join(workspace.path, "data"), "wb") as f:
+        f.write(b"0" * size)
+
+def test_quota_skips_live_workspaces(root):
+    live = Workspace()
+    _fill(live, 4000)
+    # Left behind by a crashed worker: not registered as live
+    orphan_dir = root / "req_orphan"
+    orphan_dir.mkdir()
+    (orphan_dir / "data").write_bytes(b"0" * 4000)
+    orphan_file = root / "result.pdf"
+    orphan_file.write_bytes(b"0" * 4000)
+    # The live workspace is the oldest entry: it would go first without the liveness check
+    _age(live.path, 100)
+    _age(orphan_dir, 50)
+
+    removed, freed = Janitor(str(root), max_age=3600, max_bytes=9000).sweep()
+
+    assert os.path.isdir(live.path)
+    assert (removed, freed) == (1, 4000)
+    assert not orphan_dir.exists()
+    assert orphan_file.exists()
+
+def test_age_skips_live_workspaces(root):
+    live = Workspace()
+    _age(live.path, 10_000)
+
+    Janitor(str(root), max_age=60, max_bytes=10**9).sweep()
+    assert os.path.isdir(live.path)
+
+    live.cleanup()
+    os.makedirs(live.path)
+    _age(live.path, 10_000)
+
+    Janitor(str(root), max_age=60, max_bytes=10**9).sweep()
+    assert not os.path.exists(live.path)
@@ -0,0 +1,52 @@
+"""
+Tests for the streamed ZIP export (ConvertService.convert_to_zip)
+
+Page images come from a fake _page_images, so no poppler is needed; one
+variant fails after the first page, as a render error partway through would.
+
+Run with: python -m pytest test_zip_export.py
+"""
+
+import asyncio
+import gc
+import zipfile
+
+import pytest
+
+from services.convert_service import ConvertService
+
+PAGES = [(1, b"first page"), (2, b"second page"), (3, b"third page")]
+
+def _pages(fail_after=None):
+    def page_images(self, *args, **kwargs):
+        for index, page in enumerate(PAGES):
+            if index == fail_after:
+                raise RuntimeError("render failed")
+            yield page
+    return page_images
+
+def test_archive_holds_every_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(ConvertService, "_page_images", _pages())
+    output = tmp_path / "pages.zip"
+
+    asyncio.run(ConvertService().convert_to_zip("input.pdf", str(output), "png"))
+
+    with zipfile.ZipFile(output) as archive:
+        assert archive.namelist() == ["page_0001.png", "page_0002.png", "page_0003.png"]
+        assert archive.read("page_0002.png") == b"second page"
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_failure_leaves_no_central_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(ConvertService, "_page_images", _pages(fail_after=1))
+    output = tmp_path / "pages.zip"
+
+    with pytest.raises(RuntimeError, match="render failed"):
+        asyncio.run(ConvertService().convert_to_zip("input.pdf", str(output), "png"))
+    # The abandoned ZipFile must not try to finish the (closed) archive when collected
+    gc.collect()
+
+    data = output.read_bytes()
+    assert b"first page" in data
+    assert b"PK\x05\x06" not in data  # End of central directory record
+    with pytest.raises(zipfile.BadZipFile):
+        zipfile.ZipFile(output)
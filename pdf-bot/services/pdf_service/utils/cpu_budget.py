@@ -0,0 +1,60 @@
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Free CPUs shared by all pool workers: a multiprocessing semaphore handed to each
+# worker by the pool, or (without a pool) a semaphore shared by this process's threads
+_budget: Optional[Any] = None
+_budget_lock = threading.Lock()
+
+def create_cpu_budget(context, slots: Optional[int] = None):
+    """
+    A CPU budget for the workers of one pool
+
+    Args:
+        context: multiprocessing context the workers are started with
+        slots: CPUs to share (default CPU_BUDGET)
+    """
+    return context.BoundedSemaphore(max(1, slots or settings.cpu_budget))
+
+def init_cpu_budget(budget):
+    """Install the pool's CPU budget in a worker process (pool initializer)"""
+    global _budget
+    _budget = budget
+
+def _get_budget():
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = threading.BoundedSemaphore(max(1, settings.cpu_budget))
+        return _budget
+
+@contextmanager
+def cpu_slots(wanted: int) -> Iterator[int]:
+    """
+    Borrow up to `wanted` CPUs from the budget for poppler/tesseract processes
+
+    Never waits: a request takes the CPUs that are free right now, so one
+    large document gets the whole machine while the other workers are idle,
+    and busy workers split it. At least one slot is always granted (the
+    worker's own core), even when the budget is used up.
+
+    Yields:
+        Number of processes to run, 1..wanted
+    """
+    budget = _get_budget()
+    taken = 0
+    try:
+        while taken < wanted and budget.acquire(False):
+            taken += 1
+        if taken < wanted:
+            logger.debug(f"CPU budget: {taken} of {wanted} CPUs free")
+        yield max(1, taken)
+    finally:
+        for _ in range(taken):
+            budget.release()
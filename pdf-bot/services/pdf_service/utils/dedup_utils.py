@@ -0,0 +1,154 @@
+import hashlib
+import logging
+from typing import Dict, Set, Tuple, Optional
+
+import pikepdf
+
+logger = logging.getLogger(__name__)
+
+ObjGen = Tuple[int, int]
+
+# Non-stream dictionaries that can be shared (fonts whose streams were merged)
+DEDUP_DICT_TYPES = {"/Font", "/FontDescriptor", "/ExtGState"}
+
+# Merging can make referring objects identical; give up after this many passes
+MAX_DEDUP_PASSES = 5
+
+def _is_container(value) -> bool:
+    return isinstance(value, (pikepdf.Dictionary, pikepdf.Array, pikepdf.Stream))
+
+def _children(container):
+    """(key/index, value) pairs of a dictionary, stream dictionary or array"""
+    if isinstance(container, pikepdf.Array):
+        return list(enumerate(container))
+    if isinstance(container, pikepdf.Stream):
+        container = container.stream_dict
+    return [(key, container.get(key)) for key in container.keys()]
+
+def _remap_references(container, remap: Dict[ObjGen, pikepdf.Object]) -> int:
+    """
+    Point indirect references to merged objects at their kept copy
+
+    Direct sub-containers are followed; indirect ones are visited on their own.
+
+    Returns:
+        Number of references changed
+    """
+    changed = 0
+    target = container.stream_dict if isinstance(container, pikepdf.Stream) else container
+
+    for key, value in _children(container):
+        if not _is_container(value):
+            continue
+        if value.is_indirect:
+            kept = remap.get(value.objgen)
+            if kept is not None:
+                target[key] = kept
+                changed += 1
+        else:
+            changed += _remap_references(value, remap)
+
+    return changed
+
+def _reachable(pdf: pikepdf.Pdf) -> Set[ObjGen]:
+    """Objects reachable from the trailer (what qpdf will actually write)"""
+    seen: Set[ObjGen] = set()
+    stack = [pdf.trailer]
+
+    while stack:
+        container = stack.pop()
+        for _, value in _children(container):
+            if not _is_container(value):
+                continue
+            if value.is_indirect:
+                if value.objgen in seen:
+                    continue
+                seen.add(value.objgen)
+            stack.append(value)
+
+    return seen
+
+def _stream_size(obj) -> int:
+    try:
+        return len(obj.read_raw_bytes()) if isinstance(obj, pikepdf.Stream) else 0
+    except Exception:
+        return 0
+
+def _dedup_key(obj, raw_digests: Dict[ObjGen, str]) -> Optional[str]:
+    """
+    Identity of a stream (raw data + dictionary minus /Length) or of a
+    shareable dictionary; None for objects that must stay distinct
+    """
+    if isinstance(obj, pikepdf.Stream):
+        digest = raw_digests.get(obj.objgen)
+        if digest is None:
+            digest = hashlib.sha256(obj.read_raw_bytes()).hexdigest()
+            raw_digests[obj.objgen] = digest
+        stream_dict = obj.stream_dict
+        header = pikepdf.Dictionary({key: stream_dict.get(key) for key in stream_dict.keys() if key != "/Length"})
+        return "S" + digest + hashlib.sha256(header.unparse()).hexdigest()
+
+    if isinstance(obj, pikepdf.Dictionary) and str(obj.get("/Type", "")) in DEDUP_DICT_TYPES:
+        return "D" + hashlib.sha256(obj.unparse(resolved=True)).hexdigest()
+
+    return None
+
+def deduplicate_objects(pdf: pikepdf.Pdf) -> Dict[str, int]:
+    """
+    Merge identical streams (images, fonts, form XObjects...) and font
+    dictionaries into one shared object, and drop unreferenced resources
+
+    Unreferenced objects are not written by pikepdf on save; they are
+    counted here so the savings can be reported.
+
+    Returns:
+        {"merged_objects", "removed_objects", "reclaimed_bytes"}
+    """
+    pdf.remove_unreferenced_resources()
+
+    # Only objects that will be written are worth merging
+    reachable = _reachable(pdf)
+    candidates = [obj for obj in pdf.objects if _is_container(obj) and obj.objgen in reachable]
+
+    raw_digests: Dict[ObjGen, str] = {}
+    remap: Dict[ObjGen, pikepdf.Object] = {}
+
+    for _ in range(MAX_DEDUP_PASSES):
+        kept: Dict[str, pikepdf.Object] = {}
+        merged: Dict[ObjGen, pikepdf.Object] = {}
+
+        for obj in candidates:
+            if obj.objgen in remap:
+                continue
+            try:
+                key = _dedup_key(obj, raw_digests)
+            except Exception as e:
+                logger.warning(f"Could not hash object {obj.objgen}: {e}")
+                continue
+            if key is None:
+                continue
+            if key in kept:
+                merged[obj.objgen] = kept[key]
+            else:
+                kept[key] = obj
+
+        if not merged:
+            break
+
+        remap.update(merged)
+        for obj in candidates:
+            if obj.objgen not in remap:
+                _remap_references(obj, merged)
+        _remap_references(pdf.trailer, merged)
+
+    reachable = _reachable(pdf)
+    removed = [obj for obj in pdf.objects if _is_container(obj) and obj.objgen not in reachable]
+
+    report = {
+        "merged_objects": len(remap),
+        "removed_objects": len(removed),
+        "reclaimed_bytes": sum(_stream_size(obj) for obj in removed)
+    }
+    logger.info(f"Deduplication: {report}")
+
+    return report
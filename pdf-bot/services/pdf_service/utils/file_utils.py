@@ -3,6 +3,7 @@ from fastapi.responses import FileResponse
 import tempfile
 import os
 import shutil
+import hashlib
 from pathlib import Path
 from contextlib import contextmanager
 import logging
@@ -76,6 +77,16 @@ def cleanup_temp_dir(temp_dir: str):
     except Exception as e:
         logger.warning(f"Failed to cleanup temp directory {temp_dir}: {e}")
 
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hex digest of a file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 def get_file_size(file_path: str) -> int:
     """
     Get file size in bytes
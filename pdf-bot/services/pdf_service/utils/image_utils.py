@@ -0,0 +1,447 @@
+import io
+import math
+import zlib
+import logging
+from typing import Dict, List, Tuple, Optional
+
+import numpy as np
+import pikepdf
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Affine matrix (a, b, c, d, e, f) as used by the PDF `cm` operator
+Matrix = Tuple[float, float, float, float, float, float]
+
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# Colour spaces we can decode to 8-bit RGB/gray and re-encode as JPEG
+JPEG_COLORSPACES = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}
+
+# Scan classification: a pixel is coloured if its channels differ by more
+# than COLOR_CHROMA, an image if more than COLOR_FRACTION of pixels are
+COLOR_CHROMA = 32
+COLOR_FRACTION = 0.01
+
+# A gray image is bilevel (text/line art) if under BILEVEL_MIDTONE_FRACTION
+# of its pixels fall between the ink and paper peaks
+MIDTONE_RANGE = (64, 192)
+BILEVEL_MIDTONE_FRACTION = 0.06
+
+# Classification runs on a nearest-neighbour sample of about this many pixels
+CLASSIFY_PIXELS = 500_000
+
+# A page image counts as full-page if its edges are within this many points of the crop box
+FULL_PAGE_TOLERANCE = 2.0
+
+# Content stream operators allowed on a page that only shows one image: Do plus
+# state changes that paint nothing (generators often emit empty BT/Tf/ET blocks)
+IMAGE_PAGE_OPERATORS = {
+    "q", "Q", "cm", "Do",
+    "BT", "ET", "Tf", "TL", "Tc", "Tw", "Tz", "Ts", "Td", "TD", "Tm", "T*", "Tr",
+    "w", "J", "j", "M", "d", "ri", "i",
+    "g", "G", "rg", "RG", "k", "K", "cs", "CS", "sc", "SC", "scn", "SCN",
+}
+
+def _multiply(m1: Matrix, m2: Matrix) -> Matrix:
+    """Concatenate two PDF matrices (m1 applied first)"""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + b1 * c2,
+        a1 * b2 + b1 * d2,
+        c1 * a2 + d1 * c2,
+        c1 * b2 + d1 * d2,
+        e1 * a2 + f1 * c2 + e2,
+        e1 * b2 + f1 * d2 + f2,
+    )
+
+def _walk_content(content, resources, ctm: Matrix, placements: Dict[Tuple[int, int], Tuple[float, float]], depth: int = 0):
+    """
+    Follow q/Q/cm/Do in a content stream, recording the largest size (in points)
+    at which each image XObject is drawn. Form XObjects are followed recursively.
+    """
+    if resources is None or '/XObject' not in resources or depth > 8:
+        return
+
+    xobjects = resources['/XObject']
+    stack = []
+
+    for operands, operator in pikepdf.parse_content_stream(content, "q Q cm Do"):
+        op = str(operator)
+        if op == "q":
+            stack.append(ctm)
+        elif op == "Q":
+            ctm = stack.pop() if stack else IDENTITY
+        elif op == "cm":
+            ctm = _multiply(tuple(float(v) for v in operands), ctm)
+        elif op == "Do":
+            name = operands[0]
+            if name not in xobjects:
+                continue
+            xobj = xobjects[name]
+            subtype = xobj.get('/Subtype')
+
+            if subtype == '/Image' and xobj.is_indirect:
+                a, b, c, d = ctm[:4]
+                width, height = math.hypot(a, b), math.hypot(c, d)
+                key = xobj.objgen
+                previous = placements.get(key, (0.0, 0.0))
+                placements[key] = (max(previous[0], width), max(previous[1], height))
+
+            elif subtype == '/Form':
+                matrix = tuple(float(v) for v in xobj.get('/Matrix', IDENTITY))
+                _walk_content(xobj, xobj.get('/Resources', resources), _multiply(matrix, ctm), placements, depth + 1)
+
+def image_placements(pdf: pikepdf.Pdf) -> Dict[Tuple[int, int], Tuple[float, float]]:
+    """
+    Find the largest placement size of every image drawn on the pages
+
+    Returns:
+        {image objgen: (width in points, height in points)}
+    """
+    placements: Dict[Tuple[int, int], Tuple[float, float]] = {}
+
+    for page in pdf.pages:
+        try:
+            _walk_content(page, page.obj.get('/Resources'), IDENTITY, placements)
+        except Exception as e:
+            logger.warning(f"Could not analyse page content: {e}")
+
+    return placements
+
+def full_page_image(page: pikepdf.Page) -> Optional[pikepdf.Object]:
+    """
+    The image XObject of a page that consists of exactly one full-page image
+
+    Such pages (typical of scanned PDFs) draw a single unrotated image
+    covering the crop box and nothing else. Pages with text, vector
+    graphics, several images, masks, page rotation or flipped placements
+    return None and need rendering.
+    """
+    try:
+        if int(page.obj.get('/Rotate', 0)) % 360:
+            return None
+        resources = page.obj.get('/Resources')
+        xobjects = resources.get('/XObject') if resources is not None else None
+        if xobjects is None or len(xobjects.keys()) != 1:
+            return None
+        image = xobjects[list(xobjects.keys())[0]]
+        if image.get('/Subtype') != '/Image':
+            return None
+        if image.get('/ImageMask', False) or '/SMask' in image or '/Mask' in image or '/Decode' in image:
+            return None
+
+        ctm, stack, placement = IDENTITY, [], None
+        for operands, operator in pikepdf.parse_content_stream(page):
+            op = str(operator)
+            if op not in IMAGE_PAGE_OPERATORS or (op == "Do" and placement is not None):
+                return None
+            if op == "q":
+                stack.append(ctm)
+            elif op == "Q":
+                ctm = stack.pop() if stack else IDENTITY
+            elif op == "cm":
+                ctm = _multiply(tuple(float(v) for v in operands), ctm)
+            elif op == "Do":
+                placement = ctm
+
+        if placement is None:
+            return None
+        a, b, c, d, e, f = placement
+        if abs(b) > 1e-6 or abs(c) > 1e-6 or a <= 0 or d <= 0:
+            return None
+
+        x0, y0, x1, y1 = (float(v) for v in page.cropbox)
+        edges = (e - min(x0, x1), f - min(y0, y1), e + a - max(x0, x1), f + d - max(y0, y1))
+        if max(abs(edge) for edge in edges) > FULL_PAGE_TOLERANCE:
+            return None
+        return image
+
+    except Exception as e:
+        logger.warning(f"Could not analyse page content: {e}")
+        return None
+
+def _jpeg_data(image: pikepdf.Object, filters: List) -> Optional[bytes]:
+    """
+    The JPEG file inside a DCTDecode image stream
+
+    Outer filters (e.g. ASCII85Decode + DCTDecode, as written by reportlab)
+    are undone by reading a copy of the raw data that lists only those filters.
+    """
+    if len(filters) == 1:
+        return image.read_raw_bytes()
+
+    try:
+        scratch = pikepdf.new()
+        stream = pikepdf.Stream(scratch, image.read_raw_bytes())
+        stream.Filter = pikepdf.Array(filters[:-1])
+        parms = image.get('/DecodeParms')
+        if isinstance(parms, pikepdf.Array):
+            stream.DecodeParms = pikepdf.Array(list(parms)[:-1])
+        return stream.read_bytes()
+    except pikepdf.PdfError as e:
+        logger.warning(f"Could not unwrap JPEG data: {e}")
+        return None
+
+def page_image_bytes(image: pikepdf.Object, image_format: str, quality: int) -> Optional[bytes]:
+    """
+    Encode a full-page image XObject as PNG/JPEG without rendering the page
+
+    Gray/RGB JPEG streams are passed through untouched when JPEG (or
+    "auto") is wanted; anything else is decoded at its native resolution
+    and encoded with encode_page.
+
+    Returns:
+        Encoded image, or None if the image cannot be decoded
+    """
+    filters = image.get('/Filter')
+    filters = list(filters) if isinstance(filters, pikepdf.Array) else [filters]
+    if image_format in ("JPEG", "auto") and filters[-1:] == ['/DCTDecode'] and jpeg_mode(image) is not None:
+        jpeg = _jpeg_data(image, filters)
+        if jpeg is not None:
+            return jpeg
+
+    try:
+        pil = pikepdf.PdfImage(image).as_pil_image()
+    except Exception as e:
+        logger.warning(f"Could not decode page image: {e}")
+        return None
+
+    return encode_page(pil, image_format, quality)
+
+def page_codec(pil: Image.Image) -> str:
+    """
+    PIL format suited to a page image: PNG for line art and text (bilevel
+    content, where JPEG rings and bloats), JPEG for photos and gray scans
+    """
+    if pil.mode == "1" or classify_scan_image(pil if pil.mode in ("L", "RGB") else pil.convert("RGB")) == "bilevel":
+        return "PNG"
+    return "JPEG"
+
+def encode_page(pil: Image.Image, image_format: str, quality: int) -> bytes:
+    """
+    Encode a page image in memory
+
+    Args:
+        pil: Page image
+        image_format: "PNG", "JPEG" or "auto" (chosen by page_codec)
+        quality: JPEG quality
+
+    Returns:
+        Encoded image
+    """
+    if image_format == "auto":
+        image_format = page_codec(pil)
+        if image_format == "PNG" and pil.mode == "RGB":
+            pil = pil.convert("L")  # Line art carries no colour
+
+    if pil.mode not in (("L", "RGB") if image_format == "JPEG" else ("1", "L", "RGB")):
+        pil = pil.convert("RGB")
+    buffer = io.BytesIO()
+    pil.save(buffer, image_format, quality=quality)
+    return buffer.getvalue()
+
+def effective_dpi(pixel_width: int, pixel_height: int, placement: Tuple[float, float]) -> float:
+    """Resolution of an image at its placement size (the lower of both axes, so neither gets under-sampled)"""
+    width_pts, height_pts = placement
+    dpis = []
+    if width_pts > 0:
+        dpis.append(pixel_width / (width_pts / 72))
+    if height_pts > 0:
+        dpis.append(pixel_height / (height_pts / 72))
+    return min(dpis) if dpis else 0.0
+
+def jpeg_mode(image: pikepdf.Object) -> Optional[str]:
+    """PIL mode ("RGB"/"L") matching the image colour space, or None if unsupported"""
+    colorspace = image.get('/ColorSpace')
+    if isinstance(colorspace, pikepdf.Name):
+        return JPEG_COLORSPACES.get(str(colorspace))
+    if isinstance(colorspace, pikepdf.Array) and len(colorspace) == 2 and colorspace[0] == '/ICCBased':
+        return {1: "L", 3: "RGB"}.get(int(colorspace[1].get('/N', 0)))
+    return None
+
+def is_jpeg_candidate(image: pikepdf.Object) -> bool:
+    """
+    Whether an image XObject can be safely decoded and re-encoded as JPEG
+
+    Skips masks, colour-key masked images, custom decode arrays and
+    colour spaces other than RGB/gray (device or ICC based).
+    """
+    if image.get('/ImageMask', False) or '/Mask' in image or '/Decode' in image:
+        return False
+    if int(image.get('/BitsPerComponent', 8)) != 8:
+        return False
+    if jpeg_mode(image) is None:
+        return False
+    filters = image.get('/Filter')
+    if filters is not None and '/JPXDecode' in (list(filters) if isinstance(filters, pikepdf.Array) else [filters]):
+        return False
+    return True
+
+def decode_image(image: pikepdf.Object) -> Optional[Image.Image]:
+    """Decode an image XObject to an 8-bit RGB or L PIL image"""
+    try:
+        pil = pikepdf.PdfImage(image).as_pil_image()
+        mode = jpeg_mode(image) or "RGB"
+        return pil if pil.mode == mode else pil.convert(mode)
+    except Exception as e:
+        logger.warning(f"Could not decode image: {e}")
+        return None
+
+def encode_jpeg(pil: Image.Image, scale: float, quality: int) -> Tuple[bytes, int, int]:
+    """
+    Downsample (if scale < 1) and encode an image as JPEG
+
+    Returns:
+        (JPEG bytes, width, height)
+    """
+    if scale < 1.0:
+        size = (max(1, round(pil.width * scale)), max(1, round(pil.height * scale)))
+        pil = pil.resize(size, Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    pil.save(buffer, "JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), pil.width, pil.height
+
+def jpeg_bytes_per_pixel(pil: Image.Image, qualities: List[int], max_pixels: int = 1_000_000) -> Dict[int, float]:
+    """
+    Trial-encode an image at several JPEG qualities
+
+    Large images are first reduced to about `max_pixels` to keep this cheap.
+
+    Returns:
+        {quality: encoded bytes per pixel}
+    """
+    pixels = pil.width * pil.height
+    if pixels > max_pixels:
+        scale = (max_pixels / pixels) ** 0.5
+        pil = pil.resize((max(1, round(pil.width * scale)), max(1, round(pil.height * scale))), Image.BILINEAR)
+        pixels = pil.width * pil.height
+
+    result = {}
+    for quality in qualities:
+        buffer = io.BytesIO()
+        pil.save(buffer, "JPEG", quality=quality)
+        result[quality] = buffer.tell() / pixels
+    return result
+
+def classify_scan_image(pil: Image.Image) -> str:
+    """
+    Classify a (scanned) page image from its pixel statistics
+
+    Returns:
+        "color", "gray" or "bilevel"
+    """
+    pixels = pil.width * pil.height
+    if pixels > CLASSIFY_PIXELS:
+        step = math.ceil(math.sqrt(pixels / CLASSIFY_PIXELS))
+        pil = pil.resize((max(1, pil.width // step), max(1, pil.height // step)), Image.NEAREST)
+
+    if pil.mode == "RGB":
+        channels = np.asarray(pil, dtype=np.int16)
+        chroma = channels.max(axis=2) - channels.min(axis=2)
+        if np.count_nonzero(chroma > COLOR_CHROMA) > COLOR_FRACTION * chroma.size:
+            return "color"
+        pil = pil.convert("L")
+
+    gray = np.asarray(pil)
+    histogram = np.bincount(gray.ravel(), minlength=256)
+    midtones = histogram[MIDTONE_RANGE[0]:MIDTONE_RANGE[1]].sum()
+
+    return "bilevel" if midtones < BILEVEL_MIDTONE_FRACTION * gray.size else "gray"
+
+def otsu_threshold(gray: Image.Image) -> int:
+    """Gray level that best separates ink from paper (Otsu's method)"""
+    histogram = np.bincount(np.asarray(gray).ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+
+    weight_dark = np.cumsum(histogram)
+    weight_light = weight_dark[-1] - weight_dark
+    sum_dark = np.cumsum(histogram * levels)
+    mean_dark = sum_dark / np.maximum(weight_dark, 1)
+    mean_light = (sum_dark[-1] - sum_dark) / np.maximum(weight_light, 1)
+
+    between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between))
+
+def encode_bilevel(pil: Image.Image, scale: float) -> Tuple[bytes, int, int, str]:
+    """
+    Threshold an image to 1 bit and encode it as CCITT G4 (Flate as fallback)
+
+    Returns:
+        (data, width, height, "G4" or "1")
+    """
+    gray = pil.convert("L")
+    if scale < 1.0:
+        size = (max(1, round(gray.width * scale)), max(1, round(gray.height * scale)))
+        gray = gray.resize(size, Image.LANCZOS)
+
+    threshold = otsu_threshold(gray)
+    bilevel = gray.point(lambda value: 255 if value > threshold else 0).convert("1", dither=Image.NONE)
+
+    try:
+        # CCITT codes black runs from 1 bits, so ink must be 1
+        inverted = bilevel.point(lambda value: 255 - value)
+        buffer = io.BytesIO()
+        inverted.save(buffer, "TIFF", compression="group4", strip_size=2 ** 30)
+        tiff = Image.open(buffer)
+        offsets, counts = tiff.tag_v2[273], tiff.tag_v2[279]
+        if len(offsets) == 1:
+            data = buffer.getvalue()[offsets[0]:offsets[0] + counts[0]]
+            return data, bilevel.width, bilevel.height, "G4"
+    except Exception as e:
+        logger.warning(f"CCITT G4 encoding failed, using Flate: {e}")
+
+    # PDF 1-bit gray: 1 = white, same as PIL mode "1"
+    return zlib.compress(bilevel.tobytes(), 9), bilevel.width, bilevel.height, "1"
+
+def encode_image(pil: Image.Image, scale: float, quality: int, scan: bool = False,
+                 bilevel_scale: float = 1.0) -> Tuple[bytes, int, int, str]:
+    """
+    Encode an image for re-insertion into the PDF
+
+    With `scan`, images are classified first: bilevel ones become 1-bit
+    (downsampled by `bilevel_scale`), grayscale ones 8-bit gray JPEG.
+
+    Returns:
+        (data, width, height, kind) where kind is "RGB"/"L" (JPEG), "G4" or "1"
+    """
+    kind = classify_scan_image(pil) if scan else pil.mode
+
+    if kind == "bilevel":
+        return encode_bilevel(pil, bilevel_scale)
+    if kind == "gray":
+        pil = pil.convert("L")
+
+    data, width, height = encode_jpeg(pil, scale, quality)
+    return data, width, height, pil.mode
+
+def replace_encoded(image: pikepdf.Object, data: bytes, width: int, height: int, kind: str):
+    """Replace an image XObject's data with the output of encode_image"""
+    if kind in ("RGB", "L"):
+        replace_with_jpeg(image, data, width, height, kind)
+        return
+
+    if kind == "G4":
+        image.write(data, filter=pikepdf.Name.CCITTFaxDecode,
+                    decode_parms=pikepdf.Dictionary(K=-1, Columns=width, Rows=height))
+    else:
+        image.write(data, filter=pikepdf.Name.FlateDecode)
+        if '/DecodeParms' in image:
+            del image['/DecodeParms']
+
+    image.Width = width
+    image.Height = height
+    image.ColorSpace = pikepdf.Name.DeviceGray
+    image.BitsPerComponent = 1
+
+def replace_with_jpeg(image: pikepdf.Object, data: bytes, width: int, height: int, mode: str):
+    """Replace an image XObject's data with a JPEG stream"""
+    image.write(data, filter=pikepdf.Name.DCTDecode)
+    image.Width = width
+    image.Height = height
+    image.ColorSpace = pikepdf.Name.DeviceGray if mode == "L" else pikepdf.Name.DeviceRGB
+    image.BitsPerComponent = 8
+    if '/DecodeParms' in image:
+        del image['/DecodeParms']
@@ -0,0 +1,102 @@
+import os
+import time
+import uuid
+import logging
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Job:
+    """
+    Asynchronous PDF operation and its result
+    """
+    id: str
+    operation: str
+    status: str = "queued"  # queued/running/completed/failed
+    error: Optional[str] = None
+    result_path: Optional[str] = None
+    filename: Optional[str] = None
+    media_type: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)  # Report headers sent with the result
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    task: Any = field(default=None, repr=False)  # asyncio.Task running the job
+    workspace: Any = field(default=None, repr=False)  # Workspace holding input and result
+
+    def update(self, **changes):
+        """Update job fields and touch the timestamp"""
+        for key, value in changes.items():
+            setattr(self, key, value)
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public representation for the status endpoint"""
+        return {
+            "job_id": self.id,
+            "operation": self.operation,
+            "status": self.status,
+            "error": self.error,
+            "filename": self.filename if self.status == "completed" else None,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+class JobStore:
+    """
+    In-process job registry with TTL eviction
+
+    Jobs (and their result files) are dropped `ttl` seconds after their last update.
+    """
+
+    def __init__(self, ttl: int = 1800):
+        self.ttl = ttl
+        self.jobs: Dict[str, Job] = {}
+
+    def create(self, operation: str) -> Job:
+        """Register a new queued job"""
+        self.evict_expired()
+        job = Job(id=uuid.uuid4().hex, operation=operation)
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by id (None if unknown or expired)"""
+        self.evict_expired()
+        return self.jobs.get(job_id)
+
+    def evict_expired(self) -> int:
+        """
+        Remove finished jobs older than the TTL and delete their result files
+
+        Returns:
+            Number of evicted jobs
+        """
+        now = time.time()
+        expired = [
+            job for job in self.jobs.values()
+            if job.status in ("completed", "failed") and now - job.updated_at > self.ttl
+        ]
+
+        for job in expired:
+            del self.jobs[job.id]
+            if job.workspace is not None:
+                job.workspace.cleanup()
+            elif job.result_path and os.path.exists(job.result_path):
+                try:
+                    os.unlink(job.result_path)
+                except Exception as e:
+                    logger.warning(f"Failed to delete job result {job.result_path}: {e}")
+
+        if expired:
+            logger.info(f"Evicted {len(expired)} expired jobs")
+
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts by status"""
+        counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
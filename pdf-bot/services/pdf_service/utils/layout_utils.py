@@ -0,0 +1,159 @@
+import re
+import logging
+from dataclasses import dataclass, field
+from statistics import median
+from typing import List, Tuple
+
+from pdfminer.layout import LTAnno, LTChar, LTFigure, LTImage, LTPage, LTTextBox, LTTextLine
+
+logger = logging.getLogger(__name__)
+
+# Pages with fewer visible characters than this are treated as image-only
+MIN_PAGE_TEXT_CHARS = 20
+
+# A block is a heading if its font is this much larger than the page body text
+HEADING_SIZE_RATIO = 1.2
+HEADING_TITLE_RATIO = 1.6
+HEADING_MAX_CHARS = 200
+
+# Figures/images kept on text pages, as a fraction of the page area: smaller
+# ones are decorations (rules, bullets), larger ones page backgrounds
+MIN_FIGURE_AREA = 0.01
+MAX_FIGURE_AREA = 0.9
+
+BOLD_PATTERN = re.compile(r"bold|black|heavy|semibold", re.IGNORECASE)
+ITALIC_PATTERN = re.compile(r"italic|oblique", re.IGNORECASE)
+
+@dataclass
+class TextRun:
+    """Consecutive characters sharing the same style"""
+    text: str
+    bold: bool = False
+    italic: bool = False
+    size: float = 0.0
+
+@dataclass
+class TextBlock:
+    """A paragraph or heading rebuilt from a pdfminer text box"""
+    runs: List[TextRun] = field(default_factory=list)
+    size: float = 0.0  # Dominant font size in points
+    bbox: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 0.0)
+    heading_level: int = 0  # 0 = body text
+
+    @property
+    def text(self) -> str:
+        return "".join(run.text for run in self.runs)
+
+def _style(char: LTChar) -> Tuple[bool, bool, float]:
+    fontname = char.fontname or ""
+    return bool(BOLD_PATTERN.search(fontname)), bool(ITALIC_PATTERN.search(fontname)), round(char.size, 1)
+
+def _line_items(line: LTTextLine):
+    """(text, style) per character of a line; spaces inherit the previous style"""
+    style = None
+    for item in line:
+        if isinstance(item, LTChar):
+            style = _style(item)
+            yield item.get_text(), style
+        elif isinstance(item, LTAnno) and style is not None:
+            text = item.get_text()
+            if text != "\n":
+                yield text, style
+
+def _build_block(box: LTTextBox) -> TextBlock:
+    """Join the lines of a text box into one paragraph of styled runs"""
+    runs: List[TextRun] = []
+    sizes: List[float] = []
+
+    def append(text: str, style):
+        bold, italic, size = style
+        if runs and (runs[-1].bold, runs[-1].italic, runs[-1].size) == style:
+            runs[-1].text += text
+        else:
+            runs.append(TextRun(text, bold, italic, size))
+
+    lines = [line for line in box if isinstance(line, LTTextLine)]
+    for index, line in enumerate(lines):
+        items = list(_line_items(line))
+        if not items:
+            continue
+        for text, style in items:
+            append(text, style)
+            if text.strip():
+                sizes.append(style[2])
+
+        if index < len(lines) - 1 and runs:
+            # Re-join words hyphenated across lines, otherwise lines are separated by a space
+            continues_word = lines[index + 1].get_text()[:1].islower()
+            if continues_word and runs[-1].text.endswith("-") and not runs[-1].text.endswith(" -"):
+                runs[-1].text = runs[-1].text[:-1]
+            elif not runs[-1].text.endswith(" "):
+                runs[-1].text += " "
+
+    for run in runs:
+        run.text = re.sub(r"\s+", " ", run.text)
+    if runs:
+        runs[-1].text = runs[-1].text.rstrip()
+        runs[0].text = runs[0].text.lstrip()
+
+    return TextBlock(
+        runs=[run for run in runs if run.text],
+        size=median(sizes) if sizes else 0.0,
+        bbox=tuple(box.bbox)
+    )
+
+def page_blocks(layout: LTPage) -> List[TextBlock]:
+    """
+    Paragraphs and headings of a page, in pdfminer's reading order
+
+    Headings are blocks whose font is clearly larger than the page's body
+    text (the most common character size); level 1 for much larger text.
+
+    Returns:
+        List of TextBlock (empty for image-only pages)
+    """
+    blocks = [_build_block(item) for item in layout if isinstance(item, LTTextBox)]
+    blocks = [block for block in blocks if block.text.strip()]
+
+    if sum(len(block.text.strip()) for block in blocks) < MIN_PAGE_TEXT_CHARS:
+        return []
+
+    # Body size: the size covering the most characters
+    weights = {}
+    for block in blocks:
+        weights[block.size] = weights.get(block.size, 0) + len(block.text)
+    body_size = max(weights, key=weights.get)
+
+    for block in blocks:
+        if body_size and len(block.text) <= HEADING_MAX_CHARS:
+            ratio = block.size / body_size
+            if ratio >= HEADING_TITLE_RATIO:
+                block.heading_level = 1
+            elif ratio >= HEADING_SIZE_RATIO:
+                block.heading_level = 2
+
+    return blocks
+
+def page_figures(layout: LTPage) -> List[Tuple[float, float, float, float]]:
+    """
+    Bounding boxes of a page's images and form XObjects (pdfminer
+    LTImage/LTFigure), top to bottom
+
+    Returns:
+        List of (x0, y0, x1, y1) in PDF points, within MIN/MAX_FIGURE_AREA
+    """
+    page_area = layout.width * layout.height
+    if page_area <= 0:
+        return []
+
+    figures = []
+    for item in layout:
+        if not isinstance(item, (LTFigure, LTImage)):
+            continue
+        x0, y0, x1, y1 = (max(item.x0, layout.x0), max(item.y0, layout.y0),
+                          min(item.x1, layout.x1), min(item.y1, layout.y1))
+        area = max(0.0, x1 - x0) * max(0.0, y1 - y0)
+        if MIN_FIGURE_AREA <= area / page_area <= MAX_FIGURE_AREA:
+            figures.append((x0, y0, x1, y1))
+
+    return sorted(figures, key=lambda bbox: -bbox[3])
@@ -0,0 +1,121 @@
+import logging
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from config import settings
+from utils.ocr_preprocess import REFERENCE_DPI, binarize
+
+logger = logging.getLogger(__name__)
+
+# Components counted as characters: height within this range (pixels at the
+# probe resolution, the minimum keeps out specks and the maximum out
+# pictures) and width/height within CHARACTER_ASPECT (keeps out rules)
+MIN_CHARACTER_HEIGHT = 3
+MAX_CHARACTER_HEIGHT = 60
+CHARACTER_ASPECT = (0.15, 3.0)
+
+# Fewer characters than this and the page keeps the default OCR DPI
+MIN_CHARACTERS = 20
+
+# Chosen DPIs are rounded to this step, so pages of similar type size share
+# renders in the page cache
+DPI_STEP = 25
+
+def label_components(ink: np.ndarray) -> np.ndarray:
+    """
+    8-connected component labels of an ink mask
+
+    Every ink pixel starts labelled with its own number and repeatedly
+    takes the smallest label among its neighbours, with pointer jumping
+    (a label is the number of a pixel whose label may be smaller still) so
+    long strokes converge in a few passes. Only ink pixels are visited.
+
+    Returns:
+        Array of component labels (the smallest pixel number in the component), -1 for paper
+    """
+    padded = np.pad(ink, 1)
+    positions = np.flatnonzero(padded)
+    count = len(positions)
+
+    # Pixel numbers by position, `count` (larger than any label) for paper
+    numbers = np.full(padded.size, count, dtype=np.int64)
+    numbers[positions] = np.arange(count)
+    stride = padded.shape[1]
+    offsets = np.array([dy * stride + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1)])
+    neighbours = numbers[positions[:, None] + offsets]
+
+    labels = np.arange(count + 1)
+    while True:
+        updated = labels[neighbours].min(axis=1)
+        updated = updated[updated]
+        if np.array_equal(updated, labels[:count]):
+            break
+        labels[:count] = updated
+
+    result = np.full(padded.size, -1, dtype=np.int64)
+    result[positions] = labels[:count]
+    return result.reshape(padded.shape)[1:-1, 1:-1]
+
+def estimate_x_height(gray: np.ndarray, dpi: int) -> Optional[float]:
+    """
+    x-height of the body text of a page, in pixels
+
+    Connected components of character size are taken as glyphs; lowercase
+    letters without ascenders or descenders are the most frequent height,
+    so the mode of the glyph heights (refined by averaging the heights
+    next to it) is the x-height.
+
+    Args:
+        gray: Grayscale page
+        dpi: Resolution of the page (scales the binarization window)
+
+    Returns:
+        Estimated x-height, or None if the page has too little text
+    """
+    window = max(3, settings.ocr_binarize_window * dpi // REFERENCE_DPI)
+    ink = binarize(gray, window, settings.ocr_binarize_k) == 0
+    if not ink.any():
+        return None
+
+    labels = label_components(ink)
+    rows, columns = np.nonzero(labels >= 0)
+    components, inverse = np.unique(labels[rows, columns], return_inverse=True)
+
+    top = np.full(len(components), np.iinfo(np.int32).max)
+    bottom = np.full(len(components), -1)
+    left, right = top.copy(), bottom.copy()
+    np.minimum.at(top, inverse, rows)
+    np.maximum.at(bottom, inverse, rows)
+    np.minimum.at(left, inverse, columns)
+    np.maximum.at(right, inverse, columns)
+
+    heights = bottom - top + 1
+    aspects = (right - left + 1) / heights
+    glyphs = heights[
+        (heights >= MIN_CHARACTER_HEIGHT) & (heights <= MAX_CHARACTER_HEIGHT)
+        & (aspects >= CHARACTER_ASPECT[0]) & (aspects <= CHARACTER_ASPECT[1])
+    ]
+    if len(glyphs) < MIN_CHARACTERS:
+        return None
+
+    counts = np.bincount(glyphs)
+    mode = int(np.argmax(counts))
+    near = np.arange(max(mode - 1, 0), min(mode + 2, len(counts)))
+    return float(np.dot(near, counts[near]) / counts[near].sum())
+
+def ocr_dpi_for(image: Image.Image, probe_dpi: int) -> Optional[int]:
+    """
+    DPI that brings the text of a probe render to OCR_TARGET_X_HEIGHT pixels
+
+    Returns:
+        DPI within OCR_MIN_DPI..OCR_MAX_DPI, None if no text size was found
+    """
+    x_height = estimate_x_height(np.asarray(image.convert("L")), probe_dpi)
+    if x_height is None:
+        return None
+
+    dpi = probe_dpi * settings.ocr_target_x_height / x_height
+    dpi = int(round(dpi / DPI_STEP) * DPI_STEP)
+    return min(max(dpi, settings.ocr_min_dpi), settings.ocr_max_dpi)
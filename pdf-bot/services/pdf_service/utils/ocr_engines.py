@@ -0,0 +1,121 @@
+import os
+import threading
+import logging
+from typing import Dict, List, Optional
+
+import pytesseract
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tesseract options: default (LSTM) engine, one uniform block of text per page
+OCR_CONFIG = r'--oem 3 --psm 6'
+
+class OcrEngine:
+    """
+    Recognizes the text of one page image; implementations must be thread-safe
+    """
+    name = "base"
+
+    def recognize(self, image_path: str, language: str) -> str:
+        raise NotImplementedError
+
+class PytesseractEngine(OcrEngine):
+    """
+    Runs the tesseract CLI per page (loads the traineddata every time)
+    """
+    name = "pytesseract"
+
+    def recognize(self, image_path: str, language: str) -> str:
+        # tesseract reads the rendered file directly
+        return pytesseract.image_to_string(image_path, lang=language, config=OCR_CONFIG)
+
+class TesserocrEngine(OcrEngine):
+    """
+    In-process Tesseract through tesserocr
+
+    API handles are kept per language for the life of the worker process, so
+    the traineddata is loaded once per handle instead of once per page. A
+    handle is used by one thread at a time; idle handles are pooled, so
+    there are at most as many per language as pages OCRed concurrently.
+    tesserocr releases the GIL while recognizing, so threads run in parallel.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+        self.tesserocr = tesserocr
+        self.idle: Dict[str, List] = {}
+        self.lock = threading.Lock()
+
+    def _acquire(self, language: str):
+        with self.lock:
+            handles = self.idle.get(language)
+            if handles:
+                return handles.pop()
+        logger.info(f"Loading Tesseract API for {language}")
+        return self.tesserocr.PyTessBaseAPI(
+            lang=language,
+            psm=self.tesserocr.PSM.SINGLE_BLOCK,
+            oem=self.tesserocr.OEM.DEFAULT
+        )
+
+    def _release(self, language: str, api):
+        with self.lock:
+            self.idle.setdefault(language, []).append(api)
+
+    def recognize(self, image_path: str, language: str) -> str:
+        api = self._acquire(language)
+        try:
+            api.SetImageFile(image_path)
+            text = api.GetUTF8Text()
+        except Exception:
+            api.End()  # Do not reuse a handle in an unknown state
+            raise
+        self._release(language, api)
+        return text
+
+# Engine shared by the OCR threads of this process
+_engine: Optional[OcrEngine] = None
+_engine_lock = threading.Lock()
+
+def _create_engine(backend: str) -> OcrEngine:
+    if backend in ("auto", "tesserocr"):
+        try:
+            engine = TesserocrEngine()
+            _, languages = engine.tesserocr.get_languages()
+            if not languages:
+                raise RuntimeError("no traineddata found")
+            return engine
+        except Exception as e:
+            log = logger.warning if backend == "tesserocr" else logger.info
+            log(f"tesserocr unavailable ({e}), using pytesseract")
+    elif backend != "pytesseract":
+        logger.warning(f"Unknown OCR engine: {backend}, using pytesseract")
+    return PytesseractEngine()
+
+def get_ocr_engine(backend: Optional[str] = None) -> OcrEngine:
+    """
+    The OCR engine for this process (OCR_ENGINE: auto/tesserocr/pytesseract)
+
+    "auto" prefers the persistent tesserocr backend and falls back to
+    pytesseract when tesserocr or its traineddata is not installed.
+    Passing `backend` builds a new engine instead of the shared one.
+    """
+    global _engine
+
+    # Each tesseract uses one thread, whatever OCR_WORKERS is: parallelism comes from
+    # pages OCRed side by side within the CPU budget, and an OpenMP-threaded tesseract
+    # in every pool worker would oversubscribe the CPU. Set before tesserocr loads,
+    # OpenMP reads it at initialization.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+    if backend is not None:
+        return _create_engine(backend)
+
+    with _engine_lock:
+        if _engine is None:
+            _engine = _create_engine(settings.ocr_engine)
+            logger.info(f"OCR engine: {_engine.name}")
+        return _engine
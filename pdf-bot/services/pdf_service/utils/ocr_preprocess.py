@@ -0,0 +1,255 @@
+import time
+import logging
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from config import settings
+from utils.image_utils import otsu_threshold
+
+logger = logging.getLogger(__name__)
+
+# Preprocessing steps, always applied in this order: borders are found on the
+# gray page (a dark background binarizes to noise), and speckles are gone
+# before the skew search
+PREPROCESS_STEPS = ("crop", "binarize", "despeckle", "deskew")
+
+# Pixel sizes below are tuned for 300 DPI renders and scaled to the actual DPI
+REFERENCE_DPI = 300
+
+# Sauvola's dynamic range of the standard deviation (8-bit gray)
+SAUVOLA_R = 128.0
+
+# Local statistics are computed on the page reduced by this factor; lighting
+# varies slowly, so the threshold map is upsampled without visible loss
+BINARIZE_REDUCE = 4
+
+# Skew search: coarse step over +-max angle, then a fine step around the best
+# coarse angle, on at most this many ink pixels
+SKEW_COARSE_STEP = 0.5
+SKEW_FINE_STEP = 0.05
+SKEW_MAX_POINTS = 200_000
+
+# Skews smaller than this (degrees) are left alone, rotating would only blur
+MIN_SKEW = 0.1
+
+# Content rows/columns need at least this fraction of ink (ignores stray pixels)
+MIN_CONTENT_INK = 0.005
+
+# Pixels next to the background whose median gives the paper level painted over it
+PAPER_SAMPLES = 16
+
+# Margin kept around the cropped content (tesseract needs some)
+CROP_MARGIN = 20
+
+def parse_steps(steps: str) -> tuple:
+    """Steps enabled by a comma-separated list (OCR_PREPROCESS), in pipeline order"""
+    requested = {step.strip().lower() for step in steps.split(",") if step.strip()}
+    unknown = requested.difference(PREPROCESS_STEPS)
+    if unknown:
+        logger.warning(f"Unknown OCR preprocessing steps ignored: {', '.join(sorted(unknown))}")
+    return tuple(step for step in PREPROCESS_STEPS if step in requested)
+
+def _box_sum(integral: np.ndarray, radius: int) -> tuple:
+    """Window sums (and pixel counts) around every pixel from an integral image, windows clipped at the edges"""
+    height, width = integral.shape[0] - 1, integral.shape[1] - 1
+    y0 = np.clip(np.arange(height) - radius, 0, height)
+    y1 = np.clip(np.arange(height) + radius + 1, 0, height)
+    x0 = np.clip(np.arange(width) - radius, 0, width)
+    x1 = np.clip(np.arange(width) + radius + 1, 0, width)
+
+    sums = integral[y1][:, x1] - integral[y0][:, x1] - integral[y1][:, x0] + integral[y0][:, x0]
+    counts = np.outer(y1 - y0, x1 - x0)
+    return sums, counts
+
+def binarize(gray: np.ndarray, window: int, k: float) -> np.ndarray:
+    """
+    Sauvola adaptive threshold: T = mean * (1 + k * (std / R - 1)) per window
+
+    Handles uneven lighting (shadows, vignetting) that defeats a global
+    threshold. Mean and standard deviation come from integral images of a
+    reduced page, and the threshold map is scaled back up bilinearly.
+
+    Returns:
+        uint8 array, 0 for ink and 255 for paper
+    """
+    height, width = gray.shape
+    reduced = np.asarray(Image.fromarray(gray).reduce(BINARIZE_REDUCE), dtype=np.float64)
+    radius = max(1, window // (2 * BINARIZE_REDUCE))
+
+    integral = np.zeros((reduced.shape[0] + 1, reduced.shape[1] + 1))
+    integral[1:, 1:] = reduced.cumsum(0).cumsum(1)
+    squares = np.zeros_like(integral)
+    squares[1:, 1:] = (reduced ** 2).cumsum(0).cumsum(1)
+
+    sums, counts = _box_sum(integral, radius)
+    square_sums, _ = _box_sum(squares, radius)
+    mean = sums / counts
+    std = np.sqrt(np.maximum(square_sums / counts - mean ** 2, 0))
+    threshold = mean * (1 + k * (std / SAUVOLA_R - 1))
+
+    threshold = Image.fromarray(threshold.astype(np.float32), "F").resize((width, height), Image.BILINEAR)
+    return np.where(gray < np.asarray(threshold), 0, 255).astype(np.uint8)
+
+def estimate_skew(ink: np.ndarray, max_angle: float) -> float:
+    """
+    Text line angle in degrees by projection-profile search
+
+    Ink pixels are projected along each candidate angle; the angle that
+    lines text rows up best gives the sharpest profile (largest sum of
+    squared bin counts). Small angles are treated as shears, so each
+    candidate is one bincount over the ink coordinates.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 2:
+        return 0.0
+    if len(ys) > SKEW_MAX_POINTS:
+        stride = len(ys) // SKEW_MAX_POINTS + 1
+        ys, xs = ys[::stride], xs[::stride]
+    ys = ys.astype(np.float64)
+    xs = xs.astype(np.float64) - xs.mean()
+
+    def best(angles: np.ndarray) -> float:
+        scores = []
+        for angle in angles:
+            rows = np.round(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+            profile = np.bincount(rows - rows.min())
+            scores.append(np.dot(profile, profile))
+        return float(angles[int(np.argmax(scores))])
+
+    coarse = best(np.arange(-max_angle, max_angle + SKEW_COARSE_STEP / 2, SKEW_COARSE_STEP))
+    return best(np.arange(coarse - SKEW_COARSE_STEP, coarse + SKEW_COARSE_STEP + SKEW_FINE_STEP / 2, SKEW_FINE_STEP))
+
+def rotate(image: np.ndarray, angle: float, binary: bool) -> np.ndarray:
+    """Rotate by `angle` degrees (counter-clockwise), filling new corners with paper"""
+    rotated = Image.fromarray(image).rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+    rotated = np.asarray(rotated)
+    # Bilinear edges are gray; snap a binarized page back to two levels
+    return np.where(rotated < 128, 0, 255).astype(np.uint8) if binary else rotated
+
+def _fill_edge_runs(image: np.ndarray, dark: np.ndarray, axis: int):
+    """
+    Paint the dark pixels reaching in from the start of `axis` (the left
+    edge for rows, the top edge for columns) with the paper level next to
+    them, in place
+
+    Repeating the neighbouring paper level instead of painting white leaves
+    no edge for the adaptive threshold to pick up on unevenly lit pages; it
+    is a median so noise and the blurred page edge do not leave streaks.
+    """
+    if axis == 0:
+        image, dark = image.T, dark.T  # Views: columns as rows
+    lines, length = dark.shape
+
+    # Lines that are background all the way across fall outside the crop, they are only cleared
+    background = dark.all(axis=1)
+    dark[background] = False
+    first_light = np.where(background, 0, np.argmax(~dark, axis=1))
+    span = first_light.max()
+    if not span:
+        return
+
+    samples = np.minimum(first_light[:, None] + np.arange(PAPER_SAMPLES), length - 1)
+    paper = np.median(image[np.arange(lines)[:, None], samples], axis=1).astype(np.uint8)
+    # Only the pixels up to the longest run can change
+    runs = np.arange(span)[None, :] < first_light[:, None]
+    image[:, :span] = np.where(runs, paper[:, None], image[:, :span])
+    dark[:, :span] &= ~runs
+
+def crop_borders(gray: np.ndarray, ink: np.ndarray, margin: int) -> np.ndarray:
+    """
+    Remove the background around a photographed or scanned page, then crop
+    to the content plus a margin
+
+    The background is the dark runs reaching in from each image edge along
+    rows and columns, which covers the wedges left around a skewed page.
+
+    Returns:
+        The cropped grayscale image (unchanged when no content is found)
+    """
+    gray, ink = gray.copy(), ink.copy()
+    # Left, right, top and bottom edges; the flipped views write through
+    _fill_edge_runs(gray, ink, axis=1)
+    _fill_edge_runs(gray[:, ::-1], ink[:, ::-1], axis=1)
+    _fill_edge_runs(gray, ink, axis=0)
+    _fill_edge_runs(gray[::-1], ink[::-1], axis=0)
+
+    rows = np.flatnonzero(ink.mean(axis=1) >= MIN_CONTENT_INK)
+    columns = np.flatnonzero(ink.mean(axis=0) >= MIN_CONTENT_INK)
+    if not len(rows) or not len(columns):
+        return gray
+
+    # The margin is plain paper (repeating the edge rows would smear strokes touching them)
+    content = gray[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]
+    paper = int(np.median(content[::4, ::4]))
+    return np.pad(content, margin, mode="constant", constant_values=paper)
+
+def despeckle(image: np.ndarray, ink: np.ndarray, min_neighbors: int) -> np.ndarray:
+    """Turn ink pixels with fewer than `min_neighbors` ink neighbours (of 8) into paper"""
+    padded = np.pad(ink, 1).view(np.uint8)
+    height, width = ink.shape
+    neighbors = np.zeros(ink.shape, dtype=np.uint8)
+    for dy in range(3):
+        for dx in range(3):
+            if dy != 1 or dx != 1:
+                neighbors += padded[dy:dy + height, dx:dx + width]
+
+    speckles = ink & (neighbors < min_neighbors)
+    if not speckles.any():
+        return image
+    cleaned = image.copy()
+    cleaned[speckles] = 255
+    return cleaned
+
+def preprocess_page(image: Image.Image, dpi: int = REFERENCE_DPI, steps: Optional[Sequence[str]] = None,
+                    timings: Optional[Dict[str, float]] = None) -> Image.Image:
+    """
+    Prepare a rendered page or photo for OCR
+
+    Runs the enabled steps (OCR_PREPROCESS by default) in pipeline order:
+    border crop, adaptive binarization, despeckle and deskew. Steps before
+    binarization, or all of them without it, find ink with a global (Otsu)
+    threshold and work on the grayscale image.
+
+    Args:
+        image: Page image (converted to grayscale)
+        dpi: Resolution of the image, scales the window and margin sizes
+        steps: Steps to run (default from settings)
+        timings: If given, receives the seconds spent in each step
+
+    Returns:
+        Bilevel ("1") image if binarized, else grayscale ("L")
+    """
+    if steps is None:
+        steps = parse_steps(settings.ocr_preprocess)
+    scale = dpi / REFERENCE_DPI
+    gray = np.asarray(image.convert("L"))
+    binary = False
+
+    def ink_mask(array: np.ndarray) -> np.ndarray:
+        return array < (128 if binary else otsu_threshold(Image.fromarray(array)))
+
+    for step in PREPROCESS_STEPS:
+        if step not in steps:
+            continue
+        start = time.perf_counter()
+
+        if step == "crop":
+            gray = crop_borders(gray, ink_mask(gray), max(1, int(CROP_MARGIN * scale)))
+        elif step == "binarize":
+            gray = binarize(gray, max(3, int(settings.ocr_binarize_window * scale)), settings.ocr_binarize_k)
+            binary = True
+        elif step == "despeckle":
+            gray = despeckle(gray, ink_mask(gray), settings.ocr_despeckle_min_neighbors)
+        elif step == "deskew":
+            angle = estimate_skew(ink_mask(gray), settings.ocr_deskew_max_angle)
+            if abs(angle) >= MIN_SKEW:
+                # Lines slope down to the right for positive angles; rotating counter-clockwise levels them
+                gray = rotate(gray, angle, binary)
+
+        if timings is not None:
+            timings[step] = timings.get(step, 0.0) + time.perf_counter() - start
+
+    result = Image.fromarray(gray)
+    return result.convert("1", dither=Image.NONE) if binary else result
@@ -0,0 +1,148 @@
+import os
+import re
+import time
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# <cache_dir>/<content hash>/<page>-<dpi>-<gray|rgb>.<poppler output extension>
+ENTRY_PATTERN = re.compile(r"^(\d+)-(\d+)-(gray|rgb)\.(ppm|pgm|pbm|png|jpg|tif)$")
+
+# Other workers add to the shared cache too: its real size is re-read from
+# disk at least this often, not only when this process's own total is over
+EVICT_INTERVAL_SECONDS = 60
+
+# (dpi, grayscale, path) of one cached render
+CachedRender = Tuple[int, bool, Path]
+
+class PageCache:
+    """
+    Rendered pages keyed by (content hash, page, DPI, colour mode)
+
+    The cache lives on disk and is shared by all worker processes; it is
+    bounded by bytes, least-recently-used files (by mtime, refreshed on
+    every hit) evicted first. A render at a higher DPI can stand in for a
+    lower one, and a colour render for a grayscale one.
+
+    Pages are stored as poppler wrote them (hard-linked, not re-encoded).
+    A running byte total decides when to evict, so the directory is only
+    scanned once it is over budget (or every EVICT_INTERVAL_SECONDS).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.total_bytes: Optional[int] = None  # Unknown until the first scan
+        self.scanned_at = 0.0
+        self.lock = threading.Lock()  # Render threads of this process share the total
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def renders(self, content_hash: str) -> Dict[int, List[CachedRender]]:
+        """All cached renders of a document, by page number"""
+        renders: Dict[int, List[CachedRender]] = {}
+        try:
+            names = os.listdir(self.cache_dir / content_hash)
+        except FileNotFoundError:
+            return renders
+
+        for name in names:
+            match = ENTRY_PATTERN.match(name)
+            if match:
+                page, dpi, mode, _ = match.groups()
+                renders.setdefault(int(page), []).append((int(dpi), mode == "gray", self.cache_dir / content_hash / name))
+        return renders
+
+    @staticmethod
+    def best(candidates: List[CachedRender], dpi: int, grayscale: bool) -> Optional[CachedRender]:
+        """
+        The cheapest cached render that can produce `dpi`/`grayscale`
+
+        Exact DPI first, then the smallest higher DPI; colour renders serve
+        grayscale requests too (matching modes are preferred).
+        """
+        usable = [c for c in candidates if c[0] >= dpi and (grayscale or not c[1])]
+        if not usable:
+            return None
+        return min(usable, key=lambda c: (c[0], c[1] != grayscale))
+
+    def touch(self, path: Path) -> bool:
+        """Mark a cached render as used; False if it has been evicted meanwhile"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def put(self, content_hash: str, page: int, dpi: int, grayscale: bool, image_path: str):
+        """
+        Store a rendered page under its key, evicting if the cache is over budget
+
+        The file is hard-linked into the cache (copied across filesystems),
+        so the caller may keep using and then delete its own path.
+        """
+        directory = self.cache_dir / content_hash
+        extension = os.path.splitext(image_path)[1].lstrip(".").lower()
+        path = directory / f"{page}-{dpi}-{'gray' if grayscale else 'rgb'}.{extension}"
+        temp_path = directory / f".{page}-{dpi}.{os.getpid()}.{id(image_path)}.tmp"
+        try:
+            directory.mkdir(exist_ok=True)
+            try:
+                os.link(image_path, temp_path)
+            except OSError:
+                shutil.copyfile(image_path, temp_path)
+            os.utime(temp_path)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to cache rendered page {path}: {e}")
+            try:
+                temp_path.unlink()
+            except FileNotFoundError:
+                pass
+            return
+
+        with self.lock:
+            if self.total_bytes is not None:
+                self.total_bytes += os.path.getsize(path)
+            if self.total_bytes is None or self.total_bytes > self.max_bytes \
+                    or time.monotonic() - self.scanned_at > EVICT_INTERVAL_SECONDS:
+                self._evict()
+
+    def evict(self):
+        """Delete least-recently-used renders until the cache is under budget"""
+        with self.lock:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for path in self.cache_dir.glob("*/*"):
+            if not ENTRY_PATTERN.match(path.name):
+                continue
+            try:
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+            except FileNotFoundError:
+                continue  # Evicted by another worker
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                path.parent.rmdir()  # Only succeeds once a document has no pages left
+            except OSError:
+                pass
+            total -= size
+
+        self.total_bytes = total
+        self.scanned_at = time.monotonic()
+
+# Shared instance for the services in this process (None when disabled)
+page_cache = PageCache(settings.page_cache_dir, settings.page_cache_max_bytes) if settings.page_cache_enabled else None
@@ -0,0 +1,166 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from utils.cpu_budget import create_cpu_budget, init_cpu_budget
+
+logger = logging.getLogger(__name__)
+
+# Service name -> (module, class). Workers build one instance of each.
+SERVICE_CLASSES = {
+    "compress": ("services.compress_service", "CompressService"),
+    "convert": ("services.convert_service", "ConvertService"),
+    "preview": ("services.preview_service", "PreviewService"),
+    "ocr": ("services.ocr_service", "OcrService"),
+    "summarize": ("services.summarize_service", "SummarizeService"),
+    "translate": ("services.translate_service", "TranslateService"),
+    "secure": ("services.secure_service", "SecureService"),
+}
+
+# Service instances living in the current (worker) process
+_services: Dict[str, Any] = {}
+
+def _get_service(name: str) -> Any:
+    """
+    Get (or lazily create) the service instance for this process
+    """
+    if name not in _services:
+        module_name, class_name = SERVICE_CLASSES[name]
+        module = importlib.import_module(module_name)
+        _services[name] = getattr(module, class_name)()
+    return _services[name]
+
+def _init_worker(cpu_budget):
+    """
+    Worker initializer: install the pool's shared CPU budget, and import
+    pikepdf, pdf2image, pytesseract, pdfminer, etc. once per worker so the
+    first request does not pay for it
+    """
+    init_cpu_budget(cpu_budget)
+    for name in SERVICE_CLASSES:
+        try:
+            _get_service(name)
+        except Exception as e:
+            logger.warning(f"Failed to warm up {name} service: {e}")
+
+def _invoke(service_name: str, method: str, args: tuple, kwargs: dict) -> Any:
+    """
+    Run a service coroutine to completion inside the worker
+    """
+    service = _get_service(service_name)
+    return asyncio.run(getattr(service, method)(*args, **kwargs))
+
+class ProcessPool:
+    """
+    Process pool running the CPU-bound PDF services off the event loop
+    """
+
+    def __init__(self, workers: int, start_method: str = "spawn"):
+        self.workers = max(0, workers)
+        self.start_method = start_method
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.lock = threading.Lock()
+        self.active_tasks = 0
+        self.completed_tasks = 0
+        self.failed_tasks = 0
+
+    def start(self):
+        """Start the worker processes"""
+        with self.lock:
+            self._start()
+
+    def _start(self):
+        if self.workers == 0 or self.executor is not None:
+            return
+
+        # A fresh budget with every executor: slots held by a killed worker are never released
+        context = multiprocessing.get_context(self.start_method)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(create_cpu_budget(context),)
+        )
+        logger.info(f"Process pool started: {self.workers} workers ({self.start_method})")
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info("Process pool stopped")
+
+    async def run(self, service_name: str, method: str, *args, **kwargs) -> Any:
+        """
+        Run a service method in a worker process and await its result
+
+        Args:
+            service_name: Service key (compress/convert/preview/ocr/summarize/translate/secure)
+            method: Name of the async service method to call
+            *args, **kwargs: Arguments for the service method (must be picklable)
+
+        Returns:
+            Whatever the service method returns
+        """
+        if service_name not in SERVICE_CLASSES:
+            raise ValueError(f"Unknown service: {service_name}")
+
+        self.active_tasks += 1
+        executor = None
+        try:
+            if self.workers == 0:
+                result = await asyncio.to_thread(_invoke, service_name, method, args, kwargs)
+            else:
+                self.start()
+                executor = self.executor
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    executor, _invoke, service_name, method, args, kwargs
+                )
+            self.completed_tasks += 1
+            return result
+
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool so later requests still work
+            self.failed_tasks += 1
+            self._restart(executor)
+            raise
+
+        except Exception:
+            self.failed_tasks += 1
+            raise
+
+        finally:
+            self.active_tasks -= 1
+
+    def _restart(self, broken: Optional[ProcessPoolExecutor]):
+        """
+        Replace a broken executor with a fresh one
+
+        All futures of a broken executor fail together; only the first of
+        their handlers restarts it, the others find it already replaced and
+        must not shut down the new one.
+        """
+        with self.lock:
+            if broken is None or self.executor is not broken:
+                return
+            logger.error("Process pool broken, restarting workers")
+            self.executor = None
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._start()
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool statistics for the health endpoint"""
+        return {
+            "workers": self.workers,
+            "start_method": self.start_method,
+            "active_tasks": self.active_tasks,
+            "completed_tasks": self.completed_tasks,
+            "failed_tasks": self.failed_tasks
+        }
@@ -0,0 +1,306 @@
+import os
+import re
+import math
+import shutil
+import tempfile
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pdf2image
+import pikepdf
+from PIL import Image
+
+from config import settings
+from utils.cpu_budget import cpu_slots
+from utils.file_utils import file_sha256
+from utils.page_cache import CachedRender, PageCache, page_cache
+from utils.workspace import get_workspace_root
+
+logger = logging.getLogger(__name__)
+
+# Page number at the end of poppler output names ("<prefix>-007.ppm")
+PAGE_NUMBER_PATTERN = re.compile(r"-(\d+)\.\w+$")
+
+@dataclass
+class RenderedPage:
+    """
+    One rendered page, stored on disk until the renderer moves past it
+    """
+    number: int  # 1-based page number
+    path: str
+
+    def load(self) -> Image.Image:
+        """Read the page image into memory"""
+        with Image.open(self.path) as image:
+            image.load()
+            return image
+
+def page_pixel_sizes(input_path: str, dpi: int, first_page: Optional[int] = None,
+                     last_page: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Size in pixels of each page (MediaBox and /Rotate, as poppler renders it)
+
+    Returns:
+        [(width, height)] for pages first_page..last_page
+    """
+    with pikepdf.open(input_path) as pdf:
+        first, last = _page_range(len(pdf.pages), first_page, last_page)
+        return _pixel_sizes(pdf, dpi, first, last)
+
+def _pixel_sizes(pdf: pikepdf.Pdf, dpi: int, first: int, last: int) -> List[Tuple[int, int]]:
+    sizes = []
+    for page in pdf.pages[first - 1:last]:
+        x0, y0, x1, y1 = (float(v) for v in page.mediabox)
+        width, height = abs(x1 - x0), abs(y1 - y0)
+        if int(page.obj.get('/Rotate', 0)) % 180:
+            width, height = height, width
+        sizes.append((math.ceil(width * dpi / 72), math.ceil(height * dpi / 72)))
+    return sizes
+
+def _page_range(page_count: int, first_page: Optional[int], last_page: Optional[int]) -> Tuple[int, int]:
+    """Clamp an optional 1-based page range to the document"""
+    first = max(1, first_page or 1)
+    last = min(page_count, last_page or page_count)
+    return first, last
+
+def render_pages(input_path: str, dpi: int = 200, first_page: Optional[int] = None,
+                 last_page: Optional[int] = None, grayscale: bool = False,
+                 memory_limit: Optional[int] = None, workers: Optional[int] = None,
+                 content_hash: Optional[str] = None) -> Iterator[RenderedPage]:
+    """
+    Render PDF pages one at a time, in page order
+
+    The page range is split into shards rendered concurrently by separate
+    poppler processes, which write straight to files in the workspace root
+    (uncompressed PPM/PGM by default). Shards are sized so the rendered
+    pages alive at once stay under `memory_limit` bytes, and rendering
+    only runs `workers` shards ahead of the caller. Each page file is
+    deleted as soon as the caller moves on to the next page, so only the
+    page being processed is ever loaded into memory.
+    
+    Pages found in the rendered-page cache (at this DPI, or derived from a
+    higher-DPI/colour render) are not rendered again, and fresh renders
+    are added to it.
+
+    Args:
+        input_path: Path to the PDF
+        dpi: Rendering resolution
+        first_page, last_page: Optional 1-based page range
+        grayscale: Render 8-bit gray instead of RGB
+        memory_limit: Byte budget for rendered pages (default RENDER_MEMORY_BYTES)
+        workers: poppler processes (default: the CPUs free in the CPU budget, up to RENDER_WORKERS)
+        content_hash: SHA-256 of the PDF, if already known (for the page cache)
+
+    Returns:
+        Iterator of RenderedPage
+    """
+    return render_runs(input_path, [(first_page, last_page, dpi)], grayscale, memory_limit, workers, content_hash)
+
+def render_runs(input_path: str, runs: Iterable[Tuple[Optional[int], Optional[int], int]],
+                grayscale: bool = False, memory_limit: Optional[int] = None,
+                workers: Optional[int] = None, content_hash: Optional[str] = None) -> Iterator[RenderedPage]:
+    """
+    Render several page ranges, each at its own DPI, as one stream of pages
+
+    Like render_pages, but the shards of all runs share one pipeline, so
+    `workers` poppler processes stay busy across runs. `runs` may be a lazy
+    iterable: a run is only taken when the pipeline has room for it, so
+    callers can yield runs as soon as their DPI is known.
+
+    Args:
+        runs: (first page, last page, dpi) per run, pages yielded in this order
+        (others as for render_pages)
+
+    Returns:
+        Iterator of RenderedPage
+    """
+    # Open the PDF up front so broken input fails here, not on first iteration
+    with pikepdf.open(input_path) as pdf:
+        page_count = len(pdf.pages)
+        points = _pixel_sizes(pdf, 72, 1, page_count)
+
+    memory_limit = memory_limit or settings.render_memory_bytes
+    if page_cache is not None:
+        content_hash = content_hash or file_sha256(input_path)
+
+    if workers:
+        # The caller sized the pipeline (and holds the CPUs for it)
+        return _render_shards(
+            input_path, _plan_items(runs, page_count, points, grayscale, memory_limit, workers, content_hash),
+            grayscale, workers, content_hash
+        )
+    return _render_budgeted(input_path, runs, page_count, points, grayscale, memory_limit, content_hash)
+
+def _render_budgeted(input_path: str, runs: Iterable[Tuple[Optional[int], Optional[int], int]], page_count: int,
+                     points: List[Tuple[int, int]], grayscale: bool, memory_limit: int,
+                     content_hash: Optional[str]) -> Iterator[RenderedPage]:
+    """The render pipeline, holding the CPUs it borrowed from the budget while it runs"""
+    with cpu_slots(settings.render_workers) as workers:
+        yield from _render_shards(
+            input_path, _plan_items(runs, page_count, points, grayscale, memory_limit, workers, content_hash),
+            grayscale, workers, content_hash
+        )
+
+def _plan_items(runs: Iterable[Tuple[Optional[int], Optional[int], int]], page_count: int,
+                points: List[Tuple[int, int]], grayscale: bool, memory_limit: int, workers: int,
+                content_hash: Optional[str]) -> Iterator[Tuple[int, int, int, Optional[CachedRender]]]:
+    """
+    (first page, last page, dpi, cached render) work items of each run
+
+    Cached pages are single-page items; runs of the others are split into shards.
+    """
+    for first_page, last_page, dpi in runs:
+        first, last = _page_range(page_count, first_page, last_page)
+        if first > last:
+            continue
+        page_bytes = max(
+            math.ceil(width * dpi / 72) * math.ceil(height * dpi / 72) for width, height in points[first - 1:last]
+        ) * (1 if grayscale else 3)
+
+        cached = {}
+        if page_cache is not None:
+            renders = page_cache.renders(content_hash)
+            for number in range(first, last + 1):
+                source = PageCache.best(renders.get(number, []), dpi, grayscale)
+                if source is not None:
+                    cached[number] = source
+            if cached:
+                logger.debug(f"Page cache: {len(cached)} of {last - first + 1} pages cached")
+
+        run_start = None
+        for number in range(first, last + 2):
+            if number <= last and number not in cached:
+                run_start = run_start or number
+                continue
+            if run_start is not None:
+                for start, end in plan_shards(run_start, number - 1, page_bytes, memory_limit, workers):
+                    yield start, end, dpi, None
+                run_start = None
+            if number <= last:
+                yield number, number, dpi, cached[number]
+
+def plan_shards(first: int, last: int, page_bytes: int, memory_limit: int, workers: int) -> List[Tuple[int, int]]:
+    """
+    Split a page range into consecutive shards
+
+    Up to workers + 1 shards are on disk at once (being rendered, plus the
+    one being consumed), which bounds the shard size; small ranges are
+    spread evenly so every worker gets a share.
+
+    Returns:
+        [(first page, last page)] in page order
+    """
+    page_count = last - first + 1
+    by_memory = max(1, memory_limit // (page_bytes * (workers + 1)))
+    by_workers = math.ceil(page_count / workers)
+    size = min(by_memory, by_workers)
+
+    return [(start, min(last, start + size - 1)) for start in range(first, last + 1, size)]
+
+def _page_number(path: str) -> int:
+    match = PAGE_NUMBER_PATTERN.search(path)
+    return int(match.group(1)) if match else 0
+
+def _render_shard(input_path: str, dpi: int, start: int, end: int, grayscale: bool, root: str,
+                  content_hash: Optional[str] = None) -> Tuple[str, List[str]]:
+    """Render one shard with its own poppler process (and add the pages to the page cache)"""
+    output_folder = tempfile.mkdtemp(dir=root)
+
+    paths = pdf2image.convert_from_path(
+        input_path,
+        dpi=dpi,
+        first_page=start,
+        last_page=end,
+        grayscale=grayscale,
+        fmt=settings.render_format,
+        output_folder=output_folder,
+        paths_only=True
+    )
+    logger.debug(f"Rendered pages {start}-{end} of {input_path}")
+
+    # Zero padding of poppler's page numbers varies, so sort numerically
+    paths = sorted(paths, key=_page_number)
+
+    if page_cache is not None and content_hash:
+        for number, path in zip(range(start, end + 1), paths):
+            page_cache.put(content_hash, number, dpi, grayscale, path)
+
+    return output_folder, paths
+
+def _cached_page(input_path: str, dpi: int, number: int, grayscale: bool, root: str,
+                 content_hash: str, source: CachedRender) -> Tuple[str, List[str]]:
+    """
+    Produce a page from the page cache like _render_shard would
+
+    An exact match is hard-linked; higher-DPI or colour renders are scaled
+    and converted. If the entry was evicted meanwhile the page is rendered.
+    """
+    cached_dpi, cached_grayscale, cached_path = source
+    output_folder = tempfile.mkdtemp(dir=root)
+
+    try:
+        if not page_cache.touch(cached_path):
+            raise FileNotFoundError(cached_path)
+
+        if cached_dpi == dpi and cached_grayscale == grayscale:
+            output_path = os.path.join(output_folder, f"page-{number}{cached_path.suffix}")
+            try:
+                os.link(cached_path, output_path)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                shutil.copyfile(cached_path, output_path)  # Cache on another filesystem
+        else:
+            output_path = os.path.join(output_folder, f"page-{number}.{'pgm' if grayscale else 'ppm'}")
+            with Image.open(cached_path) as image:
+                derived = image.convert("L") if grayscale and image.mode != "L" else image
+                if cached_dpi != dpi:
+                    size = (max(1, round(image.width * dpi / cached_dpi)), max(1, round(image.height * dpi / cached_dpi)))
+                    derived = derived.resize(size, Image.LANCZOS)
+                derived.save(output_path, "PPM")
+
+    except FileNotFoundError:
+        shutil.rmtree(output_folder, ignore_errors=True)
+        return _render_shard(input_path, dpi, number, number, grayscale, root, content_hash)
+
+    return output_folder, [output_path]
+
+def _render_shards(input_path: str, items: Iterator[Tuple[int, int, int, Optional[CachedRender]]],
+                   grayscale: bool, workers: int, content_hash: Optional[str] = None) -> Iterator[RenderedPage]:
+    root = tempfile.mkdtemp(prefix="render_", dir=get_workspace_root())
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    exhausted = False
+
+    try:
+        while True:
+            # Keep `workers` shards rendering (or cached pages loading) ahead of the caller
+            while not exhausted and len(pending) < workers:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                    break
+                start, end, dpi, source = item
+                if source is None:
+                    future = executor.submit(_render_shard, input_path, dpi, start, end, grayscale, root, content_hash)
+                else:
+                    future = executor.submit(_cached_page, input_path, dpi, start, grayscale, root, content_hash, source)
+                pending.append((start, end, future))
+
+            if not pending:
+                break
+
+            start, end, future = pending.popleft()
+            output_folder, paths = future.result()
+
+            for number, path in zip(range(start, end + 1), paths):
+                yield RenderedPage(number, path)
+                os.unlink(path)
+
+            shutil.rmtree(output_folder, ignore_errors=True)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(root, ignore_errors=True)
@@ -1,24 +1,45 @@
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Optional, Dict, AsyncIterator, Callable
+import asyncio
 import tempfile
 import os
 import logging
+from utils.workspace import Workspace, get_workspace_root
 
 logger = logging.getLogger(__name__)
 
-def create_file_response(file_path: str, filename: str, media_type: str) -> FileResponse:
+# Growing output files are sent in chunks of this size, polling for new data
+STREAM_CHUNK_SIZE = 256 * 1024
+STREAM_POLL_SECONDS = 0.05
+
+def create_file_response(file_path: str, filename: str, media_type: str,
+                         workspace: Optional[Workspace] = None,
+                         headers: Optional[Dict[str, str]] = None) -> FileResponse:
     """
     Create a FileResponse with proper headers and cleanup
+    
+    If a request workspace is given, the result file is moved into it and the
+    whole workspace is deleted once the response has been sent. Extra
+    `headers` (e.g. operation reports) are added to the response.
     """
     try:
         # Ensure file exists
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Result file not found: {file_path}")
+        
+        background = None
+        if workspace is not None:
+            file_path = workspace.adopt(file_path)
+            workspace.hand_off()
+            background = BackgroundTask(workspace.cleanup)
             
         # Create response with custom filename
         response = FileResponse(
             path=file_path,
             media_type=media_type,
-            filename=filename
+            filename=filename,
+            background=background
         )
         
         # Add headers for better client handling
@@ -26,6 +47,7 @@ def create_file_response(file_path: str, filename: str, media_type: str) -> File
         response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
         response.headers["Pragma"] = "no-cache"
         response.headers["Expires"] = "0"
+        response.headers.update(headers or {})
         
         return response
         
@@ -33,6 +55,82 @@ def create_file_response(file_path: str, filename: str, media_type: str) -> File
         logger.error(f"Error creating file response: {e}")
         raise
 
+def _read_chunk(file_path: str, position: int) -> bytes:
+    with open(file_path, 'rb') as f:
+        f.seek(position)
+        return f.read(STREAM_CHUNK_SIZE)
+
+async def wait_for_output(file_path: str, task: asyncio.Future):
+    """
+    Wait until `task` has written the first bytes of `file_path` (or finished)
+
+    Called before a streaming response is committed, so a producer that
+    fails before its first output (bad input, limits) is reported with a
+    proper error status instead of an empty 200.
+
+    Raises:
+        The task's exception if it failed before writing anything
+    """
+    while not task.done() and not await asyncio.to_thread(os.path.getsize, file_path):
+        await asyncio.sleep(STREAM_POLL_SECONDS)
+    if task.done():
+        task.result()
+
+async def _tail_file(file_path: str, task: asyncio.Future, workspace: Optional[Workspace],
+                     on_complete: Optional[Callable[[str], None]]) -> AsyncIterator[bytes]:
+    """Yield a file's bytes as they are written, until the producing task is done"""
+    try:
+        position = 0
+        while True:
+            # Check before reading so the final bytes are never missed
+            finished = task.done()
+            chunk = await asyncio.to_thread(_read_chunk, file_path, position)
+            if chunk:
+                position += len(chunk)
+                yield chunk
+            elif finished:
+                break
+            else:
+                await asyncio.sleep(STREAM_POLL_SECONDS)
+
+        # The status is already sent: a failure is re-raised so the server
+        # drops the connection without the final chunk, and the client sees
+        # a broken transfer rather than a complete (truncated) file
+        task.result()
+        if on_complete is not None:
+            await asyncio.to_thread(on_complete, file_path)
+
+    except Exception as e:
+        logger.error(f"Streaming {file_path} failed: {e}")
+        raise
+
+    finally:
+        if workspace is not None:
+            if not task.done():
+                # Let the producer finish before its output directory goes away
+                await asyncio.wait([task])
+            workspace.cleanup()
+
+def create_streaming_file_response(file_path: str, task: asyncio.Future, filename: str, media_type: str,
+                                   workspace: Optional[Workspace] = None,
+                                   on_complete: Optional[Callable[[str], None]] = None) -> StreamingResponse:
+    """
+    Stream a file while `task` is still writing it (chunked transfer)
+
+    The file must only ever be appended to. Once the task has finished and
+    everything has been sent, `on_complete` is called with the file path
+    (e.g. to cache it) and the workspace is deleted. Await wait_for_output
+    first so early failures still get an error status; a later failure
+    aborts the transfer.
+    """
+    response = StreamingResponse(
+        _tail_file(file_path, task, workspace, on_complete),
+        media_type=media_type
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename=\"{filename}\""
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    return response
+
 def create_temp_response_file(content: str, extension: str = "txt") -> str:
     """
     Create a temporary file with content for response
@@ -41,7 +139,8 @@ def create_temp_response_file(content: str, extension: str = "txt") -> str:
         mode='w', 
         suffix=f'.{extension}',
         delete=False,
-        encoding='utf-8'
+        encoding='utf-8',
+        dir=get_workspace_root()
     )
     
     try:
@@ -58,7 +157,8 @@ def create_temp_binary_file(content: bytes, extension: str = "pdf") -> str:
     temp_file = tempfile.NamedTemporaryFile(
         mode='wb',
         suffix=f'.{extension}',
-        delete=False
+        delete=False,
+        dir=get_workspace_root()
     )
     
     try:
@@ -0,0 +1,190 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple
+
+from utils.workspace import get_workspace_root
+
+logger = logging.getLogger(__name__)
+
+class FallbackResult(str):
+    """
+    Path of a result that stands in for a failed operation (a placeholder
+    or a copy of the input); it is returned to the client but never cached,
+    so a transient failure is not served again on later requests
+    """
+
+def _clone_file(src: str, dst: str):
+    """Hard-link src to dst, falling back to a copy across filesystems"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+class ResultCache:
+    """
+    Disk-backed, content-addressed cache of operation results
+
+    Entries are keyed by the SHA-256 of the input PDF plus the normalized
+    operation parameters, and evicted least-recently-used once the cache
+    grows past `max_bytes`. Files handed out by `get` and passed to `put`
+    stay owned by the caller; the cache keeps its own link/copy. Optional
+    metadata (e.g. report headers) is kept in a hidden JSON sidecar.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[Path, int]]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU index from the files on disk (oldest first)"""
+        files = [path for path in self.cache_dir.iterdir() if path.is_file() and not path.name.startswith(".")]
+        files.sort(key=lambda path: path.stat().st_mtime)
+
+        for path in files:
+            size = path.stat().st_size
+            self.entries[path.stem] = (path, size)
+            self.total_bytes += size
+
+        if files:
+            logger.info(f"Result cache loaded: {len(files)} entries, {self.total_bytes} bytes")
+
+    @staticmethod
+    def make_key(content_hash: str, operation: str, params: Dict[str, Any]) -> str:
+        """
+        Build a cache key from the input hash, operation and parameters
+
+        None values are dropped, strings are stripped and JSON `options`
+        are re-serialized with sorted keys so equivalent requests share a key.
+        """
+        normalized = {}
+        for name, value in params.items():
+            if value is None:
+                continue
+            if isinstance(value, str):
+                value = value.strip()
+                if name == "options" and value:
+                    try:
+                        value = json.loads(value)
+                    except ValueError:
+                        pass
+            normalized[name] = value
+
+        payload = json.dumps({"operation": operation, "params": normalized}, sort_keys=True)
+        params_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+        return f"{content_hash}-{operation}-{params_hash[:16]}"
+
+    def _metadata_path(self, key: str) -> Path:
+        return self.cache_dir / f".{key}.json"
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, str]]]:
+        """
+        Look up a cached result
+
+        Returns:
+            (path to a private copy of the cached file, metadata), or None on a miss
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not entry[0].exists():
+                if entry is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+
+            path = entry[0]
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+        try:
+            # Persist recency so the LRU order survives restarts
+            os.utime(path)
+            # Same filesystem as the service outputs, so the janitor cleans it up and cloning stays cheap
+            fd, output_path = tempfile.mkstemp(suffix=path.suffix, dir=get_workspace_root())
+            os.close(fd)
+            os.unlink(output_path)
+            _clone_file(str(path), output_path)
+
+            metadata_path = self._metadata_path(key)
+            metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
+            return output_path, metadata
+
+        except Exception as e:
+            logger.warning(f"Failed to read cache entry {key}: {e}")
+            return None
+
+    def put(self, key: str, result_path: str, metadata: Optional[Dict[str, str]] = None):
+        """Store a copy of a result file (and its metadata) under `key`"""
+        try:
+            size = os.path.getsize(result_path)
+            if size > self.max_bytes:
+                return
+
+            path = self.cache_dir / f"{key}{Path(result_path).suffix}"
+            temp_path = self.cache_dir / f".{key}.tmp"
+            _clone_file(result_path, str(temp_path))
+
+            metadata_path = self._metadata_path(key)
+            if metadata:
+                metadata_path.write_text(json.dumps(metadata))
+            elif metadata_path.exists():
+                metadata_path.unlink()
+
+            os.replace(temp_path, path)
+
+            with self.lock:
+                if key in self.entries:
+                    self._forget(key)
+                self.entries[key] = (path, size)
+                self.total_bytes += size
+                self._evict()
+
+        except Exception as e:
+            logger.warning(f"Failed to cache result {key}: {e}")
+
+    def _forget(self, key: str):
+        """Drop an entry from the index (caller holds the lock)"""
+        path, size = self.entries.pop(key)
+        self.total_bytes -= size
+
+    def _evict(self):
+        """Remove least-recently-used entries until under budget (caller holds the lock)"""
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, (path, size) = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                path.unlink()
+                self._metadata_path(key).unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Failed to evict cache entry {path}: {e}")
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics for the health endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
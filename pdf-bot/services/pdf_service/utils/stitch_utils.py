@@ -0,0 +1,227 @@
+import io
+import zlib
+import struct
+import logging
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_FILTER_UP = 2
+
+# Compressed PNG data is written out in IDAT chunks of about this size
+IDAT_CHUNK_BYTES = 1024 * 1024
+
+# Largest width/height a baseline JPEG can describe
+JPEG_MAX_DIMENSION = 65535
+
+# JPEG markers (second byte) and the 4:2:0 MCU height/width in pixels
+JPEG_SOF0 = 0xC0
+JPEG_DHT = 0xC4
+JPEG_RST0 = 0xD0
+JPEG_SOS = 0xDA
+JPEG_DQT = 0xDB
+JPEG_MCU_SIZE = 16
+
+# Combined JPEGs are encoded in strips of this many MCU rows (fewer on very wide
+# images, as a strip is one restart interval, at most 65535 MCUs)
+JPEG_STRIP_MCU_ROWS = 16
+JPEG_MAX_RESTART_INTERVAL = 65535
+
+WHITE = (255, 255, 255)
+
+class ImageTooLargeError(ValueError):
+    """The combined image would exceed the configured pixel cap"""
+
+def check_canvas(sizes: List[Tuple[int, int]], output_format: str, max_pixels: int) -> Tuple[int, int]:
+    """
+    Size of the vertically combined canvas, refusing oversized output
+
+    Raises:
+        ImageTooLargeError: Over `max_pixels`, or over the JPEG dimension limit
+    """
+    width = max(width for width, _ in sizes)
+    height = sum(height for _, height in sizes)
+
+    if width * height > max_pixels:
+        raise ImageTooLargeError(
+            f"Combined image would be {width}x{height} pixels ({width * height / 1e6:.0f} MP), "
+            f"over the {max_pixels / 1e6:.0f} MP limit; lower the dpi or the page range"
+        )
+    if output_format == "JPEG" and max(width, height) > JPEG_MAX_DIMENSION:
+        raise ImageTooLargeError(
+            f"Combined image would be {width}x{height} pixels, over the JPEG limit of "
+            f"{JPEG_MAX_DIMENSION}; use PNG, a lower dpi or fewer pages"
+        )
+    return width, height
+
+def _band(image: Image.Image, width: int, height: int, mode: str) -> Image.Image:
+    """A page fitted onto a white band of the canvas width and its planned height"""
+    if image.mode != mode:
+        image = image.convert(mode)
+    if image.size == (width, height):
+        return image
+    band = Image.new(mode, (width, height), WHITE)
+    band.paste(image, (0, 0))
+    return band
+
+def _fitted_bands(images: Iterable[Image.Image], heights: List[int], width: int, mode: str) -> Iterator[Image.Image]:
+    """Page bands in order; a renderer returning fewer pages than planned is an error"""
+    count = 0
+    for image, height in zip(images, heights):
+        yield _band(image, width, height, mode)
+        count += 1
+    if count != len(heights):
+        raise ValueError(f"Expected {len(heights)} pages, got {count}")
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+def _stitch_png(images: Iterable[Image.Image], heights: List[int], width: int, output_path: str):
+    """Write 8-bit RGB PNG rows page by page through one zlib stream"""
+    compressor = zlib.compressobj(6)
+    pending = []
+    pending_bytes = 0
+    previous_row = np.zeros((1, width, 3), dtype=np.uint8)  # "Up" filter starts from a zero row
+
+    with open(output_path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, sum(heights), 8, 2, 0, 0, 0)))
+
+        for band in _fitted_bands(images, heights, width, "RGB"):
+            rows = np.asarray(band)
+            height = rows.shape[0]
+            # Up filter: difference to the row above (mod 256), good for scanned/blank areas
+            filtered = rows - np.concatenate((previous_row, rows[:-1]))
+            previous_row = rows[-1:]
+
+            scanlines = np.empty((height, 1 + width * 3), dtype=np.uint8)
+            scanlines[:, 0] = PNG_FILTER_UP
+            scanlines[:, 1:] = filtered.reshape(height, -1)
+
+            data = compressor.compress(scanlines.tobytes())
+            pending.append(data)
+            pending_bytes += len(data)
+            if pending_bytes >= IDAT_CHUNK_BYTES:
+                f.write(_png_chunk(b"IDAT", b"".join(pending)))
+                pending, pending_bytes = [], 0
+
+        pending.append(compressor.flush())
+        f.write(_png_chunk(b"IDAT", b"".join(pending)))
+        f.write(_png_chunk(b"IEND", b""))
+
+def _jpeg_segments(data: bytes) -> Tuple[List[Tuple[int, bytes]], bytes]:
+    """
+    Split a baseline JPEG from Pillow into its header segments up to and
+    including SOS, as (marker, segment bytes), and its entropy-coded data
+    """
+    segments = []
+    position = 2  # After SOI
+    while True:
+        marker = data[position + 1]
+        length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        segments.append((marker, data[position:position + 2 + length]))
+        position += 2 + length
+        if marker == JPEG_SOS:
+            break
+    if data[-2:] != b"\xff\xd9":
+        raise ValueError("JPEG strip does not end with EOI")
+    return segments, data[position:-2]
+
+def _strip_rows(bands: Iterable[Image.Image], strip_height: int) -> Iterator[np.ndarray]:
+    """Canvas rows regrouped from page bands into strips of `strip_height` (the last may be shorter)"""
+    pending = []
+    pending_rows = 0
+    for band in bands:
+        pending.append(np.asarray(band))
+        pending_rows += band.height
+        if pending_rows < strip_height:
+            continue
+        rows = np.concatenate(pending) if len(pending) > 1 else pending[0]
+        full = pending_rows - pending_rows % strip_height
+        for top in range(0, full, strip_height):
+            yield rows[top:top + strip_height]
+        pending = [rows[full:].copy()] if full < pending_rows else []  # Do not pin the whole page
+        pending_rows -= full
+    if pending_rows:
+        yield np.concatenate(pending)
+
+def _stitch_jpeg(images: Iterable[Image.Image], heights: List[int], width: int,
+                 output_path: str, quality: int):
+    """
+    Write a baseline JPEG strip by strip
+
+    Each strip of whole 16-row MCU rows (4:2:0) is encoded on its own with
+    the same quantization and Huffman tables, and the entropy-coded data of
+    the strips is joined with restart markers: a restart resets the DC
+    predictors just as a fresh encoder does, and a DRI interval of one
+    strip tells the decoder where they fall. Only one page and one strip
+    are in memory at a time; progressive JPEG is not used since it buffers
+    the whole image's coefficients.
+    """
+    mcu_columns = -(-width // JPEG_MCU_SIZE)
+    strip_mcu_rows = max(1, min(JPEG_STRIP_MCU_ROWS, JPEG_MAX_RESTART_INTERVAL // mcu_columns))
+    strip_height = strip_mcu_rows * JPEG_MCU_SIZE
+
+    with open(output_path, 'wb') as f:
+        header = None
+        for index, rows in enumerate(_strip_rows(_fitted_bands(images, heights, width, "RGB"), strip_height)):
+            buffer = io.BytesIO()
+            Image.fromarray(rows, "RGB").save(buffer, "JPEG", quality=quality, subsampling="4:2:0")
+            segments, entropy = _jpeg_segments(buffer.getvalue())
+            tables = [segment for marker, segment in segments if marker in (JPEG_DQT, JPEG_DHT)]
+
+            if header is None:
+                header = tables
+                f.write(b"\xff\xd8")
+                for marker, segment in segments:
+                    if marker == JPEG_SOF0:
+                        # Image height: the whole canvas rather than this strip
+                        segment = segment[:5] + struct.pack(">H", sum(heights)) + segment[7:]
+                    elif marker == JPEG_SOS:
+                        f.write(b"\xff\xdd" + struct.pack(">HH", 4, strip_mcu_rows * mcu_columns))
+                    f.write(segment)
+            else:
+                if tables != header:
+                    raise RuntimeError("JPEG encoder changed tables between strips")
+                f.write(bytes((0xFF, JPEG_RST0 + (index - 1) % 8)))
+            f.write(entropy)
+        f.write(b"\xff\xd9")
+
+def stitch_vertical(images: Iterable[Image.Image], sizes: List[Tuple[int, int]], output_path: str,
+                    output_format: str, max_pixels: int, quality: int = 95) -> str:
+    """
+    Stack page images top to bottom into one image file
+
+    Pages are consumed one at a time (each fitted to its planned height and
+    the widest page's width, on white) and written out as they arrive, so
+    peak memory is about one page (plus one JPEG strip) whatever the page
+    count.
+
+    Args:
+        images: Page images in order (e.g. loaded from render_pages)
+        sizes: Planned (width, height) of each page
+        output_path: File to write
+        output_format: "PNG" or "JPEG"
+        max_pixels: Pixel cap for the combined image
+        quality: JPEG quality
+
+    Returns:
+        output_path
+
+    Raises:
+        ImageTooLargeError: The combined image is over the cap (checked before any page is used)
+    """
+    width, height = check_canvas(sizes, output_format, max_pixels)
+    heights = [page_height for _, page_height in sizes]
+
+    if output_format == "JPEG":
+        _stitch_jpeg(images, heights, width, output_path, quality)
+    else:
+        _stitch_png(images, heights, width, output_path)
+
+    logger.info(f"Stitched {len(sizes)} pages into {width}x{height} {output_format}")
+    return output_path
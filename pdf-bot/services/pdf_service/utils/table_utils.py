@@ -0,0 +1,170 @@
+import re
+import logging
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from pdfminer.layout import LTChar, LTContainer, LTCurve, LTPage, LTRect
+
+logger = logging.getLogger(__name__)
+
+# Clustering tolerances, as fractions of the median character height
+ROW_TOLERANCE = 0.5    # Characters whose centres are closer than this share a row
+WORD_GAP = 0.15        # Horizontal gap that separates words
+SEGMENT_GAP = 1.0      # Horizontal gap that separates cells
+
+# Vertical rulings closer than this (points) are the same column boundary
+RULING_MERGE = 3.0
+
+NUMBER_PATTERN = re.compile(r"^-?(\d{1,3}(,\d{3})+|\d+)(\.\d+)?$")
+
+CellValue = Union[str, float, int, None]
+
+def _collect(layout: LTPage) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Character boxes and vertical rulings of a page
+
+    Returns:
+        (boxes as (n, 4) x0/y0/x1/y1 array, character texts, rulings as (m, 3) x/y0/y1 array)
+    """
+    boxes, texts, rulings = [], [], []
+    stack = [layout]
+
+    while stack:
+        container = stack.pop()
+        for item in container:
+            if isinstance(item, LTChar):
+                if item.get_text().strip():
+                    boxes.append(item.bbox)
+                    texts.append(item.get_text())
+            elif isinstance(item, LTCurve):
+                # Vertical lines and the sides of cell rectangles are column rulings
+                x0, y0, x1, y1 = item.bbox
+                if y1 - y0 > 10:
+                    if x1 - x0 <= 2:
+                        rulings.append(((x0 + x1) / 2, y0, y1))
+                    elif isinstance(item, LTRect):
+                        rulings.extend(((x0, y0, y1), (x1, y0, y1)))
+            elif isinstance(item, LTContainer):
+                stack.append(item)
+
+    return (
+        np.array(boxes, dtype=np.float64).reshape(-1, 4),
+        texts,
+        np.array(rulings, dtype=np.float64).reshape(-1, 3)
+    )
+
+def _ruling_boundaries(rulings: np.ndarray) -> np.ndarray:
+    """Merge nearby vertical rulings into column boundaries"""
+    if rulings.size < 2:
+        return np.empty(0)
+    rulings = np.sort(rulings)
+    starts = np.flatnonzero(np.r_[True, np.diff(rulings) > RULING_MERGE])
+    return np.add.reduceat(rulings, starts) / np.diff(np.r_[starts, rulings.size])
+
+def _gap_boundaries(seg_x0: np.ndarray, seg_x1: np.ndarray) -> np.ndarray:
+    """Column boundaries at x ranges not covered by any cell segment"""
+    order = np.argsort(seg_x0)
+    x0, x1 = seg_x0[order], seg_x1[order]
+    covered_to = np.maximum.accumulate(x1)
+    gaps = np.flatnonzero(x0[1:] > covered_to[:-1])
+    return (covered_to[gaps] + x0[gaps + 1]) / 2
+
+def _assign_columns(seg_x0: np.ndarray, seg_x1: np.ndarray, tabular: np.ndarray,
+                    boundaries: np.ndarray) -> np.ndarray:
+    """
+    Column index of each segment, numbered densely from 0
+
+    Single-segment rows that cross a boundary (titles, paragraphs) go to
+    the first column.
+    """
+    columns = np.searchsorted(boundaries, (seg_x0 + seg_x1) / 2)
+    spans_columns = np.searchsorted(boundaries, seg_x0) != np.searchsorted(boundaries, seg_x1)
+    columns[~tabular & spans_columns] = columns[tabular].min() if tabular.any() else 0
+    return np.unique(columns, return_inverse=True)[1]
+
+def _to_value(text: str) -> CellValue:
+    """Numbers become numeric cells, everything else stays text"""
+    if NUMBER_PATTERN.match(text):
+        number = float(text.replace(",", ""))
+        return int(number) if number.is_integer() and "." not in text else number
+    return text
+
+def extract_table_rows(layout: LTPage) -> List[List[CellValue]]:
+    """
+    Rebuild the table grid of a page from its character positions
+
+    Characters are clustered into rows by their vertical centres and into
+    cell segments by horizontal gaps, or by vertical rulings inside ruled
+    tables (vectorized over the page). Within the vertical extent of ruled
+    tables, column boundaries come from the vertical rulings; elsewhere
+    from the x ranges left empty by the segments of multi-cell rows. Rows whose single segment crosses a column boundary
+    (titles, paragraphs) are kept whole in the first column.
+
+    Returns:
+        Rows top to bottom, each a list of cell values (None = empty)
+    """
+    boxes, texts, rulings = _collect(layout)
+    if not len(texts):
+        return []
+
+    x0, y0, x1, y1 = boxes.T
+    height = np.median(y1 - y0) or 1.0
+    texts = np.array(texts, dtype=object)
+
+    # Rows: split the sorted vertical centres where they jump
+    centres = (y0 + y1) / 2
+    by_centre = np.argsort(-centres, kind="stable")
+    row_of = np.empty(len(texts), dtype=np.int64)
+    row_of[by_centre] = np.cumsum(np.r_[0, np.diff(-centres[by_centre]) > ROW_TOLERANCE * height])
+
+    # Segments: sort by row then x, split where the horizontal gap is wide
+    order = np.lexsort((x0, row_of))
+    rows, sx0, sx1, stexts = row_of[order], x0[order], x1[order], texts[order]
+    gaps = np.r_[np.inf, sx0[1:] - sx1[:-1]]
+    new_row = np.r_[True, rows[1:] != rows[:-1]]
+    segment_start = new_row | (gaps > SEGMENT_GAP * height)
+
+    # Inside ruled tables a ruling between two characters also ends a cell
+    ruling_x = _ruling_boundaries(rulings[:, 0]) if len(rulings) else np.empty(0)
+    if ruling_x.size:
+        char_centre = centres[order]
+        in_band = (char_centre >= rulings[:, 1].min()) & (char_centre <= rulings[:, 2].max())
+        crosses = np.r_[False, np.searchsorted(ruling_x, sx1[:-1]) != np.searchsorted(ruling_x, sx0[1:])]
+        segment_start |= in_band & crosses
+    starts = np.flatnonzero(segment_start)
+
+    seg_row = rows[starts]
+    seg_x0 = np.minimum.reduceat(sx0, starts)
+    seg_x1 = np.maximum.reduceat(sx1, starts)
+
+    # Segment text, with spaces where words are separated
+    spaced = np.where(~segment_start & (gaps > WORD_GAP * height), " " + stexts, stexts)
+    ends = np.r_[starts[1:], len(spaced)]
+    seg_text = ["".join(spaced[start:end]) for start, end in zip(starts, ends)]
+
+    # Column boundaries: rulings inside the ruled band, whitespace gaps elsewhere
+    segments_per_row = np.bincount(seg_row)
+    tabular = segments_per_row[seg_row] > 1
+    seg_centre = np.add.reduceat(((y0 + y1) / 2)[order], starts) / np.diff(np.r_[starts, len(order)])
+
+    ruled = np.zeros(len(starts), dtype=bool)
+    if len(rulings):
+        ruled = (seg_centre >= rulings[:, 1].min()) & (seg_centre <= rulings[:, 2].max())
+
+    columns = np.zeros(len(starts), dtype=np.int64)
+    for group, use_rulings in ((ruled, True), (~ruled, False)):
+        if not group.any():
+            continue
+        boundaries = ruling_x if use_rulings else np.empty(0)
+        if boundaries.size == 0 and (group & tabular).any():
+            boundaries = _gap_boundaries(seg_x0[group & tabular], seg_x1[group & tabular])
+        columns[group] = _assign_columns(seg_x0[group], seg_x1[group], tabular[group], boundaries)
+
+    row_index = np.cumsum(np.r_[0, seg_row[1:] != seg_row[:-1]])
+
+    grid: List[List[Optional[str]]] = [[None] * (int(columns.max()) + 1) for _ in range(int(row_index[-1]) + 1)]
+    for row, column, text in zip(row_index, columns, seg_text):
+        cell = grid[row][column]
+        grid[row][column] = text if cell is None else f"{cell} {text}"
+
+    return [[None if cell is None else _to_value(cell) for cell in row] for row in grid]
@@ -0,0 +1,64 @@
+import re
+import logging
+import unicodedata
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# A page's text layer is used instead of OCR when it has at least this many
+# visible characters...
+MIN_TEXT_CHARS = 50
+
+# ...at least this fraction of its glyphs map to Unicode (pdfminer writes
+# "(cid:N)" for glyphs without a ToUnicode mapping)...
+MIN_GLYPH_COVERAGE = 0.95
+
+# ...and at most this fraction of its characters look like garbage
+# (symbols, control/private-use characters, replacement characters)
+MAX_GARBAGE_RATIO = 0.15
+
+CID_PATTERN = re.compile(r"\(cid:\d+\)")
+
+# Punctuation and symbols normal in running text
+TEXT_PUNCTUATION = set(".,;:!?'\"()[]{}-–—_/\\&%$€£@#*+=<>|~^`’‘“”«»…•·°§©®™")
+
+@dataclass
+class TextLayerQuality:
+    """Heuristics on the extracted text of one page"""
+    chars: int             # Visible characters, unmapped glyphs included
+    glyph_coverage: float  # Fraction of glyphs with a Unicode mapping
+    garbage_ratio: float   # Fraction of mapped characters that are not text-like
+
+    @property
+    def sufficient(self) -> bool:
+        """Whether the text layer can replace OCR for this page"""
+        return (
+            self.chars >= MIN_TEXT_CHARS
+            and self.glyph_coverage >= MIN_GLYPH_COVERAGE
+            and self.garbage_ratio <= MAX_GARBAGE_RATIO
+        )
+
+def _is_garbage(char: str) -> bool:
+    if char.isalnum() or char in TEXT_PUNCTUATION:
+        return False
+    # Control/private-use/unassigned characters and symbols (U+FFFD included)
+    return unicodedata.category(char)[0] in "CS"
+
+def text_layer_quality(text: str) -> TextLayerQuality:
+    """
+    Judge the embedded text of a page (as returned by TextStore)
+
+    Returns:
+        TextLayerQuality (see .sufficient)
+    """
+    unmapped = len(CID_PATTERN.findall(text))
+    visible = [char for char in CID_PATTERN.sub("", text) if not char.isspace()]
+
+    glyphs = len(visible) + unmapped
+    garbage = sum(1 for char in visible if _is_garbage(char))
+
+    return TextLayerQuality(
+        chars=glyphs,
+        glyph_coverage=len(visible) / glyphs if glyphs else 0.0,
+        garbage_ratio=garbage / len(visible) if visible else 1.0
+    )
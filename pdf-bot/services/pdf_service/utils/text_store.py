@@ -0,0 +1,153 @@
+import os
+import json
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTContainer, LTText, LTTextBox
+
+from config import settings
+from utils.file_utils import file_sha256
+
+logger = logging.getLogger(__name__)
+
+def _page_text(layout) -> str:
+    """Render one pdfminer page layout the way extract_text does"""
+    parts = []
+
+    def render(item):
+        if isinstance(item, LTContainer):
+            for child in item:
+                render(child)
+        elif isinstance(item, LTText):
+            parts.append(item.get_text())
+        if isinstance(item, LTTextBox):
+            parts.append("\n")
+
+    render(layout)
+    return "".join(parts)
+
+class TextStore:
+    """
+    Page-indexed text extracted from PDFs, keyed by content hash
+
+    Layout analysis runs once per document; results are kept in an
+    in-process LRU (bounded by characters) backed by a shared on-disk
+    tier (bounded by bytes, oldest files evicted first).
+    """
+
+    def __init__(self, cache_dir: str, max_memory_chars: int, max_disk_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_chars = max_memory_chars
+        self.max_disk_bytes = max_disk_bytes
+        self.memory: "OrderedDict[str, List[str]]" = OrderedDict()
+        self.memory_chars = 0
+        self.lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get_pages(self, input_path: str, content_hash: Optional[str] = None) -> List[str]:
+        """
+        Get the text of each page of a PDF
+
+        Args:
+            input_path: Path to the PDF
+            content_hash: SHA-256 of the file, if already known
+
+        Returns:
+            List of page texts (index 0 = page 1)
+        """
+        content_hash = content_hash or file_sha256(input_path)
+
+        pages = self._get_memory(content_hash)
+        if pages is not None:
+            return pages
+
+        pages = self._get_disk(content_hash)
+        if pages is None:
+            logger.info(f"Extracting text layer: {input_path}")
+            pages = [_page_text(layout) for layout in extract_pages(input_path)]
+            self._put_disk(content_hash, pages)
+
+        self._put_memory(content_hash, pages)
+        return pages
+
+    def get_text(self, input_path: str, content_hash: Optional[str] = None) -> str:
+        """Get the full document text, each page followed by a form feed (like extract_text)"""
+        return "".join(page + "\x0c" for page in self.get_pages(input_path, content_hash))
+
+    def _get_memory(self, content_hash: str) -> Optional[List[str]]:
+        with self.lock:
+            pages = self.memory.get(content_hash)
+            if pages is not None:
+                self.memory.move_to_end(content_hash)
+            return pages
+
+    def _put_memory(self, content_hash: str, pages: List[str]):
+        size = sum(len(page) for page in pages)
+        if size > self.max_memory_chars:
+            return
+
+        with self.lock:
+            if content_hash in self.memory:
+                return
+            self.memory[content_hash] = pages
+            self.memory_chars += size
+
+            while self.memory_chars > self.max_memory_chars:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_chars -= sum(len(page) for page in evicted)
+
+    def _get_disk(self, content_hash: str) -> Optional[List[str]]:
+        path = self.cache_dir / f"{content_hash}.json"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                pages = json.load(f)
+            os.utime(path)
+            return pages
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read text cache {path}: {e}")
+            return None
+
+    def _put_disk(self, content_hash: str, pages: List[str]):
+        path = self.cache_dir / f"{content_hash}.json"
+        temp_path = self.cache_dir / f".{content_hash}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(pages, f)
+            os.replace(temp_path, path)
+            self._evict_disk()
+        except Exception as e:
+            logger.warning(f"Failed to write text cache {path}: {e}")
+
+    def _evict_disk(self):
+        """Delete least-recently-used files until the disk tier is under budget"""
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+            except FileNotFoundError:
+                continue  # Evicted by another worker
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+# Shared instance for the services in this process
+text_store = TextStore(
+    settings.text_cache_dir,
+    settings.text_cache_memory_chars,
+    settings.text_cache_max_bytes
+)
@@ -0,0 +1,260 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+import logging
+from typing import Optional, Dict, List, AsyncIterator
+
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+from config import settings
+from utils.workspace import Workspace
+
+logger = logging.getLogger(__name__)
+
+# Bytes kept from the end of the upload to look for the %%EOF marker
+TRAILER_WINDOW = 1024
+
+# Non-file form fields are small; anything bigger is rejected
+MAX_FIELD_SIZE = 64 * 1024
+
+# Allowance for multipart headers/boundaries when checking Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Buffered file data is flushed to disk (in a thread) past this size
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+class IngestedUpload:
+    """
+    A PDF upload written to disk in a single pass, with its form fields
+    """
+
+    def __init__(self, workspace: Workspace, path: str, filename: str, content_type: Optional[str],
+                 size: int, sha256: str, fields: Dict[str, str]):
+        self.workspace = workspace
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self.fields = fields
+
+    def form(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Get a form field value"""
+        return self.fields.get(name, default)
+
+    def detach(self) -> Workspace:
+        """Take ownership of the workspace (it will not be deleted by cleanup)"""
+        self.workspace.hand_off()
+        return self.workspace
+
+    def cleanup(self):
+        """Delete the workspace unless a response or job took it over"""
+        if not self.workspace.handed_off:
+            self.workspace.cleanup()
+
+class _MultipartIngestor:
+    """
+    multipart callbacks: streams the `file` part to disk while hashing and
+    validating it, and collects the other fields as text
+    """
+
+    def __init__(self, workspace: Workspace, max_bytes: int):
+        self.workspace = workspace
+        self.max_bytes = max_bytes
+        self.fields: Dict[str, str] = {}
+        self.header_field = b""
+        self.header_value = b""
+        self.headers: Dict[bytes, bytes] = {}
+        self.part_name: Optional[str] = None
+        self.part_is_file = False
+        self.field_data: List[bytes] = []
+        self.field_size = 0
+
+        self.file = None
+        self.path: Optional[str] = None
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.head = b""
+        self.tail = b""
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+
+    def callbacks(self) -> Dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self):
+        self.headers = {}
+        self.field_data = []
+        self.field_size = 0
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        self.part_name = options.get(b"name", b"").decode("latin-1")
+        self.part_is_file = self.part_name == "file" and b"filename" in options
+
+        if self.part_is_file:
+            if self.file is not None:
+                raise HTTPException(status_code=400, detail="Only one file per request is supported")
+            self.filename = options[b"filename"].decode("utf-8", errors="replace")
+            content_type = self.headers.get(b"content-type")
+            self.content_type = content_type.decode("latin-1") if content_type else None
+            self._validate_metadata()
+
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', dir=self.workspace.path)
+            self.file = temp_file
+            self.path = temp_file.name
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        chunk = data[start:end]
+
+        if not self.part_is_file:
+            self.field_data.append(chunk)
+            self.field_size += len(chunk)
+            if self.field_size > MAX_FIELD_SIZE:
+                raise HTTPException(status_code=400, detail=f"Form field too large: {self.part_name}")
+            return
+
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise HTTPException(status_code=413, detail=f"File too large (max {self.max_bytes} bytes)")
+
+        if len(self.head) < 4:
+            self.head += chunk[:4 - len(self.head)]
+            if len(self.head) == 4 and self.head != b"%PDF":
+                raise HTTPException(status_code=400, detail="Invalid PDF file")
+
+        self.digest.update(chunk)
+        self.tail = (self.tail + chunk)[-TRAILER_WINDOW:]
+        self.pending.append(chunk)
+        self.pending_size += len(chunk)
+
+    def on_part_end(self):
+        if not self.part_is_file and self.part_name:
+            self.fields[self.part_name] = b"".join(self.field_data).decode("utf-8", errors="replace")
+
+    def _validate_metadata(self):
+        """Same filename/MIME checks as validate_pdf"""
+        if not self.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="Invalid PDF file")
+        if self.content_type and not self.content_type.startswith('application/pdf'):
+            raise HTTPException(status_code=400, detail="Invalid PDF file")
+
+    def take_pending(self) -> bytes:
+        """Get (and clear) the file data not yet written to disk"""
+        data = b"".join(self.pending)
+        self.pending = []
+        self.pending_size = 0
+        return data
+
+    def validate_complete(self):
+        """Checks that need the whole file: presence, header and %%EOF trailer"""
+        if self.file is None or self.size == 0:
+            raise HTTPException(status_code=400, detail="Invalid PDF file")
+        if self.head != b"%PDF":
+            raise HTTPException(status_code=400, detail="Invalid PDF file")
+        if b"%%EOF" not in self.tail:
+            raise HTTPException(status_code=400, detail="Invalid PDF file (truncated, no %%EOF)")
+
+    def discard(self):
+        """Close and delete a partially written file"""
+        if self.file is not None:
+            self.file.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+async def ingest_upload(request: Request, workspace: Workspace, max_bytes: int) -> IngestedUpload:
+    """
+    Read a multipart PDF upload straight from the request body
+
+    In one pass over the body the `file` part is written to its final
+    temp file, hashed (SHA-256) and checked for the %PDF header, the %%EOF
+    trailer and the size limit. Oversized uploads are rejected from the
+    Content-Length header before any body is read, or as soon as the
+    limit is crossed.
+
+    Raises:
+        HTTPException: 400 for invalid input, 413 when over the size limit
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"File too large (max {max_bytes} bytes)")
+
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data upload")
+
+    ingestor = _MultipartIngestor(workspace, max_bytes)
+    parser = MultipartParser(options[b"boundary"], ingestor.callbacks())
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if ingestor.pending_size >= WRITE_BUFFER_SIZE:
+                await asyncio.to_thread(ingestor.file.write, ingestor.take_pending())
+
+        parser.finalize()
+        if ingestor.pending_size:
+            await asyncio.to_thread(ingestor.file.write, ingestor.take_pending())
+
+        ingestor.validate_complete()
+        ingestor.file.close()
+
+    except Exception:
+        ingestor.discard()
+        raise
+
+    logger.info(f"Upload ingested: {ingestor.filename} ({ingestor.size} bytes)")
+
+    return IngestedUpload(
+        workspace=workspace,
+        path=ingestor.path,
+        filename=ingestor.filename,
+        content_type=ingestor.content_type,
+        size=ingestor.size,
+        sha256=ingestor.digest.hexdigest(),
+        fields=ingestor.fields
+    )
+
+async def pdf_upload(request: Request) -> AsyncIterator[IngestedUpload]:
+    """
+    FastAPI dependency: ingest the uploaded PDF into a fresh request workspace
+
+    The workspace is deleted after the request unless the response (see
+    create_file_response) or a job took it over.
+    """
+    workspace = Workspace()
+    try:
+        upload = await ingest_upload(request, workspace, settings.max_upload_bytes)
+    except Exception:
+        workspace.cleanup()
+        raise
+
+    try:
+        yield upload
+    finally:
+        upload.cleanup()
@@ -0,0 +1,155 @@
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Paths of the workspaces of this process that have not been cleaned up yet
+# (in-flight requests, queued/running jobs, results awaiting download)
+_live_workspaces: Set[str] = set()
+_live_lock = threading.Lock()
+
+def live_workspaces() -> Set[str]:
+    """Paths of the workspaces still in use; the janitor never deletes them"""
+    with _live_lock:
+        return set(_live_workspaces)
+
+def get_workspace_root() -> str:
+    """
+    Directory holding all per-request workspaces and service output files
+
+    Point WORKSPACE_ROOT at a tmpfs (e.g. /dev/shm/pdf_processing) to keep
+    intermediate files in memory.
+    """
+    os.makedirs(settings.workspace_root, exist_ok=True)
+    return settings.workspace_root
+
+class Workspace:
+    """
+    Per-request scratch directory, deleted once the response has been sent
+    """
+
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix="req_", dir=get_workspace_root())
+        self.handed_off = False
+        with _live_lock:
+            _live_workspaces.add(os.path.abspath(self.path))
+
+    def adopt(self, file_path: str) -> str:
+        """
+        Move a file (e.g. a service result) into the workspace so it is
+        removed together with it
+
+        Returns:
+            New path of the file
+        """
+        target = os.path.join(self.path, os.path.basename(file_path))
+        shutil.move(file_path, target)
+        return target
+
+    def hand_off(self):
+        """Mark the workspace as owned by someone else (response, job)"""
+        self.handed_off = True
+
+    def cleanup(self):
+        """Delete the workspace and everything in it"""
+        try:
+            shutil.rmtree(self.path, ignore_errors=True)
+        except Exception as e:
+            logger.warning(f"Failed to delete workspace {self.path}: {e}")
+        with _live_lock:
+            _live_workspaces.discard(os.path.abspath(self.path))
+
+def _entry_size(path: Path) -> int:
+    """Size of a file, or of all files under a directory"""
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size
+
+class Janitor:
+    """
+    Removes orphaned workspaces and output files from the workspace root
+
+    Entries older than `max_age` seconds are deleted; if the root is still
+    over `max_bytes`, the oldest entries are deleted until it fits.
+    Workspaces still in use (see live_workspaces) are never deleted.
+    """
+
+    def __init__(self, root: str, max_age: int, max_bytes: int):
+        self.root = Path(root)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.removed_entries = 0
+        self.removed_bytes = 0
+
+    def sweep(self) -> Tuple[int, int]:
+        """
+        Run one cleanup pass
+
+        Returns:
+            (entries removed, bytes freed)
+        """
+        now = time.time()
+        live = live_workspaces()
+        entries: List[Tuple[float, int, Path]] = []
+
+        live_bytes = 0
+
+        for path in self.root.iterdir():
+            try:
+                if os.path.abspath(path) in live:
+                    # Counts towards the quota, but is not ours to delete
+                    live_bytes += _entry_size(path)
+                else:
+                    entries.append((path.stat().st_mtime, _entry_size(path), path))
+            except FileNotFoundError:
+                continue  # Removed while scanning
+
+        entries.sort()
+        total = live_bytes + sum(size for _, size, _ in entries)
+        removed, freed = 0, 0
+
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+            freed += size
+
+        if removed:
+            self.removed_entries += removed
+            self.removed_bytes += freed
+            logger.info(f"Janitor removed {removed} workspace entries ({freed} bytes)")
+
+        return removed, freed
+
+    async def run_forever(self, interval: int):
+        """Sweep every `interval` seconds"""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Workspace sweep failed: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, int]:
+        """Janitor statistics for the health endpoint"""
+        return {
+            "removed_entries": self.removed_entries,
+            "removed_bytes": self.removed_bytes
+        }